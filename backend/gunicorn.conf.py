@@ -0,0 +1,41 @@
+"""Configuración de producción: gunicorn -c gunicorn.conf.py
+
+Procesos pre-creados (fork) que comparten el socket de escucha, con hilos por
+proceso. Recarga sin cortes con `kill -HUP <pid maestro>`: los workers nuevos
+arrancan y los antiguos terminan las peticiones en curso (graceful_timeout).
+Como la aplicación se precarga en el maestro, para desplegar código nuevo hay
+que usar `kill -USR2` (nuevo maestro) y después `kill -TERM` al antiguo.
+"""
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'src.main:app'
+
+bind = os.environ.get('FORENSICWEB_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('FORENSICWEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('FORENSICWEB_THREADS', 4))
+
+# Reciclar cada worker tras N peticiones (con variación para no reiniciarlos a la vez)
+max_requests = int(os.environ.get('FORENSICWEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('FORENSICWEB_MAX_REQUESTS_JITTER', 100))
+
+# Tiempo para terminar las peticiones en curso al recargar o parar
+graceful_timeout = int(os.environ.get('FORENSICWEB_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('FORENSICWEB_TIMEOUT', 120))
+keepalive = 5
+
+# Crear tablas y migrar una sola vez en el maestro, antes de crear los workers
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones SQLite en lugar de heredar las del maestro"""
+    from src.main import app
+    from src.models.user import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
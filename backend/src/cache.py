@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, has_app_context, request, session as flask_session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+class CacheBackend:
+    """Interfaz de la caché compartida
+
+    Los valores deben poder serializarse como JSON. Las generaciones son
+    contadores por nombre (normalmente el de una tabla): quien cachea algo
+    derivado de una tabla incluye su generación en la clave, y al confirmar
+    cambios en ella se incrementa, con lo que las entradas anteriores dejan
+    de leerse sin tener que buscarlas ni borrarlas.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def generations(self, names):
+        """Generación actual de cada nombre (0 si nunca se invalidó)"""
+        raise NotImplementedError
+
+    def bump(self, names):
+        """Invalidar todo lo cacheado con la generación actual de esos nombres"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    """Caché LRU del proceso: cada worker tiene la suya (desarrollo, un solo proceso)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # clave -> (valor, expira)
+        self.gens = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl if ttl else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def generations(self, names):
+        with self.lock:
+            return {name: self.gens.get(name, 0) for name in names}
+
+    def bump(self, names):
+        with self.lock:
+            for name in names:
+                self.gens[name] = self.gens.get(name, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'backend': 'memory', 'entradas': len(self.entries), 'aciertos': self.hits, 'fallos': self.misses}
+
+class SQLiteCache(CacheBackend):
+    """Caché en un archivo SQLite compartido por todos los procesos del host
+
+    El archivo se abre en WAL y proyectado en memoria (mmap), así que una
+    lectura es una búsqueda por clave primaria sin copias ni bloqueos de
+    escritura. La expulsión es LRU aproximada: la hora de último acceso se
+    actualiza como mucho cada CACHE_TOUCH_SECONDS por entrada, y cada
+    CACHE_EVICT_EVERY escrituras se borran las caducadas y las menos usadas
+    por encima de CACHE_MAX_ENTRIES. Cada hilo usa su propia conexión.
+    """
+
+    def __init__(self, path, max_entries, touch_seconds, evict_every):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_seconds = touch_seconds
+        self.evict_every = evict_every
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        connection = self._connection()
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                expira REAL,
+                acceso REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_cache_acceso ON cache (acceso);
+            CREATE TABLE IF NOT EXISTS generaciones (
+                nombre TEXT PRIMARY KEY,
+                generacion INTEGER NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # perder la caché en un apagón no importa
+            connection.execute('PRAGMA mmap_size=67108864')
+            self.local.connection = connection
+        return connection
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        connection = self._connection()
+        row = connection.execute('SELECT valor, expira, acceso FROM cache WHERE clave = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._count(False)
+            return None
+        if now - row[2] >= self.touch_seconds:
+            connection.execute('UPDATE cache SET acceso = ? WHERE clave = ?', (now, key))
+        self._count(True)
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (clave, valor, expira, acceso) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now + ttl if ttl else None, now)
+        )
+        with self.lock:
+            self.writes += 1
+            evict = self.writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Borrar las entradas caducadas y las menos usadas por encima del máximo"""
+        connection = self._connection()
+        removed = connection.execute('DELETE FROM cache WHERE expira <= ?', (time.time(),)).rowcount
+        removed += connection.execute("""
+            DELETE FROM cache WHERE clave IN (
+                SELECT clave FROM cache ORDER BY acceso DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,)).rowcount
+        with self.lock:
+            self.evicted += removed
+        return removed
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE clave = ?', (key,))
+
+    def generations(self, names):
+        names = list(names)
+        result = dict.fromkeys(names, 0)
+        if names:
+            rows = self._connection().execute(
+                f"SELECT nombre, generacion FROM generaciones WHERE nombre IN ({', '.join('?' * len(names))})", names
+            )
+            result.update(rows.fetchall())
+        return result
+
+    def bump(self, names):
+        self._connection().executemany("""
+            INSERT INTO generaciones (nombre, generacion) VALUES (?, 1)
+            ON CONFLICT (nombre) DO UPDATE SET generacion = generacion + 1
+        """, [(name,) for name in sorted(names)])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def stats(self):
+        entries = self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        with self.lock:
+            return {
+                'backend': 'sqlite',
+                'archivo': self.path,
+                'entradas': entries,
+                'aciertos': self.hits,
+                'fallos': self.misses,
+                'expulsadas': self.evicted
+            }
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def _create_cache(config):
+    if config['CACHE_BACKEND'] == 'sqlite':
+        return SQLiteCache(
+            config['CACHE_PATH'], config['CACHE_MAX_ENTRIES'],
+            config['CACHE_TOUCH_SECONDS'], config['CACHE_EVICT_EVERY']
+        )
+    return MemoryCache(config['CACHE_MAX_ENTRIES'])
+
+def get_cache():
+    """Caché del proceso actual (las conexiones SQLite no sobreviven a un fork)"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = _create_cache(current_app.config)
+            _cache_pid = os.getpid()
+        return _cache
+
+def cached_value(key, compute, tables=(), ttl=None):
+    """Valor de `key` en la caché, o el de compute() (que se guarda si no es None)
+
+    Como en @cached, la clave incluye la generación de cada tabla de `tables`.
+    """
+    config = current_app.config
+    if config['CACHE_BACKEND'] == 'none':
+        return compute()
+
+    try:
+        cache = get_cache()
+        full_key = json.dumps(['valor', key, sorted(cache.generations(tables).items())], default=str)
+        value = cache.get(full_key)
+    except Exception as e:
+        current_app.logger.error(f'Error al leer la caché: {e}')
+        return compute()
+    if value is None:
+        value = compute()
+        if value is not None:
+            try:
+                cache.set(full_key, value, ttl or config['CACHE_DEFAULT_TTL'])
+            except Exception as e:
+                current_app.logger.error(f'Error al escribir en la caché: {e}')
+    return value
+
+def invalidate_tables(session, *tables):
+    """Marcar tablas modificadas con SQL directo; su generación sube al confirmar"""
+    session.info.setdefault('cache_tables', set()).update(tables)
+
+@event.listens_for(Session, 'after_flush')
+def _track_cache_tables(session, flush_context):
+    tables = {obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)
+              if hasattr(obj, '__table__')}
+    if tables:
+        invalidate_tables(session, *tables)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_cache_tables(session, previous_transaction):
+    # Un SAVEPOINT deshecho puede dejar tablas de más: invalidar de más es inofensivo
+    if not previous_transaction.nested:
+        session.info.pop('cache_tables', None)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_cache_generations(session):
+    # El RELEASE de un SAVEPOINT también dispara after_commit: esperar al COMMIT real
+    if session.get_nested_transaction() is not None:
+        return
+    tables = session.info.pop('cache_tables', None)
+    if tables and has_app_context():
+        try:
+            get_cache().bump(tables)
+        except Exception as e:
+            current_app.logger.error(f'Error al invalidar la caché ({", ".join(sorted(tables))}): {e}')
+
+def cached(tables=(), ttl=None, per_user=False):
+    """Decorador de vistas: cachear la respuesta 200 en la caché compartida
+
+    La clave lleva el endpoint, los parámetros de la consulta (y el usuario
+    con per_user) y la generación de cada tabla de `tables`, así que un
+    cambio confirmado en cualquiera de ellas la invalida en todos los
+    procesos. `ttl` (segundos, por defecto CACHE_DEFAULT_TTL) acota lo que
+    dura un resultado que depende de la hora, como las antigüedades.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            if config['CACHE_BACKEND'] == 'none':
+                return f(*args, **kwargs)
+
+            try:
+                cache = get_cache()
+                generations = cache.generations(tables)
+                key = json.dumps([
+                    'vista', request.endpoint, kwargs, sorted(request.args.items(multi=True)),
+                    flask_session.get('user_id') if per_user else None,
+                    sorted(generations.items())
+                ], default=str)
+                hit = cache.get(key)
+            except Exception as e:
+                current_app.logger.error(f'Error al leer la caché: {e}')
+                return f(*args, **kwargs)
+            if hit is not None:
+                return Response(hit['body'], status=hit['status'], mimetype=hit['mimetype'])
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                try:
+                    cache.set(key, {
+                        'body': response.get_data(as_text=True),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype
+                    }, ttl or config['CACHE_DEFAULT_TTL'])
+                except Exception as e:
+                    current_app.logger.error(f'Error al escribir en la caché: {e}')
+            return response
+
+        return decorated_function
+    return decorator
+
+def init_cache(app):
+    """Crear el archivo de la caché compartida al arrancar y vaciarlo
+
+    Así no se sirven respuestas guardadas por una versión anterior del
+    código. La conexión se cierra enseguida: cada proceso (tras el fork de
+    gunicorn) abre la suya con get_cache().
+    """
+    if app.config['CACHE_BACKEND'] != 'sqlite':
+        return
+    os.makedirs(os.path.dirname(app.config['CACHE_PATH']), exist_ok=True)
+    cache = _create_cache(app.config)
+    cache.clear()
+    cache.close()
@@ -0,0 +1,118 @@
+import click
+from flask.cli import AppGroup
+
+integrity_cli = AppGroup('integrity', help='Verificación de integridad de evidencias')
+
+@integrity_cli.command('run-due')
+def integrity_run_due():
+    """Ejecutar las verificaciones programadas cuya fecha ya llegó"""
+    from src.models.integrity import run_due_jobs
+
+    for job in run_due_jobs():
+        click.echo(f"Trabajo {job.id}: {job.estado}, {job.archivos_completados}/{job.total_archivos} archivos, {job.errores} errores")
+
+archive_cli = AppGroup('archive', help='Archivo de casos fríos')
+
+@archive_cli.command('run')
+@click.option('--days', type=int, default=None, help='Antigüedad mínima en días (por defecto ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', type=int, default=None, help='Casos por transacción (por defecto ARCHIVE_BATCH_SIZE)')
+def archive_run(days, batch_size):
+    """Mover al archivo los casos cerrados o archivados más antiguos"""
+    from src.models.archive import archive_cold_cases
+
+    click.echo(f'Casos archivados: {archive_cold_cases(days, batch_size)}')
+
+backup_cli = AppGroup('backup', help='Copias de seguridad de la base de datos')
+
+@backup_cli.command('run')
+@click.option('--pages', type=int, default=None, help='Páginas por paso (por defecto BACKUP_PAGES_PER_STEP)')
+@click.option('--max-rate', type=int, default=None, help='Bytes por segundo como máximo, 0 = sin límite (por defecto BACKUP_MAX_BYTES_PER_SECOND)')
+def backup_run(pages, max_rate):
+    """Copiar la base de datos en caliente, verificarla y rotar las copias antiguas"""
+    from src.models.backup import start_backup, run_backup
+    from src.models.writer import run_write
+
+    run = run_backup(run_write(lambda: start_backup().to_dict())['id'], pages=pages, max_rate=max_rate)
+    if run.estado != 'completado':
+        raise click.ClickException(run.error)
+    click.echo(
+        f'{run.archivo}: {run.bytes} bytes, {run.paginas} páginas en {run.pasos} pasos, '
+        f'{run.duracion_segundos}s ({run.espera_segundos:.2f}s de pausa, {run.reinicios} reinicios), '
+        f'integridad {run.integridad}, SHA-256 {run.sha256}'
+    )
+
+@click.command('seed')
+@click.option('--cases', type=int, default=10000, show_default=True, help='Casos a generar')
+@click.option('--clients', type=int, default=None, help='Clientes (por defecto un tercio de los casos)')
+@click.option('--lawyers', type=int, default=None, help='Abogados (por defecto uno por cada 2500 casos, mínimo 3)')
+@click.option('--contacts', type=int, default=None, help='Mensajes de contacto (por defecto un cuarto de los casos)')
+@click.option('--years', type=float, default=5, show_default=True, help='Años de historial hasta --until')
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Fecha final del historial (por defecto hoy)')
+@click.option('--seed', type=int, default=42, show_default=True, help='Semilla del generador aleatorio')
+@click.option('--batch-size', type=int, default=50000, show_default=True, help='Filas por executemany')
+@click.option('--password', default='cambiar123', show_default=True, help='Contraseña de los abogados generados')
+def seed_command(cases, clients, lawyers, contacts, years, until, seed, batch_size, password):
+    """Generar datos sintéticos realistas a escala (usuarios, clientes, casos, equipos, agenda, transacciones y contactos)"""
+    import time
+    from src.models.seed import seed_database
+
+    started = time.monotonic()
+    counts = seed_database(
+        cases=cases, clients=clients, lawyers=lawyers, contacts=contacts, years=years, until=until,
+        seed=seed, batch_size=batch_size, password=password,
+        progress=lambda message: click.echo(f'[{time.monotonic() - started:7.1f}s] {message}')
+    )
+    for table, total in sorted(counts.items()):
+        click.echo(f'{table}: {total} filas')
+    click.echo(f'Generado en {time.monotonic() - started:.1f}s')
+
+changes_cli = AppGroup('changes', help='Registro de cambios para las réplicas')
+
+@changes_cli.command('prune')
+@click.option('--days', type=int, default=None, help='Días de cambios que se conservan (por defecto CHANGES_RETENTION_DAYS)')
+def changes_prune(days):
+    """Borrar los cambios antiguos del registro (las réplicas más atrasadas tendrán que resincronizarse)"""
+    from src.models.changes import prune_changes
+
+    click.echo(f'Cambios borrados: {prune_changes(days)}')
+
+replica_cli = AppGroup('replica', help='Réplica de solo lectura (FORENSICWEB_REPLICA=1)')
+
+def _replica_applier(primary, email, password, batch_size=None, interval=None):
+    from flask import current_app
+    from src.replica import create_applier
+
+    # Fuera del modo réplica las migraciones del arranque reinstalarían el registro en la copia
+    if not current_app.config['REPLICA_MODE']:
+        raise click.ClickException('Este nodo no es una réplica: arranca con FORENSICWEB_REPLICA=1')
+    return create_applier(primary, email, password, batch_size, interval, report=click.echo)
+
+@replica_cli.command('run')
+@click.option('--primary', default=None, help='URL del principal (por defecto REPLICA_PRIMARY_URL)')
+@click.option('--email', envvar='FORENSICWEB_REPLICA_EMAIL', default=None, help='Administrador con el que se lee el principal (o FORENSICWEB_REPLICA_EMAIL)')
+@click.option('--password', envvar='FORENSICWEB_REPLICA_PASSWORD', default=None, help='Su contraseña (o FORENSICWEB_REPLICA_PASSWORD)')
+@click.option('--batch-size', type=int, default=None, help='Cambios por petición (por defecto REPLICA_BATCH_SIZE)')
+@click.option('--interval', type=float, default=None, help='Segundos entre consultas sin cambios (por defecto REPLICA_POLL_SECONDS)')
+@click.option('--once', is_flag=True, help='Aplicar lo pendiente y salir')
+def replica_run(primary, email, password, batch_size, interval, once):
+    """Seguir el registro de cambios del principal y aplicarlo a la copia local"""
+    _replica_applier(primary, email, password, batch_size, interval).run(once=once)
+
+@replica_cli.command('resync')
+@click.option('--primary', default=None, help='URL del principal (por defecto REPLICA_PRIMARY_URL)')
+@click.option('--email', envvar='FORENSICWEB_REPLICA_EMAIL', default=None, help='Administrador con el que se lee el principal (o FORENSICWEB_REPLICA_EMAIL)')
+@click.option('--password', envvar='FORENSICWEB_REPLICA_PASSWORD', default=None, help='Su contraseña (o FORENSICWEB_REPLICA_PASSWORD)')
+@click.option('--snapshot', type=click.Path(exists=True, dir_okay=False), default=None, help='Cargar este archivo (p. ej. una copia de seguridad del principal) en vez de pedir una instantánea')
+def replica_resync(primary, email, password, snapshot):
+    """Sustituir la copia local por una instantánea del principal"""
+    cursor = _replica_applier(primary, email, password).resync(snapshot)
+    click.echo(f'Instantánea cargada, cursor {cursor}')
+
+def register_commands(app):
+    """Registrar los comandos de `flask` de la aplicación"""
+    app.cli.add_command(integrity_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(backup_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(replica_cli)
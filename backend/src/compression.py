@@ -0,0 +1,95 @@
+import threading
+import zlib
+from flask import request
+
+# wbits de zlib: 31 = contenedor gzip, 15 = contenedor zlib ('deflate' en HTTP)
+ENCODINGS = {'gzip': 31, 'deflate': 15}
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/event-stream'
+}
+
+# Bytes antes y después de comprimir por ruta: {regla: [respuestas, originales, comprimidos]}
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(route, original, compressed):
+    with _stats_lock:
+        entry = _stats.setdefault(route, [0, 0, 0])
+        entry[0] += 1
+        entry[1] += original
+        entry[2] += compressed
+
+def compression_stats():
+    """Bytes ahorrados por ruta desde que arrancó el proceso"""
+    with _stats_lock:
+        snapshot = {route: list(entry) for route, entry in _stats.items()}
+    return {
+        route: {
+            'respuestas': responses,
+            'bytes_originales': original,
+            'bytes_comprimidos': compressed,
+            'bytes_ahorrados': original - compressed,
+            'ratio': round(compressed / original, 4) if original else None
+        }
+        for route, (responses, original, compressed) in sorted(snapshot.items())
+    }
+
+def _compress_stream(chunks, compressor, route):
+    """Comprimir un cuerpo en streaming bloque a bloque
+
+    Cada bloque se vacía con Z_SYNC_FLUSH para que el cliente lo reciba sin
+    esperar al final de la respuesta.
+    """
+    original = compressed = 0
+    for chunk in chunks:
+        original += len(chunk)
+        block = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        compressed += len(block)
+        if block:
+            yield block
+    tail = compressor.flush()
+    compressed += len(tail)
+    if tail:
+        yield tail
+    _record(route, original, compressed)
+
+def init_compression(app):
+    """Comprimir con gzip/deflate las respuestas de texto según Accept-Encoding"""
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(list(ENCODINGS))
+        if encoding is None:
+            return response
+
+        compressor = zlib.compressobj(app.config['COMPRESSION_LEVEL'], zlib.DEFLATED, ENCODINGS[encoding])
+        route = request.url_rule.rule if request.url_rule else request.path
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.iter_encoded(), compressor, route)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config['COMPRESSION_MIN_SIZE']:
+                return response
+            compressed = compressor.compress(data) + compressor.flush()
+            response.set_data(compressed)
+            _record(route, len(data), len(compressed))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
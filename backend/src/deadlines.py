@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.models.user import db
+from src.models.deadline import QueryDeadline
+
+# Instrucciones de la VM de SQLite entre dos comprobaciones del límite
+PROGRESS_STEPS = 10000
+
+# Límites fijados por administradores, releídos cada OVERRIDES_TTL segundos
+OVERRIDES_TTL = 30
+_overrides = {'loaded_at': None, 'values': {}}
+
+# Peticiones cortadas por ruta: {endpoint: {'deadline': n, 'busy': n}}
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _check_deadline():
+    """Progress handler: un valor distinto de cero interrumpe la consulta en curso"""
+    if not has_app_context():
+        return 0
+    deadline = g.get('query_deadline')
+    return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+@event.listens_for(Engine, 'connect')
+def _install_progress_handler(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(_check_deadline, PROGRESS_STEPS)
+
+@event.listens_for(Engine, 'handle_error')
+def _classify_error(context):
+    """Distinguir consultas interrumpidas por el límite y bases de datos bloqueadas"""
+    if not has_app_context() or not isinstance(context.original_exception, sqlite3.OperationalError):
+        return
+    message = str(context.original_exception)
+    if message == 'interrupted' and g.get('query_deadline') is not None:
+        g.query_timeout = 'deadline'
+    elif message.startswith('database is locked'):
+        g.query_timeout = 'busy'
+
+def deadline_overrides():
+    """Límites por endpoint fijados por administradores (con caché por proceso)"""
+    loaded_at = _overrides['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > OVERRIDES_TTL:
+        _overrides['values'] = {row.endpoint: row.milisegundos for row in QueryDeadline.query.all()}
+        _overrides['loaded_at'] = time.monotonic()
+    return _overrides['values']
+
+def invalidate_overrides():
+    _overrides['loaded_at'] = None
+
+def deadline_for(endpoint):
+    """Milisegundos de presupuesto del endpoint (None = sin límite)"""
+    overrides = deadline_overrides()
+    if endpoint in overrides:
+        milliseconds = overrides[endpoint]
+    else:
+        milliseconds = current_app.config['QUERY_DEADLINES'].get(endpoint, current_app.config['QUERY_DEADLINE_MS'])
+    return milliseconds or None
+
+def deadline_stats():
+    with _stats_lock:
+        return {endpoint: dict(counts) for endpoint, counts in sorted(_stats.items())}
+
+def init_deadlines(app):
+    """Limitar el tiempo de las consultas SQLite de cada petición"""
+
+    @app.before_request
+    def start_deadline():
+        # Las sub-peticiones de /api/batch comparten el presupuesto del lote
+        if request.endpoint is None or 'query_deadline' in g:
+            return
+        milliseconds = deadline_for(request.endpoint)
+        g.query_deadline = time.monotonic() + milliseconds / 1000 if milliseconds else None
+        g.query_deadline_ms = milliseconds
+
+    @app.after_request
+    def report_deadline(response):
+        reason = g.pop('query_timeout', None)
+        if reason is None:
+            return response
+
+        db.session.rollback()
+        with _stats_lock:
+            counts = _stats.setdefault(request.endpoint, {'deadline': 0, 'busy': 0})
+            counts[reason] += 1
+
+        retry_after = app.config['QUERY_RETRY_AFTER']
+        if reason == 'deadline':
+            body = {
+                'error': 'La consulta superó el tiempo límite de la petición',
+                'codigo': 'deadline_exceeded',
+                'limite_ms': g.get('query_deadline_ms')
+            }
+            status = 504
+        else:
+            body = {
+                'error': 'La base de datos está ocupada, inténtelo de nuevo',
+                'codigo': 'database_busy'
+            }
+            status = 503
+        body.update({'endpoint': request.endpoint, 'retry_after': retry_after})
+
+        timeout_response = jsonify(body)
+        timeout_response.status_code = status
+        timeout_response.headers['Retry-After'] = str(retry_after)
+        return timeout_response
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from markupsafe import Markup
+from sqlalchemy import func, tuple_
+from src.models.user import db
+from src.models.case import Client, Equipment, AgendaEvent, Transaction
+from src.models.activity import ActivityEvent
+from src.models.custody import CustodyEvent
+from src.cache import get_cache
+
+# Secciones del dossier en orden de aparición; cada una tiene su plantilla
+SECTIONS = ('caso', 'cliente', 'equipos', 'custodia', 'transacciones', 'agenda')
+DOSSIER_TEMPLATE = 'dossier/dossier.html'
+
+# Aciertos y fallos de este proceso; los fragmentos viven en la caché compartida (src/cache.py)
+_stats = {'aciertos': 0, 'fallos': 0}
+_stats_lock = threading.Lock()
+
+def dossier_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+def init_dossier(app):
+    """Compilar al arrancar las plantillas del dossier (quedan en la caché de Jinja)"""
+    for name in (DOSSIER_TEMPLATE,) + tuple(f'dossier/{section}.html' for section in SECTIONS):
+        app.jinja_env.get_template(name)
+
+def _versions(pairs):
+    """Última entrada de actividad de cada (tipo_entidad, entidad_id): su versión
+
+    Cada alta, cambio o baja de las entidades seguidas deja una entrada en
+    `actividad`, así que su id crece con cada modificación. Las filas sin
+    entradas (anteriores al registro) tienen versión None hasta que cambien.
+    """
+    if not pairs:
+        return {}
+    rows = db.session.query(
+        ActivityEvent.tipo_entidad, ActivityEvent.entidad_id, func.max(ActivityEvent.id)
+    ).filter(
+        tuple_(ActivityEvent.tipo_entidad, ActivityEvent.entidad_id).in_(pairs)
+    ).group_by(ActivityEvent.tipo_entidad, ActivityEvent.entidad_id)
+    return {(tipo, entidad_id): version for tipo, entidad_id, version in rows}
+
+def _section_keys(case):
+    """Clave de versión de cada sección sin cargar sus filas"""
+    equipos = [row[0] for row in db.session.query(Equipment.id).filter(Equipment.caso_id == case.id).order_by(Equipment.id)]
+    transacciones = [row[0] for row in db.session.query(Transaction.id).filter(Transaction.caso_id == case.id).order_by(Transaction.id)]
+    agenda = [row[0] for row in db.session.query(AgendaEvent.id).filter(AgendaEvent.caso_id == case.id).order_by(AgendaEvent.id)]
+
+    pairs = [('case', case.id)]
+    if case.cliente_id:
+        pairs.append(('client', case.cliente_id))
+    pairs += [('equipment', equipo_id) for equipo_id in equipos]
+    pairs += [('transaction', transaccion_id) for transaccion_id in transacciones]
+    pairs += [('agenda', evento_id) for evento_id in agenda]
+    versions = _versions(pairs)
+
+    # La cadena de custodia es de solo inserción: su versión es el último evento
+    custody = dict(db.session.query(CustodyEvent.equipo_id, func.max(CustodyEvent.id)).filter(
+        CustodyEvent.equipo_id.in_(equipos)
+    ).group_by(CustodyEvent.equipo_id).all()) if equipos else {}
+
+    # El nombre del abogado sale de `usuarios`, que no deja entradas de actividad
+    abogado = case.abogado.nombre_completo if case.abogado else None
+
+    return {
+        'caso': (versions.get(('case', case.id)), case.abogado_asignado_id, abogado),
+        'cliente': (case.cliente_id, versions.get(('client', case.cliente_id))),
+        'equipos': tuple((equipo_id, versions.get(('equipment', equipo_id))) for equipo_id in equipos),
+        'custodia': tuple(
+            (equipo_id, versions.get(('equipment', equipo_id)), custody.get(equipo_id)) for equipo_id in equipos
+        ),
+        'transacciones': tuple((transaccion_id, versions.get(('transaction', transaccion_id))) for transaccion_id in transacciones),
+        'agenda': tuple((evento_id, versions.get(('agenda', evento_id))) for evento_id in agenda)
+    }
+
+def _section_context(section, case):
+    """Filas que necesita la plantilla de una sección (solo si hay que renderizarla)"""
+    if section == 'caso':
+        return {'case': case}
+    if section == 'cliente':
+        return {'client': Client.query.get(case.cliente_id) if case.cliente_id else None}
+    if section in ('equipos', 'custodia'):
+        equipos = Equipment.query.filter_by(caso_id=case.id).order_by(Equipment.fecha_recepcion, Equipment.id).all()
+        if section == 'equipos':
+            return {'equipos': equipos}
+        events = CustodyEvent.query.filter(
+            CustodyEvent.equipo_id.in_([equipo.id for equipo in equipos])
+        ).order_by(CustodyEvent.equipo_id, CustodyEvent.secuencia).all() if equipos else []
+        by_equipo = {}
+        for event in events:
+            by_equipo.setdefault(event.equipo_id, []).append(event)
+        return {'equipos': equipos, 'eventos': by_equipo}
+    if section == 'transacciones':
+        transacciones = Transaction.query.filter_by(caso_id=case.id).order_by(Transaction.fecha, Transaction.id).all()
+        ingresos = sum(t.monto_centavos for t in transacciones if t.tipo == 'ingreso')
+        gastos = sum(t.monto_centavos for t in transacciones if t.tipo == 'gasto')
+        return {
+            'transacciones': transacciones,
+            'ingresos': Decimal(ingresos).scaleb(-2),
+            'gastos': Decimal(gastos).scaleb(-2),
+            'balance': Decimal(ingresos - gastos).scaleb(-2)
+        }
+    return {'eventos': AgendaEvent.query.filter_by(caso_id=case.id).order_by(AgendaEvent.fecha_inicio).all()}
+
+def dossier_version(case):
+    """Claves de versión de las secciones y ETag del dossier, sin renderizar nada"""
+    keys = _section_keys(case)
+    return keys, hashlib.sha256(repr((case.id, keys)).encode('utf-8')).hexdigest()
+
+def render_dossier(case, keys):
+    """HTML del dossier del caso
+
+    Cada sección se guarda renderizada en la caché compartida con la
+    versión de sus filas como clave; al regenerar el dossier (en cualquier
+    proceso) solo se vuelven a renderizar las secciones cuyas filas
+    cambiaron. Una clave nunca queda obsoleta, así que no caduca: la
+    expulsión LRU se encarga de las versiones viejas.
+    """
+    cache = get_cache()
+    env = current_app.jinja_env
+
+    fragments = []
+    for section in SECTIONS:
+        key = json.dumps(['dossier', section, case.id, keys[section]])
+        html = cache.get(key)
+        with _stats_lock:
+            _stats['fallos' if html is None else 'aciertos'] += 1
+        if html is None:
+            html = env.get_template(f'dossier/{section}.html').render(_section_context(section, case))
+            cache.set(key, html)
+        fragments.append(Markup(html))
+
+    return env.get_template(DOSSIER_TEMPLATE).render(case=case, sections=fragments, generado=datetime.utcnow())
@@ -6,7 +6,21 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
+import src.models.sqlite  # ajustes de conexión SQLite (WAL, busy_timeout)
 from src.models.case import Case, Client, Equipment, AgendaEvent, Transaction, Contact
+from src.models.finance import DailyTotal
+from src.models.custody import CustodyEvent, CustodyCheckpoint
+from src.models.evidence import EvidenceUpload, EvidenceFile
+from src.models.integrity import IntegrityJob, IntegrityResult, reclaim_stale_jobs
+from src.models.activity import ActivityEvent
+from src.models.deadline import QueryDeadline
+from src.models.duplicates import ClientKey, DuplicatePair
+from src.models.backup import BackupRun
+from src.models.reminder import Reminder
+from src.models.analytics import CloseTime
+from src.models.changes import ChangeEvent, ReplicationState
+import src.models.audit  # auditoría campo a campo (eventos de sesión)
+from src.models.migrations import run_migrations
 
 # Importar blueprints
 from src.routes.user import user_bp
@@ -15,10 +29,123 @@ from src.routes.cases import cases_bp
 from src.routes.clients import clients_bp
 from src.routes.dashboard import dashboard_bp
 from src.routes.contact import contact_bp
+from src.routes.batch import batch_bp
+from src.routes.agenda import agenda_bp
+from src.routes.finance import finance_bp
+from src.routes.custody import custody_bp
+from src.routes.evidence import evidence_bp
+from src.routes.integrity import integrity_bp
+from src.routes.equipment import equipment_bp
+from src.routes.audit import audit_bp
+from src.routes.backup import backup_bp
+from src.routes.reminders import reminders_bp
+from src.routes.metrics import metrics_bp
+from src.routes.changes import changes_bp
+from src.commands import register_commands
+from src.cache import init_cache
+from src.compression import init_compression
+from src.deadlines import init_deadlines
+from src.dossier import init_dossier
+from src.reminders import init_reminders
+from src.replica import init_replica
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+# Máximo de sub-peticiones aceptadas por /api/batch
+app.config['BATCH_MAX_REQUESTS'] = 25
+
+# Duración máxima de un evento de agenda; acota las consultas por rango
+app.config['AGENDA_MAX_EVENT_DAYS'] = 31
+
+# Entradas de custodia por checkpoint firmado (raíz Merkle)
+app.config['CUSTODY_CHECKPOINT_BLOCK'] = 256
+
+# Almacén de archivos de evidencia direccionado por contenido (SHA-256)
+app.config['EVIDENCE_STORE_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'evidencias')
+app.config['EVIDENCE_CHUNK_SIZE'] = 1024 * 1024
+
+# Verificación de integridad: procesos del pool (None = núcleos) y bloque de lectura
+app.config['INTEGRITY_WORKERS'] = None
+app.config['INTEGRITY_BLOCK_SIZE'] = 8 * 1024 * 1024
+# Minutos sin latido tras los que un trabajo 'en_proceso' se da por abandonado ('error')
+app.config['INTEGRITY_STALE_MINUTES'] = 10
+
+# Archivo de casos fríos: SQLite aparte, adjuntado (ATTACH) solo cuando se consulta
+app.config['ARCHIVE_DATABASE_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'archivo.db')
+app.config['ARCHIVE_AFTER_DAYS'] = 365
+app.config['ARCHIVE_BATCH_SIZE'] = 100
+
+# Copias de seguridad en caliente (API de backup de SQLite): páginas por paso,
+# límite de E/S en bytes/s (0 = sin límite), reinicios tolerados y copias conservadas
+app.config['BACKUP_DIR'] = os.path.join(os.path.dirname(__file__), 'database', 'backups')
+app.config['BACKUP_PAGES_PER_STEP'] = 256
+app.config['BACKUP_MAX_BYTES_PER_SECOND'] = 32 * 1024 * 1024
+app.config['BACKUP_MAX_RESTARTS'] = 3
+app.config['BACKUP_KEEP'] = 7
+
+# Compresión gzip/deflate de respuestas de texto: tamaño mínimo en bytes y nivel zlib (1-9)
+app.config['COMPRESSION_MIN_SIZE'] = 500
+app.config['COMPRESSION_LEVEL'] = 6
+
+# Escritor único por proceso (opcional): las escrituras se encolan y se confirman
+# en grupo; ventana de agrupación en ms y máximo de escrituras por commit
+app.config['SQLITE_SINGLE_WRITER'] = os.environ.get('FORENSICWEB_SINGLE_WRITER', '0') == '1'
+app.config['WRITER_GROUP_COMMIT_MS'] = 2
+app.config['WRITER_MAX_BATCH'] = 64
+
+# Tiempo máximo de consultas por petición en ms (0 = sin límite), con excepciones por
+# endpoint; los administradores pueden cambiarlos en /api/metrics/deadlines
+app.config['QUERY_DEADLINE_MS'] = 5000
+app.config['QUERY_DEADLINES'] = {
+    'batch.run_batch': 30000,
+    'custody.verify_store_custody': 60000,
+    'custody.verify_equipment_custody': 30000,
+    'reminders.stream_reminders': 0  # flujo SSE de larga duración
+}
+app.config['QUERY_RETRY_AFTER'] = 5
+
+# Auditoría de cambios: entradas en memoria por proceso (acotado), entradas por
+# INSERT y espera máxima en ms antes de escribir un lote incompleto
+app.config['AUDIT_BUFFER_SIZE'] = 10000
+app.config['AUDIT_BATCH_SIZE'] = 500
+app.config['AUDIT_FLUSH_INTERVAL_MS'] = 200
+
+# Recordatorios de agenda: avisos N minutos antes de cada evento, horas de eventos
+# cargadas en memoria, cada cuánto se mira el archivo de señal de cambios (s) y
+# duración máxima y keep-alive de las conexiones SSE (s)
+app.config['REMINDERS_ENABLED'] = os.environ.get('FORENSICWEB_REMINDERS', '1') == '1'
+app.config['REMINDER_LEADS_MINUTES'] = [1440, 60]
+app.config['REMINDER_WINDOW_HOURS'] = 6
+app.config['REMINDER_SIGNAL_CHECK_SECONDS'] = 2
+app.config['REMINDER_STREAM_SECONDS'] = 300
+app.config['REMINDER_KEEP_ALIVE_SECONDS'] = 15
+
+# Caché compartida (src/cache.py): 'sqlite' en un archivo común a los workers del
+# host, 'memory' por proceso o 'none' para no cachear respuestas; entradas máximas
+# (LRU), caducidad por defecto (s), cada cuánto se anota el último acceso (s) y
+# cada cuántas escrituras se expulsa
+app.config['CACHE_BACKEND'] = os.environ.get('FORENSICWEB_CACHE', 'sqlite')
+app.config['CACHE_PATH'] = os.path.join(os.path.dirname(__file__), 'database', 'cache.db')
+app.config['CACHE_MAX_ENTRIES'] = 10000
+app.config['CACHE_DEFAULT_TTL'] = 300
+app.config['CACHE_TOUCH_SECONDS'] = 5
+app.config['CACHE_EVICT_EVERY'] = 100
+
+# Registro de cambios para réplicas (src/models/changes.py): cambios por respuesta de
+# /api/_changes (por defecto y máximo) y días que se conservan (flask changes prune)
+app.config['CHANGES_FEED_LIMIT'] = 1000
+app.config['CHANGES_FEED_MAX'] = 10000
+app.config['CHANGES_RETENTION_DAYS'] = 7
+
+# Réplica de solo lectura (src/replica.py): el nodo sirve lecturas de una copia local
+# que `flask replica run` mantiene al día desde el principal; cambios por petición y
+# segundos entre consultas cuando no hay nada nuevo
+app.config['REPLICA_MODE'] = os.environ.get('FORENSICWEB_REPLICA', '0') == '1'
+app.config['REPLICA_PRIMARY_URL'] = os.environ.get('FORENSICWEB_PRIMARY_URL')
+app.config['REPLICA_BATCH_SIZE'] = 1000
+app.config['REPLICA_POLL_SECONDS'] = 1
+
 # Habilitar CORS para permitir requests desde el frontend
 CORS(app, supports_credentials=True)
 
@@ -29,59 +156,95 @@ app.register_blueprint(cases_bp, url_prefix='/api/cases')
 app.register_blueprint(clients_bp, url_prefix='/api/clients')
 app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
 app.register_blueprint(contact_bp, url_prefix='/api/contact')
+app.register_blueprint(batch_bp, url_prefix='/api/batch')
+app.register_blueprint(agenda_bp, url_prefix='/api/agenda')
+app.register_blueprint(finance_bp, url_prefix='/api/finance')
+app.register_blueprint(custody_bp, url_prefix='/api/custody')
+app.register_blueprint(evidence_bp, url_prefix='/api/evidence')
+app.register_blueprint(integrity_bp, url_prefix='/api/integrity')
+app.register_blueprint(equipment_bp, url_prefix='/api/equipment')
+app.register_blueprint(audit_bp, url_prefix='/api/audit')
+app.register_blueprint(backup_bp, url_prefix='/api/backups')
+app.register_blueprint(reminders_bp, url_prefix='/api/reminders')
+app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+app.register_blueprint(changes_bp, url_prefix='/api/_changes')
+
+# Comandos de línea de órdenes (flask ...)
+register_commands(app)
+
+# Caché compartida entre los procesos del host (se vacía al arrancar)
+init_cache(app)
+
+# Compresión de respuestas negociada con Accept-Encoding
+init_compression(app)
+
+# Límite de tiempo de las consultas de cada petición (504/503 con Retry-After)
+init_deadlines(app)
+
+# Plantillas del dossier de casos compiladas al arrancar
+init_dossier(app)
+
+# Nodo réplica de solo lectura (antes de los recordatorios, que desactiva)
+init_replica(app)
+
+# Planificador de recordatorios de agenda (arranca con la primera petición)
+init_reminders(app)
 
 # Configuración de base de datos
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
-# Crear tablas y datos de ejemplo
-with app.app_context():
-    db.create_all()
+# Crear tablas y datos de ejemplo (una réplica recibe esquema y datos del principal)
+if not app.config['REPLICA_MODE']:
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        reclaim_stale_jobs()  # trabajos de un worker que murió a medias
     
-    # Crear usuario administrador por defecto si no existe
-    from src.models.user import User
-    admin_user = User.query.filter_by(email='admin@forensicweb.com').first()
-    if not admin_user:
-        admin_user = User(
-            nombre_completo='Administrador',
-            email='admin@forensicweb.com',
-            rol='admin'
-        )
-        admin_user.set_password('admin123')
-        db.session.add(admin_user)
+        # Crear usuario administrador por defecto si no existe
+        from src.models.user import User
+        admin_user = User.query.filter_by(email='admin@forensicweb.com').first()
+        if not admin_user:
+            admin_user = User(
+                nombre_completo='Administrador',
+                email='admin@forensicweb.com',
+                rol='admin'
+            )
+            admin_user.set_password('admin123')
+            db.session.add(admin_user)
         
-        # Crear algunos datos de ejemplo
-        from datetime import datetime
+            # Crear algunos datos de ejemplo
+            from datetime import datetime
         
-        # Cliente de ejemplo
-        client_example = Client(
-            nombre_completo='Cliente Ejemplo',
-            email='cliente@ejemplo.com',
-            telefono='+123456789',
-            direccion='Calle Ejemplo 123'
-        )
-        db.session.add(client_example)
-        db.session.flush()  # Para obtener el ID
+            # Cliente de ejemplo
+            client_example = Client(
+                nombre_completo='Cliente Ejemplo',
+                email='cliente@ejemplo.com',
+                telefono='+123456789',
+                direccion='Calle Ejemplo 123'
+            )
+            db.session.add(client_example)
+            db.session.flush()  # Para obtener el ID
         
-        # Caso de ejemplo
-        case_example = Case(
-            numero_caso='CASE-2024-001',
-            titulo='Caso de ejemplo',
-            descripcion='Este es un caso de ejemplo para demostrar el sistema',
-            cliente_id=client_example.id,
-            abogado_asignado_id=admin_user.id,
-            estado='en_proceso',
-            prioridad='media'
-        )
-        db.session.add(case_example)
+            # Caso de ejemplo
+            case_example = Case(
+                numero_caso='CASE-2024-001',
+                titulo='Caso de ejemplo',
+                descripcion='Este es un caso de ejemplo para demostrar el sistema',
+                cliente_id=client_example.id,
+                abogado_asignado_id=admin_user.id,
+                estado='en_proceso',
+                prioridad='media'
+            )
+            db.session.add(case_example)
         
-        try:
-            db.session.commit()
-            print("Datos de ejemplo creados exitosamente")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error creando datos de ejemplo: {e}")
+            try:
+                db.session.commit()
+                print("Datos de ejemplo creados exitosamente")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error creando datos de ejemplo: {e}")
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -0,0 +1,166 @@
+import json
+from datetime import datetime
+from flask import has_request_context, session as flask_session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.case import Case, Client, Equipment, AgendaEvent, Transaction, Contact
+
+class ActivityEvent(db.Model):
+    """Entrada del registro de actividad (solo inserción); el id sirve de cursor"""
+    __tablename__ = 'actividad'
+    __table_args__ = (
+        db.Index('ix_actividad_fecha', 'fecha', 'id'),
+        db.Index('ix_actividad_entidad', 'tipo_entidad', 'entidad_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    tipo_entidad = db.Column(db.String(20), nullable=False)  # 'case', 'client', 'contact', 'equipment', 'agenda', 'transaction'
+    entidad_id = db.Column(db.Integer, nullable=False)
+    accion = db.Column(db.String(20), nullable=False)  # 'creado', 'actualizado', 'estado', 'cerrado', 'leido', 'eliminado'
+    descripcion = db.Column(db.String(300), nullable=False)
+    detalle = db.Column(db.Text)  # JSON con datos extra de la entrada
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+
+    def to_dict(self):
+        data = {
+            'cursor': self.id,
+            'type': self.tipo_entidad,
+            'action': self.accion,
+            'description': self.descripcion,
+            'time': self.fecha.isoformat() if self.fecha else None,
+            'id': self.entidad_id,
+            'usuario_id': self.usuario_id
+        }
+        data.update(json.loads(self.detalle or '{}'))
+        return data
+
+# modelo -> (tipo de entidad, etiqueta para la descripción, detalle extra)
+TRACKED_MODELS = {
+    Case: ('case', lambda case: case.titulo, lambda case: {'priority': case.prioridad}),
+    Client: ('client', lambda client: client.nombre_completo, None),
+    Contact: ('contact', lambda contact: contact.nombre, lambda contact: {'subject': contact.asunto}),
+    Equipment: ('equipment', lambda equipo: f'{equipo.tipo_equipo} (caso {equipo.caso_id})', None),
+    AgendaEvent: ('agenda', lambda evento: evento.titulo, None),
+    Transaction: ('transaction', lambda transaccion: f'{transaccion.tipo} {transaccion.concepto}', None),
+}
+
+DESCRIPTIONS = {
+    'case': {
+        'creado': 'Nuevo caso: {}',
+        'actualizado': 'Caso actualizado: {}',
+        'estado': 'Cambio de estado del caso: {}',
+        'cerrado': 'Caso cerrado: {}',
+        'eliminado': 'Caso eliminado: {}'
+    },
+    'client': {
+        'creado': 'Nuevo cliente registrado: {}',
+        'actualizado': 'Cliente actualizado: {}',
+        'eliminado': 'Cliente eliminado: {}'
+    },
+    'contact': {
+        'creado': 'Nuevo mensaje de: {}',
+        'actualizado': 'Mensaje actualizado de: {}',
+        'leido': 'Mensaje leído de: {}',
+        'eliminado': 'Mensaje eliminado de: {}'
+    },
+    'equipment': {
+        'creado': 'Equipo recibido: {}',
+        'actualizado': 'Equipo actualizado: {}',
+        'eliminado': 'Equipo eliminado: {}'
+    },
+    'agenda': {
+        'creado': 'Nuevo evento: {}',
+        'actualizado': 'Evento actualizado: {}',
+        'eliminado': 'Evento eliminado: {}'
+    },
+    'transaction': {
+        'creado': 'Nueva transacción: {}',
+        'actualizado': 'Transacción actualizada: {}',
+        'eliminado': 'Transacción eliminada: {}'
+    }
+}
+
+def _changed_columns(obj):
+    state = inspect(obj)
+    return [
+        prop.key for prop in state.mapper.column_attrs
+        if state.attrs[prop.key].history.has_changes()
+    ]
+
+def _update_action(obj, changed):
+    if isinstance(obj, Case) and 'estado' in changed:
+        return 'cerrado' if obj.estado == 'cerrado' else 'estado'
+    if isinstance(obj, Contact) and changed == ['leido'] and obj.leido:
+        return 'leido'
+    return 'actualizado'
+
+def _entry(obj, action, now, usuario_id, detail=None):
+    tipo, label, extra = TRACKED_MODELS[type(obj)]
+    identity = inspect(obj).identity  # las altas aún no tienen identidad en after_flush
+    entidad_id = identity[0] if identity else obj.id
+    try:
+        name = label(obj)
+        detail = {**(extra(obj) if extra else {}), **(detail or {})}
+    except Exception:
+        # Objeto borrado cuyos atributos ya no se pueden cargar
+        name = f'#{entidad_id}'
+    return {
+        'fecha': now,
+        'tipo_entidad': tipo,
+        'entidad_id': entidad_id,
+        'accion': action,
+        'descripcion': DESCRIPTIONS[tipo][action].format(name)[:300],
+        'detalle': json.dumps(detail) if detail else None,
+        'usuario_id': usuario_id
+    }
+
+@event.listens_for(Session, 'after_flush')
+def _log_activity(session, flush_context):
+    """Registrar en `actividad` cada alta, cambio o baja de las entidades seguidas"""
+    now = datetime.utcnow()
+    usuario_id = session.info.get('usuario_id')  # escrituras del hilo escritor (src/models/writer.py)
+    if usuario_id is None and has_request_context():
+        usuario_id = flask_session.get('user_id')
+    entries = []
+
+    for obj in session.new:
+        if type(obj) in TRACKED_MODELS:
+            entries.append(_entry(obj, 'creado', now, usuario_id))
+
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS:
+            changed = _changed_columns(obj)
+            if changed:
+                action = _update_action(obj, changed)
+                detail = {'estado': obj.estado} if action in ('estado', 'cerrado') else {'campos': changed}
+                entries.append(_entry(obj, action, now, usuario_id, detail))
+
+    for obj in session.deleted:
+        if type(obj) in TRACKED_MODELS:
+            entries.append(_entry(obj, 'eliminado', now, usuario_id))
+
+    if entries:
+        session.connection().execute(ActivityEvent.__table__.insert(), entries)
+
+def seed_activity(connection):
+    """Cargar como actividad inicial las altas ya existentes, en orden cronológico"""
+    connection.execute(text("""
+        INSERT INTO actividad (fecha, tipo_entidad, entidad_id, accion, descripcion, detalle)
+        SELECT fecha, tipo_entidad, entidad_id, 'creado', descripcion, detalle FROM (
+            SELECT fecha_apertura AS fecha, 'case' AS tipo_entidad, id AS entidad_id,
+                   'Nuevo caso: ' || titulo AS descripcion,
+                   json_object('priority', prioridad) AS detalle
+            FROM casos
+            UNION ALL
+            SELECT fecha_registro, 'client', id, 'Nuevo cliente registrado: ' || nombre_completo, NULL
+            FROM clientes
+            UNION ALL
+            SELECT fecha_envio, 'contact', id, 'Nuevo mensaje de: ' || nombre, json_object('subject', asunto)
+            FROM contactos
+        )
+        WHERE fecha IS NOT NULL
+        ORDER BY fecha
+    """))
@@ -0,0 +1,236 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.user import User, db
+from src.models.case import Case
+from src.models.archive import COLD_STATES
+
+# Tramos de antigüedad de los casos abiertos: (etiqueta, días mínimos, días máximos o None)
+AGE_BUCKETS = (
+    ('0-7', 0, 7),
+    ('8-30', 8, 30),
+    ('31-90', 31, 90),
+    ('91-180', 91, 180),
+    ('181-365', 181, 365),
+    ('>365', 366, None)
+)
+
+# Percentiles del tiempo de cierre que se devuelven
+PERCENTILES = (50, 75, 90)
+
+# Dimensiones por las que se agrupan los tiempos de cierre
+CLOSE_TIME_DIMENSIONS = {'abogado': 'abogado_id', 'prioridad': 'prioridad'}
+
+class CloseTime(db.Model):
+    """Histograma de días hasta el cierre por mes de cierre, abogado y prioridad
+
+    Los casos cerrados casi nunca cambian, así que en lugar de recorrerlos en
+    cada informe se mantiene, en la misma transacción que cada escritura, el
+    número de casos cerrados en cada (mes, abogado, prioridad, días). Los
+    percentiles se calculan sobre este histograma, cuyo tamaño depende de los
+    días distintos y no del número de casos. Los casos archivados siguen
+    contando: el archivo los borra con SQL directo, sin pasar por la sesión.
+    """
+    __tablename__ = 'analitica_cierres'
+
+    mes = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM' de fecha_cierre
+    abogado_id = db.Column(db.Integer, primary_key=True)  # 0: sin abogado asignado
+    prioridad = db.Column(db.String(20), primary_key=True)
+    dias = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+def close_time_key(estado, abogado_id, prioridad, fecha_apertura, fecha_cierre):
+    """Celda del histograma de un caso, o None si no está cerrado con fecha de cierre"""
+    if estado not in COLD_STATES or fecha_apertura is None or fecha_cierre is None:
+        return None
+    return (
+        fecha_cierre.strftime('%Y-%m'),
+        abogado_id or 0,
+        prioridad,
+        max((fecha_cierre - fecha_apertura).days, 0)
+    )
+
+_KEY_ATTRS = ('estado', 'abogado_asignado_id', 'prioridad', 'fecha_apertura', 'fecha_cierre')
+
+def _previous(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+def _collect_deltas(session):
+    """Variación del histograma causada por los casos del flush"""
+    deltas = defaultdict(int)
+
+    def add(key, sign):
+        if key is not None:
+            deltas[key] += sign
+
+    for obj in session.new:
+        if isinstance(obj, Case):
+            add(close_time_key(*(getattr(obj, attr) for attr in _KEY_ATTRS)), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Case):
+            add(close_time_key(*(_previous(obj, attr) for attr in _KEY_ATTRS)), -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Case):
+            old = close_time_key(*(_previous(obj, attr) for attr in _KEY_ATTRS))
+            new = close_time_key(*(getattr(obj, attr) for attr in _KEY_ATTRS))
+            if old != new:
+                add(old, -1)
+                add(new, 1)
+
+    return {key: total for key, total in deltas.items() if total}
+
+_ADD_TO_CELL = text("""
+    INSERT INTO analitica_cierres (mes, abogado_id, prioridad, dias, total)
+    VALUES (:mes, :abogado_id, :prioridad, :dias, :total)
+    ON CONFLICT (mes, abogado_id, prioridad, dias) DO UPDATE SET total = total + excluded.total
+""")
+
+def apply_close_time_deltas(connection, deltas):
+    """Sumar al histograma las variaciones {(mes, abogado_id, prioridad, dias): total}"""
+    if deltas:
+        # Un solo executemany: en la carga masiva son decenas de miles de celdas
+        connection.execute(_ADD_TO_CELL, [
+            {'mes': mes, 'abogado_id': abogado_id, 'prioridad': prioridad, 'dias': dias, 'total': total}
+            for (mes, abogado_id, prioridad, dias), total in sorted(deltas.items())
+        ])
+        connection.execute(text('DELETE FROM analitica_cierres WHERE total = 0'))
+
+@event.listens_for(Session, 'after_flush')
+def _update_close_times(session, flush_context):
+    """Mantener el histograma de tiempos de cierre en la misma transacción"""
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_close_time_deltas(session.connection(), deltas)
+
+def rebuild_close_times(connection):
+    """Recalcular el histograma desde los casos de la tabla principal"""
+    connection.execute(text('DELETE FROM analitica_cierres'))
+    connection.execute(text("""
+        INSERT INTO analitica_cierres (mes, abogado_id, prioridad, dias, total)
+        SELECT strftime('%Y-%m', fecha_cierre), COALESCE(abogado_asignado_id, 0), prioridad,
+               MAX(CAST(julianday(fecha_cierre) - julianday(fecha_apertura) AS INTEGER), 0) AS dias,
+               COUNT(*)
+        FROM casos
+        WHERE estado IN ('cerrado', 'archivado')
+          AND fecha_apertura IS NOT NULL AND fecha_cierre IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """))
+
+def _lawyer_names(ids):
+    ids = [user_id for user_id in ids if user_id]
+    if not ids:
+        return {}
+    return dict(db.session.query(User.id, User.nombre_completo).filter(User.id.in_(ids)).all())
+
+def open_age_buckets():
+    """Casos abiertos por tramo de antigüedad y estado, en una sola consulta agrupada"""
+    bucket = ' '.join(
+        f"WHEN edad <= {maximum} THEN '{label}'" if maximum is not None else f"ELSE '{label}'"
+        for label, _, maximum in AGE_BUCKETS
+    )
+    rows = db.session.execute(text(f"""
+        SELECT CASE {bucket} END AS tramo, estado, COUNT(*) AS total
+        FROM (
+            SELECT estado, CAST(julianday('now') - julianday(fecha_apertura) AS INTEGER) AS edad
+            FROM casos
+            WHERE estado NOT IN ('cerrado', 'archivado') AND fecha_apertura IS NOT NULL
+        )
+        GROUP BY tramo, estado
+    """)).all()
+
+    buckets = {label: {'tramo': label, 'desde_dias': minimum, 'hasta_dias': maximum, 'total': 0, 'por_estado': {}}
+               for label, minimum, maximum in AGE_BUCKETS}
+    for tramo, estado, total in rows:
+        buckets[tramo]['total'] += total
+        buckets[tramo]['por_estado'][estado] = total
+    return list(buckets.values())
+
+def open_load_by_lawyer():
+    """Carga abierta de cada abogado: casos por estado, urgentes y antigüedad"""
+    rows = db.session.execute(text("""
+        SELECT abogado_asignado_id AS abogado_id,
+               COUNT(*) AS abiertos,
+               SUM(estado = 'pendiente') AS pendientes,
+               SUM(estado = 'en_proceso') AS en_proceso,
+               SUM(prioridad = 'urgente') AS urgentes,
+               SUM(prioridad = 'alta') AS alta,
+               AVG(julianday('now') - julianday(fecha_apertura)) AS edad_media,
+               MAX(julianday('now') - julianday(fecha_apertura)) AS edad_maxima
+        FROM casos
+        WHERE estado NOT IN ('cerrado', 'archivado')
+        GROUP BY abogado_asignado_id
+        ORDER BY abiertos DESC
+    """)).mappings().all()
+
+    names = _lawyer_names(row['abogado_id'] for row in rows)
+    return [{
+        'abogado_id': row['abogado_id'],
+        'abogado_nombre': names.get(row['abogado_id']),
+        'abiertos': row['abiertos'],
+        'pendientes': row['pendientes'],
+        'en_proceso': row['en_proceso'],
+        'urgentes': row['urgentes'],
+        'alta': row['alta'],
+        'edad_media_dias': round(row['edad_media'], 1) if row['edad_media'] is not None else None,
+        'edad_maxima_dias': int(row['edad_maxima']) if row['edad_maxima'] is not None else None
+    } for row in rows]
+
+def close_time_percentiles(dimension, desde=None, hasta=None):
+    """Percentiles, media y número de casos cerrados del tiempo de cierre por dimensión
+
+    `desde` y `hasta` son meses 'YYYY-MM' de cierre (incluidos). El
+    percentil p es el menor número de días cuyo acumulado alcanza el p% de
+    los casos del grupo (rango más cercano), con funciones de ventana sobre
+    el histograma.
+    """
+    column = CLOSE_TIME_DIMENSIONS[dimension]
+    conditions = []
+    params = {}
+    if desde:
+        conditions.append('mes >= :desde')
+        params['desde'] = desde
+    if hasta:
+        conditions.append('mes <= :hasta')
+        params['hasta'] = hasta
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    percentiles = ', '.join(
+        f'MIN(CASE WHEN acumulado * 100 >= casos * {p} THEN dias END) AS p{p}' for p in PERCENTILES
+    )
+
+    rows = db.session.execute(text(f"""
+        SELECT grupo, MAX(casos) AS casos, SUM(dias * total) * 1.0 / MAX(casos) AS media,
+               MIN(dias) AS minimo, MAX(dias) AS maximo, {percentiles}
+        FROM (
+            SELECT grupo, dias, total,
+                   SUM(total) OVER (PARTITION BY grupo ORDER BY dias) AS acumulado,
+                   SUM(total) OVER (PARTITION BY grupo) AS casos
+            FROM (
+                SELECT {column} AS grupo, dias, SUM(total) AS total
+                FROM analitica_cierres {where}
+                GROUP BY {column}, dias
+            )
+        )
+        GROUP BY grupo
+        ORDER BY casos DESC
+    """), params).mappings().all()
+
+    names = _lawyer_names(row['grupo'] for row in rows) if dimension == 'abogado' else {}
+    result = []
+    for row in rows:
+        item = {
+            'casos': row['casos'],
+            'media_dias': round(row['media'], 1),
+            'minimo_dias': row['minimo'],
+            'maximo_dias': row['maximo'],
+            **{f'p{p}_dias': row[f'p{p}'] for p in PERCENTILES}
+        }
+        if dimension == 'abogado':
+            abogado_id = row['grupo'] or None
+            item = {'abogado_id': abogado_id, 'abogado_nombre': names.get(abogado_id), **item}
+        else:
+            item = {'prioridad': row['grupo'], **item}
+        result.append(item)
+    return result
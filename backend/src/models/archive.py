@@ -0,0 +1,107 @@
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import MetaData, Table, Column, Index, select, func
+from sqlalchemy.orm import aliased
+from src.models.user import db
+from src.models.case import Case, Equipment, AgendaEvent, Transaction
+from src.cache import invalidate_tables
+
+ARCHIVE_SCHEMA = 'archivo'
+COLD_STATES = ('cerrado', 'archivado')
+
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+def _archive_table(model):
+    """Copia de la tabla del modelo en el archivo (mismas columnas, sin claves foráneas)"""
+    hot = model.__table__
+    return Table(
+        hot.name,
+        archive_metadata,
+        *[Column(column.name, column.type, primary_key=column.primary_key) for column in hot.columns]
+    )
+
+# Un caso se archiva junto con sus equipos, eventos de agenda y transacciones
+ARCHIVE_TABLES = {model: _archive_table(model) for model in (Equipment, AgendaEvent, Transaction, Case)}
+
+Index('ix_archivo_casos_cliente', ARCHIVE_TABLES[Case].c.cliente_id)
+Index('ix_archivo_equipos_caso', ARCHIVE_TABLES[Equipment].c.caso_id)
+Index('ix_archivo_agenda_caso', ARCHIVE_TABLES[AgendaEvent].c.caso_id)
+Index('ix_archivo_transacciones_caso', ARCHIVE_TABLES[Transaction].c.caso_id)
+
+def attach_archive():
+    """Adjuntar la base de datos del archivo a la conexión actual si aún no lo está
+
+    SQLite no permite ATTACH dentro de una transacción de escritura, así que
+    debe llamarse antes de modificar nada. La conexión del pool queda adjuntada.
+    """
+    connection = db.session.connection()
+    if _attach(connection):
+        archive_metadata.create_all(connection)
+    return connection
+
+def _attach(connection):
+    """ATTACH del archivo en `connection`; False si ya estaba adjuntado"""
+    attached = {row[1] for row in connection.exec_driver_sql('PRAGMA database_list')}
+    if ARCHIVE_SCHEMA in attached:
+        return False
+    connection.exec_driver_sql(
+        f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (current_app.config['ARCHIVE_DATABASE_PATH'],)
+    )
+    return True
+
+def attach_existing_archive(connection):
+    """Adjuntar el archivo, si ya existe, a una conexión que va a abrir su transacción
+
+    Para conexiones que escriben siempre dentro de una transacción (el
+    escritor único): se llama justo antes del BEGIN, cuando ATTACH aún se
+    permite. No crea el archivo si todavía no hay nada archivado.
+    """
+    if os.path.exists(current_app.config['ARCHIVE_DATABASE_PATH']):
+        _attach(connection)
+
+def archived_entity(model):
+    """Entidad de solo lectura que une la tabla caliente con la del archivo"""
+    attach_archive()
+    hot = model.__table__
+    union = select(*hot.c).union_all(select(*ARCHIVE_TABLES[model].c)).subquery(f'{hot.name}_con_archivo')
+    return aliased(model, union)
+
+def archive_cold_cases(older_than_days=None, batch_size=None):
+    """Mover al archivo los casos fríos cerrados antes de la fecha de corte
+
+    Cada lote se copia y se borra en una misma transacción. Con la base
+    principal en modo WAL SQLite solo garantiza atomicidad por fichero, así
+    que la copia usa INSERT OR REPLACE: si un lote se repite tras un fallo no
+    se pierde ni se duplica nada. Se usa SQL directo: los totales diarios y
+    los contadores de clientes no cambian, porque los datos siguen existiendo.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    db.session.commit()
+    archived = 0
+    while True:
+        connection = attach_archive()
+        case_ids = connection.execute(
+            select(Case.id).where(
+                Case.estado.in_(COLD_STATES),
+                func.coalesce(Case.fecha_cierre, Case.fecha_apertura) < cutoff
+            ).order_by(Case.id).limit(batch_size)
+        ).scalars().all()
+        if not case_ids:
+            break
+
+        for model, cold in ARCHIVE_TABLES.items():
+            hot = model.__table__
+            predicate = (hot.c.id if model is Case else hot.c.caso_id).in_(case_ids)
+            connection.execute(cold.insert().prefix_with('OR REPLACE').from_select(list(hot.c.keys()), select(*hot.c).where(predicate)))
+            connection.execute(hot.delete().where(predicate))
+
+        invalidate_tables(db.session(), *(model.__table__.name for model in ARCHIVE_TABLES))
+        db.session.commit()
+        archived += len(case_ids)
+
+    return archived
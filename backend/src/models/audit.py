@@ -0,0 +1,340 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from flask import current_app, has_request_context, session as flask_session
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Text, Index, event, inspect, select, literal, text, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable, CreateIndex
+from src.models.user import db
+from src.models.case import Case, Client, Equipment
+
+# modelo -> tipo de entidad en la auditoría
+AUDITED_MODELS = {
+    Case: 'case',
+    Client: 'client',
+    Equipment: 'equipment',
+}
+
+# Columnas derivadas que se recalculan solas (src/models/counters.py): no son cambios de nadie
+IGNORED_COLUMNS = {'total_casos', 'casos_activos', 'total_equipos'}
+
+PARTITION_PREFIX = 'auditoria_'
+
+# Particiones mensuales (auditoria_YYYYMM); no forman parte de db.metadata
+# porque se crean a medida que llegan entradas de cada mes
+_partitions = MetaData()
+_partitions_lock = threading.Lock()
+_created = set()
+
+def partition_name(fecha):
+    return f'{PARTITION_PREFIX}{fecha:%Y%m}'
+
+def partition_table(name):
+    """Tabla de un mes de auditoría con sus índices de consulta"""
+    with _partitions_lock:
+        if name in _partitions.tables:
+            return _partitions.tables[name]
+        return Table(
+            name, _partitions,
+            Column('id', Integer, primary_key=True),
+            Column('fecha', DateTime, nullable=False),
+            Column('tipo_entidad', String(20), nullable=False),
+            Column('entidad_id', Integer, nullable=False),
+            Column('accion', String(20), nullable=False),  # 'creado', 'actualizado', 'eliminado'
+            Column('cambios', Text, nullable=False),  # JSON {campo: [antes, después]}
+            Column('usuario_id', Integer),
+            Index(f'ix_{name}_entidad', 'tipo_entidad', 'entidad_id', 'fecha'),
+            Index(f'ix_{name}_usuario', 'usuario_id', 'fecha'),
+            Index(f'ix_{name}_fecha', 'fecha'),
+        )
+
+def _ensure_partition(connection, table):
+    if table.name in _created:
+        return
+    # IF NOT EXISTS: otro proceso puede estar creando el mismo mes a la vez
+    connection.execute(CreateTable(table, if_not_exists=True))
+    for index in table.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+    for operation in ('UPDATE', 'DELETE'):
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {table.name}_no_{operation.lower()}
+            BEFORE {operation} ON {table.name}
+            BEGIN
+                SELECT RAISE(ABORT, 'La tabla {table.name} es de solo inserción');
+            END
+        """))
+    _created.add(table.name)
+
+def write_audit_entries(connection, entries):
+    """Insertar las entradas agrupadas por mes: un INSERT por partición"""
+    by_partition = defaultdict(list)
+    for entry in entries:
+        by_partition[partition_name(entry['fecha'])].append(entry)
+    for name, rows in sorted(by_partition.items()):
+        table = partition_table(name)
+        _ensure_partition(connection, table)
+        connection.execute(table.insert(), rows)
+
+class AuditBuffer:
+    """Búfer acotado de entradas de auditoría de un proceso
+
+    Las peticiones solo encolan; un hilo las escribe por lotes cuando se
+    junta AUDIT_BATCH_SIZE o pasa AUDIT_FLUSH_INTERVAL_MS. Si el búfer se
+    llena, quien encola escribe él mismo lo pendiente (contrapresión en
+    lugar de perder entradas). Al salir el proceso se vacía lo que quede.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.entries = queue.Queue(maxsize=app.config['AUDIT_BUFFER_SIZE'])
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL_MS'] / 1000
+        self.write_lock = threading.Lock()
+        self.stats = {'escritas': 0, 'lotes': 0, 'errores': 0, 'desbordes': 0}
+        self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def put(self, entries):
+        for entry in entries:
+            try:
+                self.entries.put_nowait(entry)
+            except queue.Full:
+                self.stats['desbordes'] += 1
+                self.flush()
+                self.entries.put(entry)
+
+    def _drain(self, batch, limit):
+        while len(batch) < limit:
+            try:
+                batch.append(self.entries.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.write_lock:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    write_audit_entries(connection, batch)
+            self.stats['escritas'] += len(batch)
+            self.stats['lotes'] += 1
+
+    def flush(self):
+        """Escribir ahora todo lo pendiente en el hilo que llama"""
+        batch = self._drain([], self.entries.maxsize)
+        if batch:
+            self._write(batch)
+
+    def _run(self):
+        while True:
+            batch = [self.entries.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.entries.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._drain(batch, self.batch_size)
+
+            while True:
+                try:
+                    self._write(batch)
+                    break
+                except Exception as e:
+                    # Reintentar el mismo lote: la auditoría no se descarta
+                    self.stats['errores'] += 1
+                    self.app.logger.error(f'Error al escribir {len(batch)} entradas de auditoría: {e}')
+                    time.sleep(1)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def _get_buffer(app):
+    global _buffer
+    with _buffer_lock:
+        # Tras un fork el hilo del padre no existe: cada proceso crea el suyo
+        if _buffer is None or _buffer.pid != os.getpid():
+            _buffer = AuditBuffer(app)
+        return _buffer
+
+def audit_stats():
+    """Estado del búfer de auditoría de este proceso"""
+    if _buffer is None or _buffer.pid != os.getpid():
+        return {'pendientes': 0, 'escritas': 0, 'lotes': 0, 'errores': 0, 'desbordes': 0}
+    return {'pendientes': _buffer.entries.qsize(), **_buffer.stats}
+
+def flush_audit():
+    if _buffer is not None and _buffer.pid == os.getpid():
+        _buffer.flush()
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _diff(obj, accion):
+    """Cambios {campo: [antes, después]} de las columnas del objeto"""
+    state = inspect(obj)
+    changes = {}
+    for prop in state.mapper.column_attrs:
+        key = prop.key
+        if key in IGNORED_COLUMNS:
+            continue
+        if accion == 'actualizado':
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before == after:
+                continue
+            changes[key] = [_json_value(before), _json_value(after)]
+        elif key in state.dict:
+            value = _json_value(state.dict[key])
+            if value is not None:
+                changes[key] = [None, value] if accion == 'creado' else [value, None]
+    return changes
+
+@event.listens_for(Session, 'after_flush')
+def _capture_audit(session, flush_context):
+    """Guardar en la sesión los cambios campo a campo; se encolan al confirmar"""
+    now = datetime.utcnow()
+    usuario_id = session.info.get('usuario_id')  # escrituras del hilo escritor (src/models/writer.py)
+    if usuario_id is None and has_request_context():
+        usuario_id = flask_session.get('user_id')
+    savepoint = session.get_nested_transaction()
+    pending = session.info.setdefault('audit_pending', [])
+
+    for accion, objects in (('creado', session.new), ('actualizado', session.dirty), ('eliminado', session.deleted)):
+        for obj in objects:
+            tipo = AUDITED_MODELS.get(type(obj))
+            if tipo is None:
+                continue
+            changes = _diff(obj, accion)
+            if not changes:
+                continue
+            identity = inspect(obj).identity  # las altas aún no tienen identidad en after_flush
+            pending.append((savepoint, {
+                'fecha': now,
+                'tipo_entidad': tipo,
+                'entidad_id': identity[0] if identity else obj.id,
+                'accion': accion,
+                'cambios': json.dumps(changes, default=str),
+                'usuario_id': usuario_id
+            }))
+
+def record_audit(session, entries):
+    """Añadir entradas calculadas fuera del flush (p. ej. por un UPDATE masivo); se encolan al confirmar"""
+    savepoint = session.get_nested_transaction()
+    session.info.setdefault('audit_pending', []).extend((savepoint, entry) for entry in entries)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_audit(session, previous_transaction):
+    """Descartar lo capturado en la transacción (o el SAVEPOINT) deshecha"""
+    pending = session.info.get('audit_pending')
+    if not pending:
+        return
+    if previous_transaction.nested:
+        pending[:] = [item for item in pending if item[0] is not previous_transaction]
+    else:
+        pending.clear()
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_audit(session):
+    savepoint = session.get_nested_transaction()
+    if savepoint is not None:
+        # RELEASE de un SAVEPOINT: lo capturado pasa a depender de la transacción que lo contiene
+        parent = savepoint.parent if savepoint.parent.nested else None
+        pending = session.info.get('audit_pending', [])
+        pending[:] = [(parent if tag is savepoint else tag, entry) for tag, entry in pending]
+        return
+
+    pending = session.info.pop('audit_pending', None)
+    if not pending:
+        return
+    entries = [entry for _, entry in pending]
+
+    if has_request_context():
+        _get_buffer(current_app._get_current_object()).put(entries)
+        return
+
+    # Fuera de una petición (arranque, comandos flask, hilos de fondo) se escribe
+    # al confirmar, en un solo lote y sin arrancar hilos (p. ej. en el maestro de gunicorn)
+    try:
+        with db.engine.begin() as connection:
+            write_audit_entries(connection, entries)
+    except Exception as e:
+        current_app.logger.error(f'Error al escribir {len(entries)} entradas de auditoría: {e}')
+
+def audit_partitions():
+    """Nombres de las particiones mensuales existentes, de la más antigua a la más reciente"""
+    return [
+        row[0] for row in db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB :pattern ORDER BY name"
+        ), {'pattern': f'{PARTITION_PREFIX}[0-9][0-9][0-9][0-9][0-9][0-9]'})
+    ]
+
+def query_audit(tipo_entidad=None, entidad_id=None, usuario_id=None, campo=None,
+                since=None, until=None, limit=50, offset=0):
+    """Entradas de auditoría filtradas, de la más reciente a la más antigua
+
+    Solo se consultan las particiones de los meses del rango; cada una
+    resuelve el filtro con su propio índice y se unen con UNION ALL.
+    """
+    names = audit_partitions()
+    if since is not None:
+        names = [name for name in names if name >= partition_name(since)]
+    if until is not None:
+        names = [name for name in names if name <= partition_name(until)]
+    if not names:
+        return [], False
+
+    selects = []
+    for name in names:
+        table = partition_table(name)
+        query = select(
+            literal(name).label('particion'), table.c.id, table.c.fecha, table.c.tipo_entidad,
+            table.c.entidad_id, table.c.accion, table.c.cambios, table.c.usuario_id
+        )
+        if tipo_entidad:
+            query = query.where(table.c.tipo_entidad == tipo_entidad)
+        if entidad_id is not None:
+            query = query.where(table.c.entidad_id == entidad_id)
+        if usuario_id is not None:
+            query = query.where(table.c.usuario_id == usuario_id)
+        if since is not None:
+            query = query.where(table.c.fecha >= since)
+        if until is not None:
+            query = query.where(table.c.fecha < until)
+        if campo:
+            query = query.where(text(
+                f'EXISTS (SELECT 1 FROM json_each({name}.cambios) WHERE json_each.key = :campo)'
+            ).bindparams(campo=campo))
+        selects.append(query)
+
+    combined = union_all(*selects).subquery()
+    rows = db.session.execute(
+        select(combined).order_by(combined.c.fecha.desc(), combined.c.particion.desc(), combined.c.id.desc())
+        .limit(limit + 1).offset(offset)
+    ).mappings().all()
+
+    entries = [{
+        'id': f"{row['particion'][len(PARTITION_PREFIX):]}-{row['id']}",
+        'fecha': row['fecha'].isoformat() if row['fecha'] else None,
+        'tipo_entidad': row['tipo_entidad'],
+        'entidad_id': row['entidad_id'],
+        'accion': row['accion'],
+        'cambios': json.loads(row['cambios']),
+        'usuario_id': row['usuario_id']
+    } for row in rows[:limit]]
+    return entries, len(rows) > limit
@@ -0,0 +1,221 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from src.models.user import db
+
+try:
+    import fcntl
+except ImportError:  # sin flock (Windows) no se impiden copias simultáneas entre procesos
+    fcntl = None
+
+class BackupRun(db.Model):
+    """Ejecución de una copia de seguridad en caliente de la base de datos"""
+    __tablename__ = 'copias_seguridad'
+    __table_args__ = (
+        db.Index('ix_copias_seguridad_fecha', 'fecha_inicio'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    archivo = db.Column(db.String(255))
+    estado = db.Column(db.String(20), nullable=False, default='en_proceso')  # 'en_proceso', 'completado', 'error'
+    fecha_inicio = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    fecha_fin = db.Column(db.DateTime)
+    duracion_segundos = db.Column(db.Float)
+    espera_segundos = db.Column(db.Float)  # pausas de la limitación de E/S
+    paginas = db.Column(db.Integer)
+    pasos = db.Column(db.Integer)
+    reinicios = db.Column(db.Integer)  # la base de datos cambió durante la copia y se empezó de nuevo
+    bytes = db.Column(db.BigInteger)
+    sha256 = db.Column(db.String(64))
+    integridad = db.Column(db.String(200))  # resultado de PRAGMA integrity_check sobre la copia
+    error = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'archivo': self.archivo,
+            'disponible': bool(self.archivo) and os.path.exists(self.archivo),
+            'estado': self.estado,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'duracion_segundos': self.duracion_segundos,
+            'espera_segundos': self.espera_segundos,
+            'paginas': self.paginas,
+            'pasos': self.pasos,
+            'reinicios': self.reinicios,
+            'bytes': self.bytes,
+            'bytes_por_segundo': round(self.bytes / self.duracion_segundos) if self.bytes and self.duracion_segundos else None,
+            'sha256': self.sha256,
+            'integridad': self.integridad,
+            'error': self.error,
+            'usuario_id': self.usuario_id
+        }
+
+class BackupInProgress(Exception):
+    """Otra copia de seguridad está en curso"""
+
+class _TooManyRestarts(Exception):
+    pass
+
+def _copy_database(source_path, target_path, pages, max_rate, max_restarts):
+    """Copiar con la API de backup de SQLite por pasos de `pages` páginas
+
+    Cada paso toma el bloqueo de lectura solo mientras dura, y entre pasos
+    se duerme lo necesario para no superar `max_rate` bytes/s, así que el
+    tráfico sigue escribiendo. Si otra conexión modifica la base de datos
+    entre pasos SQLite reinicia la copia; tras `max_restarts` reinicios se
+    copia el resto en una sola pasada (con WAL lee una instantánea y no
+    bloquea a los escritores).
+    """
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+    page_size = source.execute('PRAGMA page_size').fetchone()[0]
+    stats = {'pasos': 0, 'reinicios': 0, 'espera_segundos': 0.0, 'paginas': 0}
+    state = {'remaining': None, 'step_started': time.monotonic()}
+
+    def progress(status, remaining, total):
+        stats['pasos'] += 1
+        stats['paginas'] = total
+        if state['remaining'] is not None and remaining > state['remaining']:
+            stats['reinicios'] += 1
+            if stats['reinicios'] > max_restarts:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+
+        if max_rate and remaining:
+            pause = pages * page_size / max_rate - (time.monotonic() - state['step_started'])
+            if pause > 0:
+                time.sleep(pause)
+                stats['espera_segundos'] += pause
+        state['step_started'] = time.monotonic()
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            source.backup(target, pages=-1)
+            stats['pasos'] += 1
+
+        # La copia es un archivo autónomo: sin WAL
+        target.execute('PRAGMA journal_mode = DELETE')
+        stats['paginas'] = target.execute('PRAGMA page_count').fetchone()[0]
+        stats['integridad'] = '; '.join(row[0] for row in target.execute('PRAGMA integrity_check'))[:200]
+    finally:
+        target.close()
+        source.close()
+    return stats
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as copy:
+        for block in iter(lambda: copy.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def rotate_backups(directory, keep):
+    """Borrar las copias más antiguas y dejar solo las `keep` más recientes"""
+    copies = sorted(glob.glob(os.path.join(directory, 'app-*.db')))
+    removed = copies[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def snapshot_database(target_path, pages=None, max_rate=None):
+    """Copiar en caliente la base de datos en `target_path` y verificar la copia
+
+    Devuelve las estadísticas de _copy_database; lanza RuntimeError si
+    PRAGMA integrity_check no devuelve 'ok'.
+    """
+    config = current_app.config
+    stats = _copy_database(
+        db.engine.url.database, target_path,
+        pages or config['BACKUP_PAGES_PER_STEP'],
+        config['BACKUP_MAX_BYTES_PER_SECOND'] if max_rate is None else max_rate,
+        config['BACKUP_MAX_RESTARTS']
+    )
+    if stats['integridad'] != 'ok':
+        raise RuntimeError(f"La copia no superó la verificación de integridad: {stats['integridad']}")
+    return stats
+
+def start_backup(usuario_id=None):
+    """Registrar una ejecución en curso; se confirma a través de run_write"""
+    run = BackupRun(usuario_id=usuario_id)
+    db.session.add(run)
+    db.session.flush()
+    return run
+
+def run_backup(run_id, pages=None, max_rate=None):
+    """Hacer la copia de una ejecución: copiar, verificar, publicar y rotar
+
+    La copia se escribe en un archivo .part y solo se renombra a su nombre
+    final si PRAGMA integrity_check devuelve 'ok'.
+    """
+    config = current_app.config
+    pages = pages or config['BACKUP_PAGES_PER_STEP']
+    max_rate = config['BACKUP_MAX_BYTES_PER_SECOND'] if max_rate is None else max_rate
+    directory = config['BACKUP_DIR']
+    os.makedirs(directory, exist_ok=True)
+
+    run = BackupRun.query.get(run_id)
+    started = time.monotonic()
+    target = os.path.join(directory, f'app-{run.fecha_inicio:%Y%m%d-%H%M%S}-{run.id}.db')
+    partial = f'{target}.part'
+
+    with open(os.path.join(directory, 'backup.lock'), 'a+') as lock_file:
+        try:
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise BackupInProgress('Ya hay una copia de seguridad en curso')
+
+            # Cerrar la transacción de lectura de la sesión antes de copiar
+            db.session.commit()
+            if os.path.exists(partial):
+                os.remove(partial)
+            stats = snapshot_database(partial, pages, max_rate)
+            os.replace(partial, target)
+
+            run.archivo = target
+            run.estado = 'completado'
+            run.bytes = os.path.getsize(target)
+            run.sha256 = _sha256(target)
+            for field in ('paginas', 'pasos', 'reinicios', 'espera_segundos', 'integridad'):
+                setattr(run, field, stats[field])
+            rotate_backups(directory, config['BACKUP_KEEP'])
+        except Exception as e:
+            run.estado = 'error'
+            run.error = str(e)
+            if os.path.exists(partial):
+                os.remove(partial)
+            if not isinstance(e, BackupInProgress):
+                raise
+        finally:
+            run.fecha_fin = datetime.utcnow()
+            run.duracion_segundos = round(time.monotonic() - started, 3)
+            db.session.commit()
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return run
+
+def run_backup_in_background(run_id):
+    """Lanzar run_backup en un hilo con su propio contexto de aplicación"""
+    app = current_app._get_current_object()
+
+    def target():
+        with app.app_context():
+            try:
+                run_backup(run_id)
+            except Exception as e:
+                app.logger.error(f'Error en copia de seguridad {run_id}: {e}')
+
+    thread = threading.Thread(target=target, name=f'backup-{run_id}', daemon=True)
+    thread.start()
+    return thread
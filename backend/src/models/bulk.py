@@ -0,0 +1,213 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from flask import has_request_context, session as flask_session
+from sqlalchemy import and_, or_, func, select, update
+from src.models.user import db
+from src.models.case import Case, Client, Contact
+from src.models.activity import ActivityEvent, DESCRIPTIONS
+from src.models.audit import record_audit
+from src.models.counters import is_active_case, apply_counter_deltas
+from src.models.analytics import close_time_key, apply_close_time_deltas
+from src.cache import invalidate_tables
+
+# Campos de casos que se pueden cambiar en bloque
+CASE_BULK_FIELDS = ('estado', 'prioridad', 'abogado_asignado_id')
+
+# Columnas de los casos en el orden del modelo (el registro de actividad las lista así)
+_CASE_COLUMNS = [column.name for column in Case.__table__.columns]
+
+def _usuario_id(session):
+    usuario_id = session.info.get('usuario_id')  # escrituras del hilo escritor (src/models/writer.py)
+    if usuario_id is None and has_request_context():
+        usuario_id = flask_session.get('user_id')
+    return usuario_id
+
+def _parse_datetime(value, field):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser una fecha ISO 8601')
+
+def _ids(data):
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(value, int) for value in ids):
+        raise ValueError('ids debe ser una lista de ids enteros')
+    return ids
+
+def case_selection(data):
+    """Condiciones de los casos elegidos por `ids` o por `filtro`
+
+    El filtro admite estado (uno o una lista), prioridad, abogado_asignado_id
+    (null para los casos sin abogado), cliente_id y abierto_antes (fecha ISO).
+    """
+    if 'ids' in data:
+        return [Case.id.in_(_ids(data))]
+
+    filtro = data.get('filtro')
+    if not isinstance(filtro, dict) or not filtro:
+        raise ValueError('Se requiere ids o un filtro')
+
+    conditions = []
+    for field in filtro:
+        value = filtro[field]
+        if field == 'estado':
+            conditions.append(Case.estado.in_(value) if isinstance(value, list) else Case.estado == value)
+        elif field in ('prioridad', 'cliente_id'):
+            conditions.append(getattr(Case, field) == value)
+        elif field == 'abogado_asignado_id':
+            conditions.append(Case.abogado_asignado_id.is_(None) if value is None else Case.abogado_asignado_id == value)
+        elif field == 'abierto_antes':
+            conditions.append(Case.fecha_apertura < _parse_datetime(value, 'abierto_antes'))
+        else:
+            raise ValueError(f'Filtro no soportado: {field}')
+    return conditions
+
+def bulk_update_cases(conditions, values):
+    """Aplicar `values` a los casos que cumplen `conditions` con un solo UPDATE
+
+    Solo se tocan las filas en las que algo cambia. Al cerrar se sella
+    fecha_cierre en los casos que aún no la tienen, como en la edición
+    individual. El UPDATE directo no pasa por los eventos de la sesión, así
+    que aquí mismo, en la misma transacción, se ajustan los contadores de
+    clientes, el histograma de tiempos de cierre, el registro de actividad y
+    la auditoría, a partir de los valores anteriores de las filas afectadas.
+    Devuelve (casos seleccionados, casos actualizados).
+    """
+    unknown = set(values) - set(CASE_BULK_FIELDS)
+    if unknown or not values:
+        raise ValueError(f"Campos permitidos: {', '.join(CASE_BULK_FIELDS)}")
+
+    session = db.session()  # la sesión del ámbito actual (no el proxy)
+    session.flush()
+    connection = session.connection()
+    now = datetime.utcnow()
+
+    changes = [getattr(Case, field).is_distinct_from(value) for field, value in values.items()]
+    assignments = dict(values)
+    if values.get('estado') == 'cerrado':
+        changes.append(Case.fecha_cierre.is_(None))
+        assignments['fecha_cierre'] = func.coalesce(Case.fecha_cierre, now)
+    where = and_(*conditions, or_(*changes))
+
+    matched = connection.execute(select(func.count()).select_from(Case).where(*conditions)).scalar()
+    # En la misma transacción que el UPDATE: con WAL, si otro proceso escribe
+    # entre medias, SQLite rechaza el UPDATE en vez de usar filas viejas
+    before = connection.execute(select(Case.__table__).where(where)).mappings().all()
+    if not before:
+        return matched, 0
+    updated = connection.execute(update(Case).where(where).values(**assignments)).rowcount
+
+    clients = defaultdict(lambda: [0, 0])
+    close_times = defaultdict(int)
+    activity = []
+    audit = []
+    usuario_id = _usuario_id(session)
+
+    for old in before:
+        new = dict(old)
+        new.update(values)
+        if values.get('estado') == 'cerrado' and new['fecha_cierre'] is None:
+            new['fecha_cierre'] = now
+
+        active_delta = int(is_active_case(new['estado'])) - int(is_active_case(old['estado']))
+        if active_delta and old['cliente_id'] is not None:
+            clients[old['cliente_id']][1] += active_delta
+
+        old_key = close_time_key(*(old[column] for column in ('estado', 'abogado_asignado_id', 'prioridad', 'fecha_apertura', 'fecha_cierre')))
+        new_key = close_time_key(*(new[column] for column in ('estado', 'abogado_asignado_id', 'prioridad', 'fecha_apertura', 'fecha_cierre')))
+        if old_key != new_key:
+            if old_key is not None:
+                close_times[old_key] -= 1
+            if new_key is not None:
+                close_times[new_key] += 1
+
+        changed = [column for column in _CASE_COLUMNS if new[column] != old[column]]
+        if 'estado' in changed:
+            action = 'cerrado' if new['estado'] == 'cerrado' else 'estado'
+            detail = {'priority': new['prioridad'], 'estado': new['estado']}
+        else:
+            action = 'actualizado'
+            detail = {'priority': new['prioridad'], 'campos': changed}
+        activity.append({
+            'fecha': now,
+            'tipo_entidad': 'case',
+            'entidad_id': old['id'],
+            'accion': action,
+            'descripcion': DESCRIPTIONS['case'][action].format(old['titulo'])[:300],
+            'detalle': json.dumps(detail),
+            'usuario_id': usuario_id
+        })
+        audit.append({
+            'fecha': now,
+            'tipo_entidad': 'case',
+            'entidad_id': old['id'],
+            'accion': 'actualizado',
+            'cambios': json.dumps({
+                column: [
+                    old[column].isoformat() if isinstance(old[column], datetime) else old[column],
+                    new[column].isoformat() if isinstance(new[column], datetime) else new[column]
+                ] for column in changed
+            }),
+            'usuario_id': usuario_id
+        })
+
+    apply_counter_deltas(connection, clients, {})
+    apply_close_time_deltas(connection, {key: total for key, total in close_times.items() if total})
+    connection.execute(ActivityEvent.__table__.insert(), activity)
+    record_audit(session, audit)
+    invalidate_tables(session, 'casos', 'clientes', 'analitica_cierres', 'actividad')
+
+    # Las instancias cargadas en esta sesión no ven el UPDATE directo
+    case_ids = {old['id'] for old in before}
+    for obj in list(session.identity_map.values()):
+        if (isinstance(obj, Case) and obj.id in case_ids) or (isinstance(obj, Client) and obj.id in clients):
+            session.expire(obj)
+
+    return matched, updated
+
+def contact_selection(data):
+    """Condiciones de los mensajes elegidos por `ids`, por `hasta` (fecha ISO) o todos"""
+    if 'ids' in data:
+        return [Contact.id.in_(_ids(data))]
+    if data.get('hasta'):
+        return [Contact.fecha_envio <= _parse_datetime(data['hasta'], 'hasta')]
+    return []
+
+def bulk_mark_contacts_read(conditions):
+    """Marcar como leídos los mensajes no leídos seleccionados con un solo UPDATE
+
+    Devuelve el número de mensajes marcados; cada uno deja su entrada
+    'leido' en el registro de actividad.
+    """
+    session = db.session()  # la sesión del ámbito actual (no el proxy)
+    session.flush()
+    connection = session.connection()
+    now = datetime.utcnow()
+
+    rows = connection.execute(
+        update(Contact).where(*conditions, Contact.leido.isnot(True)).values(leido=True)
+        .returning(Contact.id, Contact.nombre, Contact.asunto)
+    ).all()
+    if not rows:
+        return 0
+
+    usuario_id = _usuario_id(session)
+    connection.execute(ActivityEvent.__table__.insert(), [{
+        'fecha': now,
+        'tipo_entidad': 'contact',
+        'entidad_id': contact_id,
+        'accion': 'leido',
+        'descripcion': DESCRIPTIONS['contact']['leido'].format(nombre)[:300],
+        'detalle': json.dumps({'subject': asunto, 'campos': ['leido']}),
+        'usuario_id': usuario_id
+    } for contact_id, nombre, asunto in rows])
+
+    invalidate_tables(session, 'contactos', 'actividad')
+
+    contact_ids = {row[0] for row in rows}
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Contact) and obj.id in contact_ids:
+            session.expire(obj, ['leido'])
+
+    return len(rows)
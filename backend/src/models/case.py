@@ -1,9 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import func, text
 from src.models.user import db
 
+def to_cents(value):
+    """Convertir un importe (número o texto decimal) a céntimos enteros"""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Importe inválido: {value}')
+    if not amount.is_finite():
+        raise ValueError(f'Importe inválido: {value}')
+    return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
 class Case(db.Model):
     __tablename__ = 'casos'
+    __table_args__ = (
+        db.Index('ix_casos_cliente_apertura', 'cliente_id', 'fecha_apertura'),
+        db.Index('ix_casos_estado', 'estado'),
+        # Índice parcial de los casos abiertos (analítica de antigüedad y carga por abogado)
+        db.Index('ix_casos_abiertos', 'abogado_asignado_id', 'estado', 'prioridad', 'fecha_apertura',
+                 sqlite_where=db.text("estado NOT IN ('cerrado', 'archivado')")),
+        {'sqlite_autoincrement': True},  # los ids no se reutilizan al archivar
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     numero_caso = db.Column(db.String(50), unique=True, nullable=False)
@@ -15,6 +35,7 @@ class Case(db.Model):
     prioridad = db.Column(db.String(20), nullable=False, default='media')
     fecha_apertura = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_cierre = db.Column(db.DateTime)
+    total_equipos = db.Column(db.Integer, nullable=False, default=0)  # mantenido en src/models/counters.py
     
     # Relaciones
     cliente = db.relationship('Client', backref='casos')
@@ -36,7 +57,8 @@ class Case(db.Model):
             'estado': self.estado,
             'prioridad': self.prioridad,
             'fecha_apertura': self.fecha_apertura.isoformat() if self.fecha_apertura else None,
-            'fecha_cierre': self.fecha_cierre.isoformat() if self.fecha_cierre else None
+            'fecha_cierre': self.fecha_cierre.isoformat() if self.fecha_cierre else None,
+            'total_equipos': self.total_equipos
         }
 
 class Client(db.Model):
@@ -48,6 +70,9 @@ class Client(db.Model):
     telefono = db.Column(db.String(20))
     direccion = db.Column(db.Text)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    # Contadores mantenidos en src/models/counters.py
+    total_casos = db.Column(db.Integer, nullable=False, default=0)
+    casos_activos = db.Column(db.Integer, nullable=False, default=0)  # casos con estado distinto de 'cerrado'
     
     def to_dict(self):
         return {
@@ -56,11 +81,24 @@ class Client(db.Model):
             'email': self.email,
             'telefono': self.telefono,
             'direccion': self.direccion,
-            'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None
+            'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None,
+            'total_casos': self.total_casos,
+            'casos_activos': self.casos_activos
         }
 
 class Equipment(db.Model):
     __tablename__ = 'equipos'
+    __table_args__ = (
+        db.Index('ix_equipos_caso_recepcion', 'caso_id', 'fecha_recepcion'),
+        # Inventario: filtros por faceta, orden por recepción y búsqueda por identificador
+        db.Index('ix_equipos_recepcion', 'fecha_recepcion', 'id'),
+        db.Index('ix_equipos_tipo_recepcion', 'tipo_equipo', 'fecha_recepcion'),
+        db.Index('ix_equipos_marca', 'marca'),
+        db.Index('ix_equipos_condicion', 'condicion_fisica'),
+        db.Index('ix_equipos_imei', 'imei'),
+        db.Index('ix_equipos_numero_serie', 'numero_serie'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     caso_id = db.Column(db.Integer, db.ForeignKey('casos.id'), nullable=False)
@@ -93,8 +131,20 @@ class Equipment(db.Model):
             'notas_custodia': self.notas_custodia
         }
 
+# Mes de recepción 'YYYY-MM' (faceta del inventario), guardado en un índice de
+# expresión: las consultas deben usar esta misma expresión para que SQLite lo use
+EQUIPMENT_MONTH = func.strftime(text("'%Y-%m'"), Equipment.fecha_recepcion)
+db.Index('ix_equipos_mes_recepcion', EQUIPMENT_MONTH)
+
 class AgendaEvent(db.Model):
     __tablename__ = 'agenda_eventos'
+    __table_args__ = (
+        # Consultas por rango: vistas de semana/mes por abogado y solapamientos
+        db.Index('ix_agenda_usuario_inicio', 'usuario_id', 'fecha_inicio'),
+        db.Index('ix_agenda_fecha_fin', 'fecha_fin'),
+        db.Index('ix_agenda_caso_inicio', 'caso_id', 'fecha_inicio'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
@@ -123,24 +173,42 @@ class AgendaEvent(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = 'transacciones'
+    __table_args__ = (
+        db.Index('ix_transacciones_fecha', 'fecha'),
+        db.Index('ix_transacciones_caso', 'caso_id'),
+        db.Index('ix_transacciones_usuario', 'usuario_id'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     caso_id = db.Column(db.Integer, db.ForeignKey('casos.id'))
     tipo = db.Column(db.String(20), nullable=False)  # 'ingreso', 'gasto'
     concepto = db.Column(db.String(200), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
+    monto_centavos = db.Column(db.BigInteger, nullable=False)  # importe exacto en céntimos
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     
     usuario = db.relationship('User', backref='transacciones')
     
+    @property
+    def monto(self):
+        """Importe como Decimal con dos decimales"""
+        if self.monto_centavos is None:
+            return None
+        return Decimal(self.monto_centavos).scaleb(-2)
+    
+    @monto.setter
+    def monto(self, value):
+        self.monto_centavos = to_cents(value)
+    
     def to_dict(self):
         return {
             'id': self.id,
             'caso_id': self.caso_id,
             'tipo': self.tipo,
             'concepto': self.concepto,
-            'monto': self.monto,
+            'monto': float(self.monto) if self.monto is not None else None,
+            'monto_centavos': self.monto_centavos,
             'fecha': self.fecha.isoformat() if self.fecha else None,
             'usuario_id': self.usuario_id
         }
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, select, text
+from sqlalchemy.engine import Engine
+from src.models.user import db
+
+# Tablas que no se replican: el propio registro y el estado de la replicación
+EXCLUDED_TABLES = {'cambios', 'replicacion'}
+
+# Los disparadores del registro se llaman cdc_<tabla>_<operación>
+TRIGGER_PREFIX = 'cdc_'
+
+# Hora actual en el formato en que SQLAlchemy guarda DateTime (microsegundos)
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
+class ChangeEvent(db.Model):
+    """Cambio de una fila para las réplicas (solo inserción); seq es el cursor
+
+    Lo escriben disparadores de SQLite en la misma transacción que el cambio,
+    así que también quedan registradas las escrituras que no pasan por la
+    sesión (contadores, operaciones en bloque, archivo). Como SQLite confirma
+    las transacciones de una en una y seq es AUTOINCREMENT, el orden de seq
+    es el de confirmación y un lector nunca ve huecos que se llenen después.
+    Al final de cada transacción se añade una marca 'C' para que las réplicas
+    apliquen transacciones enteras. Sin índice por fecha: cada escritura
+    paga solo el de la clave primaria.
+    """
+    __tablename__ = 'cambios'
+    __table_args__ = ({'sqlite_autoincrement': True},)
+
+    seq = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False)
+    tabla = db.Column(db.String(50))  # None en las marcas de fin de transacción
+    operacion = db.Column(db.String(1), nullable=False)  # 'I', 'U', 'D' o 'C' (fin de transacción)
+    clave = db.Column(db.Text)  # JSON: clave primaria de la fila (la anterior en 'U')
+    fila = db.Column(db.Text)  # JSON: la fila completa tras el cambio ('I' y 'U')
+
+class ReplicationState(db.Model):
+    """Valores de la replicación: horizonte y esquema en el principal, cursor y retraso en una réplica"""
+    __tablename__ = 'replicacion'
+
+    clave = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.Text)
+
+class ChangesExpired(Exception):
+    """El registro ya no tiene todos los cambios pedidos: la réplica debe resincronizarse"""
+
+def get_state(connection, clave):
+    return connection.execute(text('SELECT valor FROM replicacion WHERE clave = :clave'), {'clave': clave}).scalar()
+
+def set_state(connection, clave, valor):
+    connection.execute(text("""
+        INSERT INTO replicacion (clave, valor) VALUES (:clave, :valor)
+        ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor
+    """), {'clave': clave, 'valor': str(valor)})
+
+def replicated_tables(connection):
+    """Tablas replicadas con sus columnas y su clave primaria, tal como están en la base de datos"""
+    existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    tables = []
+    for table in db.metadata.sorted_tables:
+        if table.name in EXCLUDED_TABLES or table.name not in existing:
+            continue
+        info = connection.exec_driver_sql(f'PRAGMA table_info("{table.name}")').all()
+        columns = [row[1] for row in info]
+        primary_key = [row[1] for row in sorted((row for row in info if row[5]), key=lambda row: row[5])]
+        tables.append((table.name, columns, primary_key))
+    return tables
+
+def _schema_version(tables):
+    return hashlib.sha256(json.dumps(tables).encode()).hexdigest()[:16]
+
+def _trigger_sql(table, columns, primary_key, operation):
+    code = {'INSERT': 'I', 'UPDATE': 'U', 'DELETE': 'D'}[operation]
+    key_row = 'NEW' if operation == 'INSERT' else 'OLD'
+    key = ', '.join(f'{key_row}."{column}"' for column in primary_key)
+    values = 'NULL'
+    if operation != 'DELETE':
+        values = 'json_object(' + ', '.join(f"'{column}', NEW.\"{column}\"" for column in columns) + ')'
+    when = ''
+    if operation == 'UPDATE':
+        # Un UPDATE que deja la fila igual no se registra
+        when = 'WHEN ' + ' OR '.join(f'OLD."{column}" IS NOT NEW."{column}"' for column in columns)
+    return f"""
+        CREATE TRIGGER {TRIGGER_PREFIX}{table}_{operation.lower()}
+        AFTER {operation} ON "{table}" {when}
+        BEGIN
+            INSERT INTO cambios (fecha, tabla, operacion, clave, fila)
+            VALUES ({_NOW}, '{table}', '{code}', json_array({key}), {values});
+        END
+    """
+
+def drop_change_triggers(connection):
+    """Quitar los disparadores del registro (p. ej. durante una carga masiva)"""
+    names = connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name GLOB :pattern"
+    ), {'pattern': f'{TRIGGER_PREFIX}*'}).scalars().all()
+    for name in names:
+        connection.execute(text(f'DROP TRIGGER {name}'))
+
+def mark_horizon(connection):
+    """Cortar el registro aquí: las réplicas con un cursor anterior tendrán que resincronizarse
+
+    Se usa cuando cambia el esquema o se escribe sin registrar (carga masiva).
+    """
+    connection.execute(text(f"INSERT INTO cambios (fecha, operacion) VALUES ({_NOW}, 'C')"))
+    seq = connection.execute(text('SELECT last_insert_rowid()')).scalar()
+    set_state(connection, 'horizonte', seq)
+    return seq
+
+def install_change_triggers(connection):
+    """(Re)crear los disparadores de todas las tablas replicadas y cortar el registro"""
+    tables = replicated_tables(connection)
+    drop_change_triggers(connection)
+    for table, columns, primary_key in tables:
+        if not primary_key:
+            continue
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            connection.execute(text(_trigger_sql(table, columns, primary_key, operation)))
+    set_state(connection, 'esquema', _schema_version(tables))
+    mark_horizon(connection)
+
+def ensure_change_triggers(connection):
+    """Instalar los disparadores si faltan o si el esquema de las tablas cambió"""
+    tables = replicated_tables(connection)
+    installed = connection.execute(text(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name GLOB :pattern"
+    ), {'pattern': f'{TRIGGER_PREFIX}*'}).scalar()
+    expected = 3 * sum(1 for _, _, primary_key in tables if primary_key)
+    if installed != expected or get_state(connection, 'esquema') != _schema_version(tables):
+        install_change_triggers(connection)
+
+_MARK_END = f"""
+    INSERT INTO cambios (fecha, operacion)
+    SELECT {_NOW}, 'C'
+    WHERE (SELECT operacion FROM cambios ORDER BY seq DESC LIMIT 1) IN ('I', 'U', 'D')
+"""
+
+@event.listens_for(Engine, 'commit')
+def _mark_transaction_end(conn):
+    """Cerrar con una marca 'C' los cambios de la transacción que se va a confirmar
+
+    pysqlite solo abre transacción al escribir, así que las lecturas no
+    llegan aquí; una transacción sin cambios replicados no añade marca.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not dbapi_connection.in_transaction:
+        return
+    try:
+        dbapi_connection.execute(_MARK_END)
+    except sqlite3.OperationalError:
+        # Sin tabla `cambios` (base de datos aún sin crear): sin marca, la réplica
+        # solo pierde la garantía de que el lote acabe en un límite de transacción
+        pass
+
+def read_changes(since, limit):
+    """Cambios posteriores a `since` (como mucho `limit` entradas del registro)
+
+    El lote se recorta tras la última marca de fin de transacción que
+    contenga; si no hay ninguna (una transacción más larga que `limit`),
+    sale incompleto y la réplica sigue pidiendo sin confirmar. Lanza
+    ChangesExpired si faltan cambios posteriores a `since`.
+    """
+    connection = db.session.connection()
+    horizon, head = connection.execute(text("""
+        SELECT (SELECT valor FROM replicacion WHERE clave = 'horizonte'),
+               (SELECT seq FROM sqlite_sequence WHERE name = 'cambios')
+    """)).one()
+    horizon = int(horizon or 0)
+    head = head or 0
+    if since < horizon or since > head:
+        raise ChangesExpired(f'El registro de cambios empieza en {horizon} y acaba en {head}')
+
+    rows = connection.execute(text("""
+        SELECT seq, fecha, tabla, operacion, clave, fila FROM cambios
+        WHERE seq > :since ORDER BY seq LIMIT :limit
+    """), {'since': since, 'limit': limit}).all()
+    # Un recorte del registro entre las dos consultas deja un hueco
+    if rows and rows[0].seq != since + 1:
+        raise ChangesExpired(f'El registro de cambios ya no contiene la secuencia {since + 1}')
+
+    complete = len(rows) < limit
+    if not complete:
+        ends = [n for n, row in enumerate(rows) if row.operacion == 'C']
+        if ends:
+            rows = rows[:ends[-1] + 1]
+            complete = True
+    last = rows[-1].seq if rows else since
+
+    return {
+        'cambios': [{
+            'seq': row.seq,
+            'fecha': datetime.fromisoformat(row.fecha).isoformat(),
+            'tabla': row.tabla,
+            'operacion': row.operacion,
+            'clave': json.loads(row.clave),
+            'fila': json.loads(row.fila) if row.fila is not None else None
+        } for row in rows if row.operacion != 'C'],
+        'desde': since,
+        'ultimo': last,
+        'maximo': max(head, last),
+        'completo': complete,
+        'hay_mas': last < max(head, last),
+        'esquema': get_state(connection, 'esquema'),
+        'ahora': datetime.utcnow().isoformat()
+    }
+
+def prune_changes(days=None):
+    """Borrar del registro los cambios de hace más de `days` días y adelantar el horizonte
+
+    Las réplicas que no hayan leído hasta ahí tendrán que resincronizarse.
+    Devuelve el número de entradas borradas.
+    """
+    days = current_app.config['CHANGES_RETENTION_DAYS'] if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    connection = db.session.connection()
+    seq = db.session.execute(select(func.max(ChangeEvent.seq)).where(ChangeEvent.fecha < cutoff)).scalar()
+    if seq is None:
+        return 0
+    removed = connection.execute(text('DELETE FROM cambios WHERE seq <= :seq'), {'seq': seq}).rowcount
+    if seq > int(get_state(connection, 'horizonte') or 0):
+        set_state(connection, 'horizonte', seq)
+    db.session.commit()
+    return removed
+
+def create_snapshot():
+    """Instantánea coherente y verificada para (re)sincronizar una réplica
+
+    Es una copia en caliente (src/models/backup.py) sin las entradas del
+    registro, que la réplica no necesita: el cursor desde el que seguir es
+    el último seq asignado, que queda en sqlite_sequence. Devuelve la ruta
+    del archivo temporal; quien la pide lo borra.
+    """
+    from src.models.backup import snapshot_database
+
+    directory = current_app.config['BACKUP_DIR']
+    os.makedirs(directory, exist_ok=True)
+    handle, path = tempfile.mkstemp(prefix='instantanea-', suffix='.db', dir=directory)
+    os.close(handle)
+    try:
+        snapshot_database(path)
+        copy = sqlite3.connect(path, isolation_level=None)
+        try:
+            copy.execute('DELETE FROM cambios')
+            copy.execute('VACUUM')
+        finally:
+            copy.close()
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def change_log_stats():
+    """Tamaño y extremos del registro de cambios del principal"""
+    connection = db.session.connection()
+    row = connection.execute(text("""
+        SELECT (SELECT MIN(seq) FROM cambios),
+               (SELECT fecha FROM cambios ORDER BY seq LIMIT 1),
+               (SELECT seq FROM sqlite_sequence WHERE name = 'cambios')
+    """)).one()
+    return {
+        'modo': 'principal',
+        'primero': row[0],
+        'fecha_primero': datetime.fromisoformat(row[1]).isoformat() if row[1] else None,
+        'ultimo': row[2] or 0,
+        'horizonte': int(get_state(connection, 'horizonte') or 0),
+        'esquema': get_state(connection, 'esquema'),
+        'retencion_dias': current_app.config['CHANGES_RETENTION_DAYS']
+    }
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.case import Case, Client, Equipment
+
+def is_active_case(estado):
+    """Un caso cuenta como activo mientras no esté cerrado"""
+    return estado != 'cerrado'
+
+def _previous(obj, attr):
+    """Valor anterior al flush de un atributo (o el actual si no cambió)"""
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+def _collect_deltas(session):
+    """Variaciones de contadores por cliente y por caso causadas por el flush"""
+    clients = defaultdict(lambda: [0, 0])  # cliente_id -> [total_casos, casos_activos]
+    cases = defaultdict(int)               # caso_id -> total_equipos
+
+    def add_case(cliente_id, estado, sign):
+        if cliente_id is not None:
+            clients[cliente_id][0] += sign
+            clients[cliente_id][1] += sign if is_active_case(estado) else 0
+
+    def add_equipment(caso_id, sign):
+        if caso_id is not None:
+            cases[caso_id] += sign
+
+    for obj in session.new:
+        if isinstance(obj, Case):
+            add_case(obj.cliente_id, obj.estado, 1)
+        elif isinstance(obj, Equipment):
+            add_equipment(obj.caso_id, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Case):
+            add_case(_previous(obj, 'cliente_id'), _previous(obj, 'estado'), -1)
+        elif isinstance(obj, Equipment):
+            add_equipment(_previous(obj, 'caso_id'), -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Case):
+            old = (_previous(obj, 'cliente_id'), _previous(obj, 'estado'))
+            if old != (obj.cliente_id, obj.estado):
+                add_case(old[0], old[1], -1)
+                add_case(obj.cliente_id, obj.estado, 1)
+        elif isinstance(obj, Equipment):
+            old_caso_id = _previous(obj, 'caso_id')
+            if old_caso_id != obj.caso_id:
+                add_equipment(old_caso_id, -1)
+                add_equipment(obj.caso_id, 1)
+
+    return clients, cases
+
+def apply_counter_deltas(connection, clients, cases):
+    """Sumar a los contadores las variaciones por cliente y por caso"""
+    for cliente_id, (total, activos) in clients.items():
+        if total or activos:
+            connection.execute(text("""
+                UPDATE clientes SET total_casos = total_casos + :total,
+                                    casos_activos = casos_activos + :activos
+                WHERE id = :id
+            """), {'id': cliente_id, 'total': total, 'activos': activos})
+    for caso_id, total in cases.items():
+        if total:
+            connection.execute(text(
+                "UPDATE casos SET total_equipos = total_equipos + :total WHERE id = :id"
+            ), {'id': caso_id, 'total': total})
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters(session, flush_context):
+    """Mantener los contadores de clientes y casos en la misma transacción"""
+    clients, cases = _collect_deltas(session)
+    if not clients and not cases:
+        return
+
+    apply_counter_deltas(session.connection(), clients, cases)
+    session.info['counters_touched'] = (set(clients), set(cases))
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_counters(session, flush_context):
+    """Las instancias cargadas no ven el UPDATE directo: recargar sus contadores"""
+    touched = session.info.pop('counters_touched', None)
+    if not touched:
+        return
+
+    client_ids, case_ids = touched
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Client) and obj.id in client_ids:
+            session.expire(obj, ['total_casos', 'casos_activos'])
+        elif isinstance(obj, Case) and obj.id in case_ids:
+            session.expire(obj, ['total_equipos'])
+
+def rebuild_counters(connection):
+    """Recalcular todos los contadores desde las tablas de origen"""
+    connection.execute(text("""
+        UPDATE clientes SET
+            total_casos = (SELECT COUNT(*) FROM casos WHERE casos.cliente_id = clientes.id),
+            casos_activos = (SELECT COUNT(*) FROM casos
+                             WHERE casos.cliente_id = clientes.id AND casos.estado != 'cerrado')
+    """))
+    connection.execute(text("""
+        UPDATE casos SET
+            total_equipos = (SELECT COUNT(*) FROM equipos WHERE equipos.caso_id = casos.id)
+    """))
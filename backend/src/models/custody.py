@@ -0,0 +1,278 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone
+from flask import current_app
+from src.models.user import db
+
+GENESIS_HASH = '0' * 64
+
+class CustodyEvent(db.Model):
+    """Entrada de la cadena de custodia de un equipo (solo inserción)
+
+    Cada entrada incluye el hash de la anterior del mismo equipo, de modo que
+    modificar o quitar una entrada rompe todos los hashes posteriores.
+    """
+    __tablename__ = 'custodia_eventos'
+    __table_args__ = (
+        db.UniqueConstraint('equipo_id', 'secuencia', name='uq_custodia_equipo_secuencia'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    equipo_id = db.Column(db.Integer, db.ForeignKey('equipos.id'), nullable=False)
+    secuencia = db.Column(db.Integer, nullable=False)
+    tipo_evento = db.Column(db.String(50), nullable=False)  # 'recepcion', 'transferencia', 'analisis', 'devolucion'
+    descripcion = db.Column(db.Text)
+    responsable = db.Column(db.String(200))
+    recibido_de = db.Column(db.String(200))
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    hash_anterior = db.Column(db.String(64), nullable=False)
+    hash = db.Column(db.String(64), nullable=False)
+
+    def compute_hash(self):
+        """SHA-256 del contenido canónico de la entrada más el hash anterior"""
+        payload = json.dumps({
+            'equipo_id': self.equipo_id,
+            'secuencia': self.secuencia,
+            'tipo_evento': self.tipo_evento,
+            'descripcion': self.descripcion,
+            'responsable': self.responsable,
+            'recibido_de': self.recibido_de,
+            'usuario_id': self.usuario_id,
+            'fecha': self.fecha.isoformat(),
+            'hash_anterior': self.hash_anterior
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'equipo_id': self.equipo_id,
+            'secuencia': self.secuencia,
+            'tipo_evento': self.tipo_evento,
+            'descripcion': self.descripcion,
+            'responsable': self.responsable,
+            'recibido_de': self.recibido_de,
+            'usuario_id': self.usuario_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'hash_anterior': self.hash_anterior,
+            'hash': self.hash
+        }
+
+class CustodyCheckpoint(db.Model):
+    """Raíz Merkle firmada sobre un bloque consecutivo de entradas de custodia"""
+    __tablename__ = 'custodia_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    desde_evento_id = db.Column(db.Integer, nullable=False)
+    hasta_evento_id = db.Column(db.Integer, nullable=False, unique=True)
+    total_eventos = db.Column(db.Integer, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    firma = db.Column(db.String(64), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def signed_payload(self):
+        return f'{self.desde_evento_id}:{self.hasta_evento_id}:{self.total_eventos}:{self.merkle_root}'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'desde_evento_id': self.desde_evento_id,
+            'hasta_evento_id': self.hasta_evento_id,
+            'total_eventos': self.total_eventos,
+            'merkle_root': self.merkle_root,
+            'firma': self.firma,
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
+
+def merkle_root(leaves):
+    """Raíz Merkle (SHA-256) de una lista de hashes hexadecimales"""
+    if not leaves:
+        return GENESIS_HASH
+    level = [bytes.fromhex(leaf) for leaf in leaves]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+def _sign(payload):
+    key = current_app.config.get('CUSTODY_SIGNING_KEY') or current_app.config['SECRET_KEY']
+    return hmac.new(key.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def last_checkpoint():
+    return CustodyCheckpoint.query.order_by(CustodyCheckpoint.hasta_evento_id.desc()).first()
+
+def _text(value):
+    return None if value is None else str(value)
+
+def _naive_utc(value):
+    """Fecha tal como se guarda: UTC sin zona (SQLite descarta el desfase)"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def append_custody_event(equipo_id, tipo_evento, **fields):
+    """Añadir una entrada al final de la cadena de un equipo
+
+    Los campos se normalizan antes de calcular el hash (texto y fecha UTC
+    sin zona) para que el hash sea el del contenido que queda guardado.
+    Si dos entradas del mismo equipo se añaden a la vez, la segunda falla
+    con IntegrityError en (equipo_id, secuencia). Si desde el último
+    checkpoint se acumulan CUSTODY_CHECKPOINT_BLOCK entradas, se sella un
+    nuevo checkpoint en la misma transacción.
+    """
+    previous = CustodyEvent.query.filter_by(equipo_id=equipo_id).order_by(
+        CustodyEvent.secuencia.desc()
+    ).first()
+
+    event = CustodyEvent(
+        equipo_id=equipo_id,
+        secuencia=previous.secuencia + 1 if previous else 1,
+        tipo_evento=_text(tipo_evento),
+        descripcion=_text(fields.get('descripcion')),
+        responsable=_text(fields.get('responsable')),
+        recibido_de=_text(fields.get('recibido_de')),
+        usuario_id=fields.get('usuario_id'),
+        fecha=_naive_utc(fields.get('fecha')) or datetime.utcnow(),
+        hash_anterior=previous.hash if previous else GENESIS_HASH
+    )
+    event.hash = event.compute_hash()
+    db.session.add(event)
+    db.session.flush()
+
+    block_size = current_app.config.get('CUSTODY_CHECKPOINT_BLOCK', 256)
+    checkpoint = last_checkpoint()
+    pending = CustodyEvent.query.filter(
+        CustodyEvent.id > (checkpoint.hasta_evento_id if checkpoint else 0)
+    ).count()
+    if pending >= block_size:
+        create_checkpoint()
+
+    return event
+
+def create_checkpoint():
+    """Sellar las entradas posteriores al último checkpoint; None si no hay ninguna"""
+    checkpoint = last_checkpoint()
+    desde = checkpoint.hasta_evento_id if checkpoint else 0
+
+    rows = db.session.query(CustodyEvent.id, CustodyEvent.hash).filter(
+        CustodyEvent.id > desde
+    ).order_by(CustodyEvent.id).all()
+    if not rows:
+        return None
+
+    new_checkpoint = CustodyCheckpoint(
+        desde_evento_id=rows[0].id,
+        hasta_evento_id=rows[-1].id,
+        total_eventos=len(rows),
+        merkle_root=merkle_root([row.hash for row in rows])
+    )
+    new_checkpoint.firma = _sign(new_checkpoint.signed_payload())
+    db.session.add(new_checkpoint)
+    db.session.flush()
+    return new_checkpoint
+
+def _verify_checkpoint(checkpoint):
+    """Firma válida y raíz coherente con los hashes almacenados del bloque"""
+    if not hmac.compare_digest(checkpoint.firma, _sign(checkpoint.signed_payload())):
+        return 'Firma de checkpoint inválida'
+
+    hashes = [row.hash for row in db.session.query(CustodyEvent.hash).filter(
+        CustodyEvent.id.between(checkpoint.desde_evento_id, checkpoint.hasta_evento_id)
+    ).order_by(CustodyEvent.id)]
+    if len(hashes) != checkpoint.total_eventos or merkle_root(hashes) != checkpoint.merkle_root:
+        return 'La raíz Merkle no coincide con las entradas del bloque'
+    return None
+
+def _verify_links(events, anchors):
+    """Recalcular hashes y enlaces; anchors guarda el último hash conocido por equipo"""
+    errors = []
+    for event in events:
+        expected_previous = anchors.get(event.equipo_id, (0, GENESIS_HASH))
+        if event.secuencia != expected_previous[0] + 1 or event.hash_anterior != expected_previous[1]:
+            errors.append({'evento_id': event.id, 'equipo_id': event.equipo_id, 'error': 'Enlace con la entrada anterior roto'})
+        if event.compute_hash() != event.hash:
+            errors.append({'evento_id': event.id, 'equipo_id': event.equipo_id, 'error': 'Hash de la entrada no coincide con su contenido'})
+        anchors[event.equipo_id] = (event.secuencia, event.hash)
+    return errors
+
+def _checkpoint_containing(event_id):
+    return CustodyCheckpoint.query.filter(
+        CustodyCheckpoint.desde_evento_id <= event_id,
+        CustodyCheckpoint.hasta_evento_id >= event_id
+    ).first()
+
+def verify_custody(equipo_id=None, full=False):
+    """Verificar la cadena de custodia de un equipo o de todo el almacén
+
+    En modo incremental solo se recalculan las entradas posteriores al último
+    checkpoint. Cada cadena se engancha a su última entrada sellada, cuyo hash
+    queda acreditado por la raíz Merkle firmada de su bloque (se comprueba con
+    los hashes almacenados, sin releer el contenido). La tabla es de solo
+    inserción (triggers), así que una entrada sellada no puede cambiar sin que
+    falle esa comprobación. Con full=True se recalcula todo el historial y
+    todos los checkpoints.
+    """
+    errors = []
+    latest = last_checkpoint()
+    boundary = latest.hasta_evento_id if latest and not full else 0
+
+    query = CustodyEvent.query.filter(CustodyEvent.id > boundary)
+    if equipo_id is not None:
+        query = query.filter(CustodyEvent.equipo_id == equipo_id)
+    events = query.order_by(CustodyEvent.id).all()
+
+    # Anclas: entrada sellada inmediatamente anterior a la primera sin sellar
+    anchors = {}
+    anchor_ids = []
+    if boundary:
+        first_unsealed = {}
+        for event in events:
+            first_unsealed.setdefault(event.equipo_id, event.secuencia)
+        if equipo_id is not None and equipo_id not in first_unsealed:
+            last_sealed = db.session.query(db.func.max(CustodyEvent.secuencia)).filter(
+                CustodyEvent.equipo_id == equipo_id
+            ).scalar()
+            if last_sealed:
+                first_unsealed[equipo_id] = last_sealed + 1
+
+        for item_id, secuencia in first_unsealed.items():
+            if secuencia <= 1:
+                continue
+            anchor = CustodyEvent.query.filter_by(equipo_id=item_id, secuencia=secuencia - 1).first()
+            if anchor:
+                anchors[item_id] = (anchor.secuencia, anchor.hash)
+                anchor_ids.append(anchor.id)
+
+    if full:
+        checkpoints = CustodyCheckpoint.query.order_by(CustodyCheckpoint.hasta_evento_id).all()
+    else:
+        # Cada ancla se acredita con el checkpoint que la contiene; sin filtro
+        # de equipo también se comprueba el último bloque sellado
+        checkpoints = [latest] if latest and equipo_id is None else []
+        for anchor_id in sorted(anchor_ids):
+            if any(c.desde_evento_id <= anchor_id <= c.hasta_evento_id for c in checkpoints):
+                continue
+            checkpoint = _checkpoint_containing(anchor_id)
+            if checkpoint:
+                checkpoints.append(checkpoint)
+            else:
+                errors.append({'evento_id': anchor_id, 'error': 'Entrada sellada fuera de todo checkpoint'})
+
+    for checkpoint in checkpoints:
+        error = _verify_checkpoint(checkpoint)
+        if error:
+            errors.append({'checkpoint_id': checkpoint.id, 'error': error})
+
+    errors.extend(_verify_links(events, anchors))
+
+    return {
+        'valid': not errors,
+        'errors': errors,
+        'checkpoint': latest.to_dict() if latest else None,
+        'eventos_verificados': len(events),
+        'checkpoints_verificados': len(checkpoints),
+        'modo': 'completo' if full else 'incremental'
+    }
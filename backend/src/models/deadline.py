@@ -0,0 +1,19 @@
+from datetime import datetime
+from src.models.user import db
+
+class QueryDeadline(db.Model):
+    """Límite de tiempo de consultas fijado por un administrador para un endpoint"""
+    __tablename__ = 'limites_consulta'
+
+    endpoint = db.Column(db.String(100), primary_key=True)
+    milisegundos = db.Column(db.Integer, nullable=False)  # 0 = sin límite
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'milisegundos': self.milisegundos,
+            'usuario_id': self.usuario_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
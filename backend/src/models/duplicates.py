@@ -0,0 +1,340 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Mapping
+from difflib import SequenceMatcher
+from flask import current_app
+from sqlalchemy import bindparam, event, inspect, or_, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.case import Client
+
+# Puntuación mínima para considerar dos clientes posibles duplicados
+DUPLICATE_THRESHOLD = 0.85
+
+# Bloques con más clientes que esto (p. ej. un apellido muy común) no generan pares
+MAX_BLOCK_SIZE = 50
+
+class ClientKey(db.Model):
+    """Clave de bloqueo de un cliente: solo se comparan clientes que comparten clave"""
+    __tablename__ = 'clientes_claves'
+    __table_args__ = (
+        db.Index('ix_clientes_claves_clave', 'clave', 'cliente_id'),
+        db.Index('ix_clientes_claves_cliente', 'cliente_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    clave = db.Column(db.String(200), nullable=False)
+
+class DuplicatePair(db.Model):
+    """Par puntuado de posibles duplicados (a_id < b_id), mantenido al escribir clientes"""
+    __tablename__ = 'clientes_duplicados'
+    __table_args__ = (
+        db.Index('ix_clientes_duplicados_puntuacion', 'puntuacion', 'a_id', 'b_id'),
+        db.Index('ix_clientes_duplicados_b', 'b_id'),
+    )
+
+    a_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    b_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    puntuacion = db.Column(db.Float, nullable=False)
+
+def normalize_name(nombre):
+    """Minúsculas, sin acentos ni signos y con espacios simples"""
+    text_value = unicodedata.normalize('NFKD', nombre or '')
+    text_value = ''.join(char for char in text_value if not unicodedata.combining(char)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9ñ ]+', ' ', text_value).split())
+
+def normalize_phone(telefono):
+    """Últimos 9 dígitos del teléfono (sin prefijo internacional), o None"""
+    digits = re.sub(r'\D', '', telefono or '')
+    return digits[-9:] if len(digits) >= 7 else None
+
+def normalize_email(email):
+    """Email sin etiquetas '+...' ni puntos en la parte local"""
+    local, _, domain = (email or '').strip().lower().partition('@')
+    return f"{local.split('+')[0].replace('.', '')}@{domain}" if domain else None
+
+# Reglas en orden de aplicación para una clave fonética aproximada del español
+PHONETIC_RULES = (
+    (r'x', 'ks'), (r'ch', 'x'), (r'll', 'y'), (r'qu', 'k'), (r'c(?=[ei])', 's'), (r'c', 'k'),
+    (r'g(?=[ei])', 'j'), (r'gu(?=[ei])', 'g'), (r'h', ''), (r'[vw]', 'b'), (r'z', 's'),
+    (r'y$', 'i'), (r'(.)\1+', r'\1')
+)
+
+def phonetic(word):
+    for pattern, replacement in PHONETIC_RULES:
+        word = re.sub(pattern, replacement, word)
+    return word
+
+def blocking_keys(nombre, email=None, telefono=None):
+    """Claves de bloqueo: nombre normalizado, fonética, inicial, teléfono y email"""
+    keys = set()
+    tokens = normalize_name(nombre).split()
+    if tokens:
+        keys.add('nombre:' + ' '.join(sorted(tokens)))
+        first, last = phonetic(tokens[0]), phonetic(tokens[-1])
+        if len(tokens) > 1:
+            keys.add(f'fonetico:{first} {last}')
+            keys.add(f'inicial:{first} {last[:1]}')
+        else:
+            keys.add(f'fonetico:{first}')
+    phone = normalize_phone(telefono)
+    if phone:
+        keys.add('telefono:' + phone)
+    normalized_email = normalize_email(email)
+    if normalized_email:
+        keys.add('email:' + normalized_email)
+    return keys
+
+def _fields(client):
+    if isinstance(client, Mapping):
+        return client
+    return {'nombre_completo': client.nombre_completo, 'email': client.email, 'telefono': client.telefono}
+
+def _normalized(client):
+    """(nombre, teléfono, email) normalizados y los caracteres del nombre para la cota rápida"""
+    fields = _fields(client)
+    name = normalize_name(fields['nombre_completo'])
+    return (name, normalize_phone(fields.get('telefono')), normalize_email(fields.get('email')), Counter(name))
+
+def _name_ratio(a, b, threshold=None):
+    """SequenceMatcher.ratio de dos nombres normalizados
+
+    Con `threshold` devuelve None sin construir el matcher cuando la cota
+    superior de quick_ratio (caracteres en común) ya queda por debajo.
+    """
+    if a[0] == b[0]:
+        return 1.0
+    if threshold is not None:
+        total = threshold * (len(a[0]) + len(b[0]))
+        # Primero la de real_quick_ratio (longitudes), que no mira los caracteres
+        if 2 * min(len(a[0]), len(b[0])) < total or 2 * sum((a[3] & b[3]).values()) < total:
+            return None
+    return SequenceMatcher(None, a[0], b[0]).ratio()
+
+def _score(a, b, threshold=None, ratios=None):
+    """Puntuación entre dos clientes ya normalizados
+
+    Con `threshold` devuelve None si no lo alcanza. `ratios` guarda los
+    ratios ya calculados por par de nombres (nombres repetidos en la
+    reconstrucción completa).
+    """
+    # Mismo teléfono o mismo email normalizado: casi seguro la misma persona
+    same_contact = (a[1] and a[1] == b[1]) or (a[2] and a[2] == b[2])
+    cutoff = None if same_contact else threshold
+    key = (a[0], b[0])
+    ratio = ratios.get(key) if ratios is not None else None
+    if ratio is None:
+        if cutoff is not None and ratios is not None and key in ratios:
+            return None  # ya descartado por la cota con el mismo umbral
+        ratio = _name_ratio(a, b, cutoff)
+        if ratios is not None:
+            ratios[key] = ratio
+        if ratio is None:
+            return None
+    score = max(ratio, 0.9 + ratio / 10) if same_contact else ratio
+    score = round(min(score, 1.0), 4)
+    if threshold is not None and score < threshold:
+        return None
+    return score
+
+def similarity(a, b):
+    """Puntuación 0-1 de que dos clientes (objetos o dicts) sean la misma persona"""
+    return _score(_normalized(a), _normalized(b))
+
+def _replace_keys(connection, clients):
+    ids = [client.id for client in clients]
+    if not ids:
+        return
+    connection.execute(ClientKey.__table__.delete().where(ClientKey.cliente_id.in_(ids)))
+    rows = [
+        {'cliente_id': client.id, 'clave': key}
+        for client in clients if client.id is not None
+        for key in blocking_keys(client.nombre_completo, client.email, client.telefono)
+    ]
+    if rows:
+        connection.execute(ClientKey.__table__.insert(), rows)
+
+def _client_rows(connection, ids):
+    """{id: campos normalizados} leídos de la base (ya con los cambios del flush)"""
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        for row in connection.execute(
+            text('SELECT id, nombre_completo, email, telefono FROM clientes WHERE id IN :ids').bindparams(
+                bindparam('ids', expanding=True)
+            ), {'ids': ids[start:start + 500]}
+        ):
+            rows[row.id] = _normalized(row._mapping)
+    return rows
+
+def _insert_pairs(connection, pairs):
+    """Insertar pares nuevos (los anteriores de esos clientes ya se borraron)"""
+    if pairs:
+        # Tuplas directamente al driver: en la reconstrucción son cientos de miles
+        connection.exec_driver_sql(
+            'INSERT INTO clientes_duplicados (a_id, b_id, puntuacion) VALUES (?, ?, ?)',
+            [(a_id, b_id, score) for (a_id, b_id), score in pairs.items()]
+        )
+
+def _delete_pairs(connection, ids):
+    table = DuplicatePair.__table__
+    connection.execute(table.delete().where(or_(table.c.a_id.in_(ids), table.c.b_id.in_(ids))))
+
+def _rescore_clients(connection, ids):
+    """Volver a puntuar los pares de estos clientes con los demás miembros de sus bloques
+
+    Los bloques con más de MAX_BLOCK_SIZE clientes no generan pares nuevos;
+    los pares ya guardados de sus otros miembros se conservan.
+    """
+    _delete_pairs(connection, ids)
+    mates = connection.execute(text("""
+        SELECT DISTINCT mine.cliente_id AS cliente_id, other.cliente_id AS otro_id
+        FROM clientes_claves mine
+        JOIN clientes_claves other ON other.clave = mine.clave AND other.cliente_id != mine.cliente_id
+        WHERE mine.cliente_id IN :ids
+          AND (SELECT COUNT(*) FROM clientes_claves block WHERE block.clave = mine.clave) <= :max_block
+    """).bindparams(bindparam('ids', expanding=True)), {'ids': list(ids), 'max_block': MAX_BLOCK_SIZE}).all()
+    if not mates:
+        return
+
+    clients = _client_rows(connection, {client_id for pair in mates for client_id in pair})
+    pairs = {}
+    for client_id, other_id in mates:
+        key = (min(client_id, other_id), max(client_id, other_id))
+        if key not in pairs:
+            pairs[key] = _score(clients[key[0]], clients[key[1]], DUPLICATE_THRESHOLD)
+    _insert_pairs(connection, {key: score for key, score in pairs.items() if score is not None})
+
+@event.listens_for(Session, 'after_flush')
+def _update_client_keys(session, flush_context):
+    """Mantener las claves de bloqueo y los pares puntuados de los clientes creados, editados o borrados"""
+    changed = [obj for obj in session.new if isinstance(obj, Client)]
+    for obj in session.dirty:
+        if isinstance(obj, Client):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in ('nombre_completo', 'email', 'telefono')):
+                changed.append(obj)
+    deleted = [inspect(obj).identity[0] for obj in session.deleted if isinstance(obj, Client)]
+
+    connection = session.connection() if changed or deleted else None
+    if deleted:
+        connection.execute(ClientKey.__table__.delete().where(ClientKey.cliente_id.in_(deleted)))
+        _delete_pairs(connection, deleted)
+    if changed:
+        _replace_keys(connection, changed)
+        _rescore_clients(connection, [client.id for client in changed])
+
+def rebuild_client_keys(connection):
+    """Recalcular las claves de todos los clientes"""
+    connection.execute(ClientKey.__table__.delete())
+    rows = [
+        {'cliente_id': row.id, 'clave': key}
+        for row in connection.execute(text('SELECT id, nombre_completo, email, telefono FROM clientes'))
+        for key in blocking_keys(row.nombre_completo, row.email, row.telefono)
+    ]
+    if rows:
+        connection.execute(ClientKey.__table__.insert(), rows)
+
+def rebuild_duplicate_pairs(connection):
+    """Recalcular todos los pares puntuados comparando solo dentro de cada bloque"""
+    connection.execute(DuplicatePair.__table__.delete())
+    candidates = connection.execute(text("""
+        SELECT DISTINCT a.cliente_id AS a_id, b.cliente_id AS b_id
+        FROM clientes_claves a
+        JOIN clientes_claves b ON b.clave = a.clave AND b.cliente_id > a.cliente_id
+        WHERE a.clave IN (
+            SELECT clave FROM clientes_claves GROUP BY clave
+            HAVING COUNT(*) BETWEEN 2 AND :max_block
+        )
+    """), {'max_block': MAX_BLOCK_SIZE}).all()
+    if not candidates:
+        return
+
+    clients = {
+        row.id: _normalized(row._mapping)
+        for row in connection.execute(text('SELECT id, nombre_completo, email, telefono FROM clientes'))
+    }
+    pairs = {}
+    ratios = {}
+    for a_id, b_id in candidates:
+        score = _score(clients[a_id], clients[b_id], DUPLICATE_THRESHOLD, ratios)
+        if score is not None:
+            pairs[(a_id, b_id)] = score
+    _insert_pairs(connection, pairs)
+
+def find_candidates(nombre, email=None, telefono=None, exclude_id=None):
+    """Clientes del mismo bloque que superan el umbral, mejor puntuación primero"""
+    keys = blocking_keys(nombre, email, telefono)
+    if not keys:
+        return []
+    query = db.session.query(ClientKey.cliente_id).filter(ClientKey.clave.in_(keys))
+    if exclude_id is not None:
+        query = query.filter(ClientKey.cliente_id != exclude_id)
+    ids = {cliente_id for cliente_id, in query.distinct().limit(MAX_BLOCK_SIZE * len(keys))}
+    if not ids:
+        return []
+
+    candidate = {'nombre_completo': nombre, 'email': email, 'telefono': telefono}
+    scored = [(client, similarity(candidate, client)) for client in Client.query.filter(Client.id.in_(ids))]
+    return sorted(
+        [(client, score) for client, score in scored if score >= DUPLICATE_THRESHOLD],
+        key=lambda item: (-item[1], item[0].id)
+    )
+
+def duplicate_pairs(page=1, per_page=100):
+    """Página del informe de duplicados, mejor puntuación primero: (pares, total)
+
+    Lee los pares ya puntuados (índice por puntuación); no compara nada.
+    """
+    pairs = DuplicatePair.query.order_by(
+        DuplicatePair.puntuacion.desc(), DuplicatePair.a_id, DuplicatePair.b_id
+    ).paginate(page=page, per_page=per_page, error_out=False)
+
+    ids = {client_id for pair in pairs.items for client_id in (pair.a_id, pair.b_id)}
+    clients = {client.id: client for client in Client.query.filter(Client.id.in_(ids))} if ids else {}
+    return [(clients[pair.a_id], clients[pair.b_id], pair.puntuacion) for pair in pairs.items], pairs.total
+
+def merge_clients(survivor, duplicate):
+    """Fusionar `duplicate` en `survivor`: mover sus casos, completar datos y borrarlo
+
+    Los casos vivos se mueven con el ORM para que los contadores se ajusten;
+    los archivados, con SQL directo sobre el archivo (si existe), sumando
+    al superviviente su total y sus activos. La conexión debe estar libre de
+    escrituras para poder adjuntar el archivo (el escritor único lo adjunta
+    antes de abrir cada transacción).
+    """
+    from src.models.archive import attach_archive, ARCHIVE_SCHEMA
+
+    archived_total = archived_active = 0
+    if os.path.exists(current_app.config['ARCHIVE_DATABASE_PATH']):
+        connection = attach_archive()
+        params = {'survivor': survivor.id, 'duplicate': duplicate.id}
+        archived_total, archived_active = connection.execute(text(
+            f"SELECT COUNT(*), COALESCE(SUM(estado != 'cerrado'), 0) FROM {ARCHIVE_SCHEMA}.casos WHERE cliente_id = :duplicate"
+        ), params).one()
+        connection.execute(text(
+            f'UPDATE {ARCHIVE_SCHEMA}.casos SET cliente_id = :survivor WHERE cliente_id = :duplicate'
+        ), params)
+
+    for case in list(duplicate.casos):
+        case.cliente = survivor
+
+    for field in ('telefono', 'direccion'):
+        if not getattr(survivor, field) and getattr(duplicate, field):
+            setattr(survivor, field, getattr(duplicate, field))
+
+    db.session.flush()
+    if archived_total:
+        # Los casos archivados seguían contando en los contadores del duplicado
+        db.session.execute(text(
+            'UPDATE clientes SET total_casos = total_casos + :total, '
+            'casos_activos = casos_activos + :active WHERE id = :id'
+        ), {'total': archived_total, 'active': archived_active, 'id': survivor.id})
+        db.session.expire(survivor, ['total_casos', 'casos_activos'])
+
+    db.session.delete(duplicate)
+    db.session.flush()
+    return survivor
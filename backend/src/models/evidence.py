@@ -0,0 +1,375 @@
+import hashlib
+import mmap
+import os
+import threading
+import uuid
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from src.models.user import db
+
+try:
+    import fcntl
+except ImportError:  # sin flock (Windows) solo se serializa dentro del proceso
+    fcntl = None
+
+class EvidenceUpload(db.Model):
+    """Subida por fragmentos en curso; `recibido` es el offset confirmado"""
+    __tablename__ = 'evidencias_subidas'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    equipo_id = db.Column(db.Integer, db.ForeignKey('equipos.id'), nullable=False)
+    nombre_archivo = db.Column(db.String(255), nullable=False)
+    tamano_total = db.Column(db.BigInteger, nullable=False)
+    recibido = db.Column(db.BigInteger, nullable=False, default=0)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_inicio = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'equipo_id': self.equipo_id,
+            'nombre_archivo': self.nombre_archivo,
+            'tamano_total': self.tamano_total,
+            'recibido': self.recibido,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
+        }
+
+class EvidenceFile(db.Model):
+    """Archivo de evidencia de un equipo; el contenido vive en el almacén por hash"""
+    __tablename__ = 'evidencias'
+    __table_args__ = (
+        db.Index('ix_evidencias_sha256', 'sha256'),
+        db.Index('ix_evidencias_equipo', 'equipo_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    equipo_id = db.Column(db.Integer, db.ForeignKey('equipos.id'), nullable=False)
+    nombre_archivo = db.Column(db.String(255), nullable=False)
+    tamano = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'equipo_id': self.equipo_id,
+            'nombre_archivo': self.nombre_archivo,
+            'tamano': self.tamano,
+            'sha256': self.sha256,
+            'usuario_id': self.usuario_id,
+            'fecha_subida': self.fecha_subida.isoformat() if self.fecha_subida else None
+        }
+
+class UploadOffsetMismatch(Exception):
+    """El fragmento no empieza donde termina lo ya recibido"""
+
+    def __init__(self, expected):
+        super().__init__(f'Se esperaba el offset {expected}')
+        self.expected = expected
+
+class UploadBusy(Exception):
+    """Otra petición está escribiendo en la misma subida"""
+
+    def __init__(self):
+        super().__init__('La subida está recibiendo otro fragmento; reintente')
+
+# Estado SHA-256 de las subidas activas en este proceso: {upload_id: (offset, hasher)}
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+def _store_path(*parts):
+    return os.path.join(current_app.config['EVIDENCE_STORE_PATH'], *parts)
+
+def _chunk_size():
+    return current_app.config.get('EVIDENCE_CHUNK_SIZE', 1024 * 1024)
+
+def partial_path(upload_id):
+    return _store_path('uploads', f'{upload_id}.part')
+
+def blob_path(sha256):
+    """Ruta direccionada por contenido: objects/ab/cd/<sha256>"""
+    return _store_path('objects', sha256[:2], sha256[2:4], sha256)
+
+# Bloqueos de contenido dentro del proceso, uno por prefijo de hash
+_blob_locks = {}
+_blob_locks_guard = threading.Lock()
+
+class BlobLock:
+    """Bloqueo exclusivo del contenido de un hash, entre hilos y entre procesos
+
+    Serializa la deduplicación de una subida con el borrado del mismo
+    contenido. Se reparte en 256 archivos (locks/<2 primeros dígitos>.lock)
+    para no crear uno por hash.
+    """
+
+    def __init__(self, sha256):
+        self.prefix = sha256[:2]
+        with _blob_locks_guard:
+            self.thread_lock = _blob_locks.setdefault(self.prefix, threading.Lock())
+        self.path = _store_path('locks', f'{self.prefix}.lock')
+        self.file = None
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, 'a')
+            if fcntl:
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+        except Exception:
+            if self.file:
+                self.file.close()
+            self.thread_lock.release()
+            raise
+
+    def release(self):
+        self.file.close()  # cerrar el archivo suelta el flock
+        self.file = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+# Subidas bloqueadas por este proceso (el flock cubre a los demás procesos)
+_upload_locks = set()
+_upload_locks_guard = threading.Lock()
+
+class UploadLock:
+    """Bloqueo exclusivo de una subida: flock sobre su archivo .part
+
+    No espera: un reintento que llega mientras otra petición aún escribe la
+    misma subida falla con UploadBusy en lugar de escribir a la vez.
+    """
+
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+        self.file = None
+
+    def acquire(self):
+        with _upload_locks_guard:
+            if self.upload_id in _upload_locks:
+                raise UploadBusy()
+            _upload_locks.add(self.upload_id)
+        try:
+            self.file = open(partial_path(self.upload_id), 'rb')
+            if fcntl:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except Exception as e:
+            self.release()
+            if isinstance(e, BlockingIOError):
+                raise UploadBusy() from e
+            raise
+
+    def release(self):
+        if self.file:
+            self.file.close()  # cerrar el archivo suelta el flock
+            self.file = None
+        with _upload_locks_guard:
+            _upload_locks.discard(self.upload_id)
+
+def _lock_upload(upload):
+    """Bloquear la subida hasta que acabe la transacción y releer su offset confirmado"""
+    held = db.session().info.setdefault('upload_locks', {})
+    if upload.id not in held:
+        lock = UploadLock(upload.id)
+        lock.acquire()
+        held[upload.id] = lock
+        db.session.refresh(upload)
+
+def _hasher_at(upload_id, offset):
+    """Recuperar el hash parcial; si no está en memoria se recalcula desde disco"""
+    with _hashers_lock:
+        cached = _hashers.pop(upload_id, None)
+    if cached and cached[0] == offset:
+        return cached[1]
+
+    hasher = hashlib.sha256()
+    remaining = offset
+    with open(partial_path(upload_id), 'rb') as partial:
+        while remaining:
+            block = partial.read(min(_chunk_size(), remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+def start_upload(equipo_id, nombre_archivo, tamano_total, usuario_id):
+    upload = EvidenceUpload(
+        equipo_id=equipo_id,
+        nombre_archivo=nombre_archivo,
+        tamano_total=tamano_total,
+        usuario_id=usuario_id
+    )
+    db.session.add(upload)
+    db.session.flush()
+
+    os.makedirs(_store_path('uploads'), exist_ok=True)
+    open(partial_path(upload.id), 'wb').close()
+    return upload
+
+def write_chunk(upload, start, stream):
+    """Escribir un fragmento leyendo el cuerpo por bloques (memoria constante)
+
+    El SHA-256 se actualiza a la vez que se escribe. La subida queda
+    bloqueada hasta el final de la transacción, de modo que dos peticiones
+    no pueden escribir ni confirmar el mismo tramo. Devuelve el nuevo offset.
+    """
+    _lock_upload(upload)
+    if start != upload.recibido:
+        raise UploadOffsetMismatch(upload.recibido)
+
+    hasher = _hasher_at(upload.id, start)
+    offset = start
+    with open(partial_path(upload.id), 'r+b') as partial:
+        # Descartar restos de un fragmento anterior que no llegó a confirmarse
+        partial.seek(start)
+        partial.truncate()
+        while offset < upload.tamano_total:
+            block = stream.read(min(_chunk_size(), upload.tamano_total - offset))
+            if not block:
+                break
+            partial.write(block)
+            hasher.update(block)
+            offset += len(block)
+        partial.flush()
+        os.fsync(partial.fileno())
+
+    with _hashers_lock:
+        _hashers[upload.id] = (offset, hasher)
+
+    upload.recibido = offset
+    upload.fecha_actualizacion = datetime.utcnow()
+    return offset
+
+def finish_upload(upload):
+    """Registrar la subida completa como evidencia del almacén por contenido
+
+    El archivo .part se mueve al almacén (o se borra si el contenido ya
+    estaba) solo tras el COMMIT: si algo falla antes, la subida vuelve a su
+    offset anterior y el archivo parcial sigue ahí para reenviar el último
+    fragmento. El bloqueo del hash se mantiene hasta entonces: un borrado
+    del mismo contenido no puede quitar el archivo entre que se confirma la
+    fila que lo referencia y se deja en su sitio.
+    """
+    hasher = _hasher_at(upload.id, upload.recibido)
+    digest = hasher.hexdigest()
+    with _hashers_lock:
+        _hashers[upload.id] = (upload.recibido, hasher)
+
+    session = db.session()
+    held = session.info.setdefault('blob_locks', [])
+    if not any(lock.prefix == digest[:2] for lock in held):  # otra subida de la misma transacción ya lo tiene
+        lock = BlobLock(digest)
+        lock.acquire()
+        held.append(lock)
+
+    evidence = EvidenceFile(
+        equipo_id=upload.equipo_id,
+        nombre_archivo=upload.nombre_archivo,
+        tamano=upload.tamano_total,
+        sha256=digest,
+        usuario_id=upload.usuario_id
+    )
+    db.session.add(evidence)
+    db.session.delete(upload)
+    db.session.flush()
+    session.info.setdefault('evidence_files', []).append((upload.id, digest))
+    return evidence
+
+def discard_upload(upload):
+    """Cancelar la subida; el archivo parcial se borra tras el COMMIT"""
+    _lock_upload(upload)
+    db.session.delete(upload)
+    db.session().info.setdefault('evidence_files', []).append((upload.id, None))
+
+def release_blob(sha256):
+    """Borrar el contenido del almacén cuando ningún archivo lo referencie
+
+    El borrado se hace al acabar la transacción, no aquí: si el COMMIT falla
+    la fila vuelve y su contenido tiene que seguir en disco.
+    """
+    db.session().info.setdefault('blobs_released', set()).add(sha256)
+
+def _remove_unreferenced_blob(sha256):
+    # Con el bloqueo del hash y sobre lo ya confirmado: una subida del mismo
+    # contenido o ya confirmó su fila o aún no decidió reutilizar el archivo
+    with BlobLock(sha256):
+        with db.engine.connect() as connection:
+            references = connection.execute(
+                select(func.count()).select_from(EvidenceFile).where(EvidenceFile.sha256 == sha256)
+            ).scalar()
+        path = blob_path(sha256)
+        if references == 0 and os.path.exists(path):
+            os.remove(path)
+
+def _apply_partial(upload_id, digest):
+    """Mover el .part confirmado a su lugar en el almacén, o borrarlo si no hace falta"""
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    partial = partial_path(upload_id)
+    target = blob_path(digest) if digest else None
+    if target and not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(partial, target)
+        os.chmod(target, 0o444)
+    elif os.path.exists(partial):
+        os.remove(partial)  # contenido ya almacenado o subida cancelada
+
+@event.listens_for(Session, 'after_commit')
+def _apply_evidence_files(session):
+    # El RELEASE de un SAVEPOINT también dispara after_commit: esperar al COMMIT real
+    if session.get_nested_transaction() is not None:
+        return
+    # Los bloqueos (subida y hash) siguen tomados: se sueltan en after_transaction_end
+    operations = session.info.pop('evidence_files', None)
+    if operations and has_app_context():
+        for upload_id, digest in operations:
+            try:
+                _apply_partial(upload_id, digest)
+            except Exception as e:
+                current_app.logger.error(f'Error al mover la subida {upload_id} al almacén: {e}')
+
+@event.listens_for(Session, 'after_transaction_end')
+def _finish_evidence_changes(session, transaction):
+    if transaction.parent is not None:
+        return
+    # Tras un ROLLBACK los archivos parciales se quedan como estaban
+    session.info.pop('evidence_files', None)
+    for lock in session.info.pop('upload_locks', {}).values():
+        lock.release()
+    for lock in session.info.pop('blob_locks', []):
+        lock.release()
+    # Tras un ROLLBACK la fila sigue ahí y la comprobación no borra nada
+    released = session.info.pop('blobs_released', None)
+    if released and has_app_context():
+        for sha256 in sorted(released):
+            try:
+                _remove_unreferenced_blob(sha256)
+            except Exception as e:
+                current_app.logger.error(f'Error al borrar el contenido {sha256} del almacén: {e}')
+
+def iter_mmap_range(path, start, stop, chunk):
+    """Servir [start, stop) de un archivo mapeado en memoria por bloques
+
+    El contenido lo aporta la caché de páginas del sistema operativo; en
+    Python solo existe un bloque a la vez (WSGI exige objetos bytes). Se
+    consume fuera del contexto de la petición, así que recibe el tamaño de
+    bloque como argumento.
+    """
+    with open(path, 'rb') as source:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start
+            while position < stop:
+                end = min(position + chunk, stop)
+                yield mapped[position:end]
+                position = end
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.case import Transaction
+
+class DailyTotal(db.Model):
+    """Totales por día con sumas acumuladas (prefijos) de ingresos y gastos
+
+    El total de cualquier rango [desde, hasta] se obtiene restando el acumulado
+    del día anterior a `desde` al acumulado de `hasta`: dos búsquedas por clave
+    primaria en lugar de un SUM sobre todas las transacciones.
+    """
+    __tablename__ = 'finanzas_diarias'
+
+    dia = db.Column(db.Date, primary_key=True)
+    ingresos_dia = db.Column(db.BigInteger, nullable=False, default=0)
+    gastos_dia = db.Column(db.BigInteger, nullable=False, default=0)
+    ingresos_acumulados = db.Column(db.BigInteger, nullable=False, default=0)
+    gastos_acumulados = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'dia': self.dia.isoformat(),
+            'ingresos_centavos': self.ingresos_dia,
+            'gastos_centavos': self.gastos_dia,
+            'ingresos_acumulados_centavos': self.ingresos_acumulados,
+            'gastos_acumulados_centavos': self.gastos_acumulados
+        }
+
+_ENSURE_DAY = text("""
+    INSERT OR IGNORE INTO finanzas_diarias
+        (dia, ingresos_dia, gastos_dia, ingresos_acumulados, gastos_acumulados)
+    SELECT :dia, 0, 0,
+           COALESCE((SELECT ingresos_acumulados FROM finanzas_diarias
+                     WHERE dia < :dia ORDER BY dia DESC LIMIT 1), 0),
+           COALESCE((SELECT gastos_acumulados FROM finanzas_diarias
+                     WHERE dia < :dia ORDER BY dia DESC LIMIT 1), 0)
+""")
+
+_ADD_TO_DAY = text("""
+    UPDATE finanzas_diarias
+    SET ingresos_dia = ingresos_dia + :ingresos, gastos_dia = gastos_dia + :gastos
+    WHERE dia = :dia
+""")
+
+# Las transacciones suelen registrarse en el día actual, así que normalmente
+# solo se actualiza la última fila; una fecha retroactiva arrastra los
+# acumulados de los días posteriores
+_ADD_TO_CUMULATIVE = text("""
+    UPDATE finanzas_diarias
+    SET ingresos_acumulados = ingresos_acumulados + :ingresos,
+        gastos_acumulados = gastos_acumulados + :gastos
+    WHERE dia >= :dia
+""")
+
+def _collect_deltas(session):
+    """Variación de ingresos/gastos por día causada por las transacciones del flush"""
+    deltas = defaultdict(lambda: [0, 0])
+
+    def add(fecha, tipo, centavos, sign):
+        if fecha is None or centavos is None or tipo not in ('ingreso', 'gasto'):
+            return
+        deltas[fecha.date()][0 if tipo == 'ingreso' else 1] += sign * centavos
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add(obj.fecha, obj.tipo, obj.monto_centavos, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            add(obj.fecha, obj.tipo, obj.monto_centavos, -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction):
+            continue
+        state = inspect(obj)
+        old = {}
+        changed = False
+        for attr in ('fecha', 'tipo', 'monto_centavos'):
+            history = state.attrs[attr].history
+            if history.deleted:
+                old[attr] = history.deleted[0]
+                changed = True
+            else:
+                old[attr] = getattr(obj, attr)
+        if changed:
+            add(old['fecha'], old['tipo'], old['monto_centavos'], -1)
+            add(obj.fecha, obj.tipo, obj.monto_centavos, 1)
+
+    return deltas
+
+@event.listens_for(Session, 'after_flush')
+def _update_daily_totals(session, flush_context):
+    """Mantener finanzas_diarias al día con cada escritura de transacciones"""
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+
+    connection = session.connection()
+    for dia, (ingresos, gastos) in sorted(deltas.items()):
+        if ingresos == 0 and gastos == 0:
+            continue
+        params = {'dia': dia.isoformat(), 'ingresos': ingresos, 'gastos': gastos}
+        connection.execute(_ENSURE_DAY, params)
+        connection.execute(_ADD_TO_DAY, params)
+        connection.execute(_ADD_TO_CUMULATIVE, params)
+
+def rebuild_daily_totals():
+    """Recalcular finanzas_diarias desde cero en una pasada sobre transacciones"""
+    rows = db.session.execute(text("""
+        SELECT date(fecha) AS dia,
+               SUM(CASE WHEN tipo = 'ingreso' THEN monto_centavos ELSE 0 END),
+               SUM(CASE WHEN tipo = 'gasto' THEN monto_centavos ELSE 0 END)
+        FROM transacciones
+        WHERE fecha IS NOT NULL
+        GROUP BY date(fecha)
+        ORDER BY dia
+    """)).all()
+
+    db.session.execute(text('DELETE FROM finanzas_diarias'))
+    ingresos_acumulados = gastos_acumulados = 0
+    for dia, ingresos, gastos in rows:
+        ingresos_acumulados += ingresos
+        gastos_acumulados += gastos
+        db.session.execute(text("""
+            INSERT INTO finanzas_diarias
+                (dia, ingresos_dia, gastos_dia, ingresos_acumulados, gastos_acumulados)
+            VALUES (:dia, :ingresos, :gastos, :ingresos_acumulados, :gastos_acumulados)
+        """), {
+            'dia': dia, 'ingresos': ingresos, 'gastos': gastos,
+            'ingresos_acumulados': ingresos_acumulados, 'gastos_acumulados': gastos_acumulados
+        })
+
+def _cumulative_at(day):
+    """Acumulados al cierre de `day` (última fila con dia <= day)"""
+    row = db.session.execute(text("""
+        SELECT ingresos_acumulados, gastos_acumulados FROM finanzas_diarias
+        WHERE dia <= :dia ORDER BY dia DESC LIMIT 1
+    """), {'dia': day.isoformat()}).first()
+    return (row[0], row[1]) if row else (0, 0)
+
+def range_summary(date_from, date_to):
+    """Ingresos y gastos en céntimos entre dos fechas (ambas incluidas)"""
+    ingresos_hasta, gastos_hasta = _cumulative_at(date_to)
+    ingresos_antes, gastos_antes = _cumulative_at(date_from - timedelta(days=1))
+    ingresos = ingresos_hasta - ingresos_antes
+    gastos = gastos_hasta - gastos_antes
+    return {
+        'ingresos_centavos': ingresos,
+        'gastos_centavos': gastos,
+        'balance_centavos': ingresos - gastos
+    }
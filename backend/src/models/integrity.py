@@ -0,0 +1,335 @@
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.case import Equipment
+from src.models.custody import append_custody_event
+from src.models.evidence import EvidenceFile, blob_path
+
+ALGORITHMS = ('md5', 'sha1', 'sha256')
+
+# Cada cuánto renueva un trabajo en curso su fecha_actualizacion aunque ningún archivo termine
+HEARTBEAT_SECONDS = 60
+
+# Intentos de añadir la entrada de custodia de un resultado si otra escritura toma la misma secuencia
+CUSTODY_ATTEMPTS = 3
+
+class IntegrityJob(db.Model):
+    """Trabajo de verificación de integridad de las evidencias de un caso o equipo"""
+    __tablename__ = 'trabajos_verificacion'
+    __table_args__ = (
+        db.Index('ix_trabajos_verificacion_estado_fecha', 'estado', 'fecha_programada'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    caso_id = db.Column(db.Integer, db.ForeignKey('casos.id'))
+    equipo_id = db.Column(db.Integer, db.ForeignKey('equipos.id'))
+    estado = db.Column(db.String(20), nullable=False, default='programado')  # 'programado', 'en_proceso', 'completado', 'error'
+    fecha_programada = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+    fecha_actualizacion = db.Column(db.DateTime)  # latido del proceso que lo ejecuta
+    total_archivos = db.Column(db.Integer, nullable=False, default=0)
+    archivos_completados = db.Column(db.Integer, nullable=False, default=0)
+    bytes_total = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_procesados = db.Column(db.BigInteger, nullable=False, default=0)
+    errores = db.Column(db.Integer, nullable=False, default=0)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'caso_id': self.caso_id,
+            'equipo_id': self.equipo_id,
+            'estado': self.estado,
+            'fecha_programada': self.fecha_programada.isoformat() if self.fecha_programada else None,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+            'total_archivos': self.total_archivos,
+            'archivos_completados': self.archivos_completados,
+            'bytes_total': self.bytes_total,
+            'bytes_procesados': self.bytes_procesados,
+            'progreso': round(self.bytes_procesados / self.bytes_total, 4) if self.bytes_total else 0,
+            'errores': self.errores,
+            'usuario_id': self.usuario_id
+        }
+
+class IntegrityResult(db.Model):
+    """Resultado de verificar un archivo de evidencia con MD5, SHA-1 y SHA-256"""
+    __tablename__ = 'verificaciones_integridad'
+    __table_args__ = (
+        db.Index('ix_verificaciones_evidencia_fecha', 'evidencia_id', 'fecha'),
+        db.Index('ix_verificaciones_trabajo', 'trabajo_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    trabajo_id = db.Column(db.Integer, db.ForeignKey('trabajos_verificacion.id'))
+    evidencia_id = db.Column(db.Integer, db.ForeignKey('evidencias.id'), nullable=False)
+    md5 = db.Column(db.String(32))
+    sha1 = db.Column(db.String(40))
+    sha256 = db.Column(db.String(64))
+    bytes_leidos = db.Column(db.BigInteger)
+    coincide = db.Column(db.Boolean, nullable=False, default=False)
+    error = db.Column(db.Text)
+    duracion_segundos = db.Column(db.Float)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'trabajo_id': self.trabajo_id,
+            'evidencia_id': self.evidencia_id,
+            'md5': self.md5,
+            'sha1': self.sha1,
+            'sha256': self.sha256,
+            'bytes_leidos': self.bytes_leidos,
+            'coincide': self.coincide,
+            'error': self.error,
+            'duracion_segundos': self.duracion_segundos,
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
+
+def hash_file(path, block_size):
+    """Leer el archivo una sola vez y alimentar todos los algoritmos con cada bloque
+
+    Se ejecuta en los procesos del pool: solo usa la biblioteca estándar.
+    El búfer se reutiliza (readinto), así que la memoria es constante.
+    """
+    started = datetime.utcnow()
+    digests = [hashlib.new(name) for name in ALGORITHMS]
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    total = 0
+
+    with open(path, 'rb', buffering=0) as source:
+        while True:
+            read = source.readinto(buffer)
+            if not read:
+                break
+            block = view[:read]
+            for digest in digests:
+                digest.update(block)
+            total += read
+
+    result = {name: digest.hexdigest() for name, digest in zip(ALGORITHMS, digests)}
+    result['bytes_leidos'] = total
+    result['duracion_segundos'] = (datetime.utcnow() - started).total_seconds()
+    return result
+
+def _create_pool(workers):
+    """Pool de procesos con hijos arrancados desde un forkserver
+
+    'fork' copiaría el proceso web con sus hilos (auditoría, escritor,
+    recordatorios, gthreads de gunicorn) y un hijo podría heredar un lock
+    tomado por uno de ellos. Los hijos de forkserver salen de un proceso de
+    un solo hilo que solo ha importado este módulo. Como los de spawn,
+    importan el __main__ del padre: con gunicorn o el CLI de flask es
+    inofensivo, pero con el servidor de desarrollo (python src/main.py)
+    cada hijo volvería a arrancar la aplicación, así que ahí se usan hilos
+    (hashlib y readinto sueltan el GIL con bloques grandes).
+    """
+    main_path = getattr(sys.modules['__main__'], '__file__', None)
+    app_main = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+    if (
+        'forkserver' not in multiprocessing.get_all_start_methods()
+        or (main_path and os.path.abspath(main_path) == app_main)
+    ):
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='integrity-hash')
+
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def _files_query(caso_id=None, equipo_id=None):
+    query = EvidenceFile.query
+    if equipo_id is not None:
+        return query.filter(EvidenceFile.equipo_id == equipo_id)
+    return query.join(Equipment, Equipment.id == EvidenceFile.equipo_id).filter(Equipment.caso_id == caso_id)
+
+def schedule_job(caso_id=None, equipo_id=None, fecha_programada=None, usuario_id=None):
+    """Crear un trabajo con las evidencias actuales del caso o equipo"""
+    total_archivos, bytes_total = _files_query(caso_id, equipo_id).with_entities(
+        db.func.count(EvidenceFile.id), db.func.coalesce(db.func.sum(EvidenceFile.tamano), 0)
+    ).one()
+
+    job = IntegrityJob(
+        caso_id=caso_id,
+        equipo_id=equipo_id,
+        fecha_programada=fecha_programada or datetime.utcnow(),
+        total_archivos=total_archivos,
+        bytes_total=bytes_total,
+        usuario_id=usuario_id
+    )
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+def run_job(job_id):
+    """Ejecutar un trabajo repartiendo los archivos en un pool de procesos
+
+    Los archivos más grandes se envían primero para equilibrar la carga. El
+    progreso se guarda a medida que termina cada archivo, y al menos cada
+    HEARTBEAT_SECONDS se renueva fecha_actualizacion para que
+    reclaim_stale_jobs distinga un trabajo vivo de uno abandonado.
+    """
+    # Reclamar el trabajo de forma atómica por si otro proceso también lo intenta
+    now = datetime.utcnow()
+    claimed = IntegrityJob.query.filter_by(id=job_id, estado='programado').update(
+        {'estado': 'en_proceso', 'fecha_inicio': now, 'fecha_actualizacion': now}, synchronize_session=False
+    )
+    db.session.commit()
+    job = IntegrityJob.query.get(job_id)
+    if not claimed:
+        return job
+
+    files = _files_query(job.caso_id, job.equipo_id).order_by(EvidenceFile.tamano.desc()).all()
+    job.total_archivos = len(files)
+    job.bytes_total = sum(evidence.tamano for evidence in files)
+    db.session.commit()
+
+    block_size = current_app.config.get('INTEGRITY_BLOCK_SIZE', 8 * 1024 * 1024)
+    workers = current_app.config.get('INTEGRITY_WORKERS') or os.cpu_count() or 1
+
+    try:
+        with _create_pool(min(workers, max(len(files), 1))) as pool:
+            futures = {
+                pool.submit(hash_file, blob_path(evidence.sha256), block_size): evidence
+                for evidence in files
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _record_result(job, futures[future], future)
+                job.fecha_actualizacion = datetime.utcnow()
+                db.session.commit()
+
+        job.estado = 'completado'
+    except Exception:
+        db.session.rollback()
+        job.estado = 'error'
+        raise
+    finally:
+        job.fecha_fin = datetime.utcnow()
+        job.fecha_actualizacion = job.fecha_fin
+        db.session.commit()
+
+    return job
+
+def _record_result(job, evidence, future):
+    """Guardar el resultado de un archivo, el progreso del trabajo y la entrada de custodia"""
+    result = IntegrityResult(trabajo_id=job.id, evidencia_id=evidence.id)
+    try:
+        digests = future.result()
+        result.md5 = digests['md5']
+        result.sha1 = digests['sha1']
+        result.sha256 = digests['sha256']
+        result.bytes_leidos = digests['bytes_leidos']
+        result.duracion_segundos = digests['duracion_segundos']
+        result.coincide = digests['sha256'] == evidence.sha256 and digests['bytes_leidos'] == evidence.tamano
+    except Exception as e:
+        result.error = str(e)
+
+    if not result.coincide:
+        job.errores += 1
+    job.archivos_completados += 1
+    job.bytes_procesados += evidence.tamano
+    db.session.add(result)
+
+    # Una entrada añadida a la vez desde una petición puede tomar la misma
+    # secuencia: se deshace solo su SAVEPOINT y se vuelve a leer la cadena
+    for attempt in range(CUSTODY_ATTEMPTS):
+        try:
+            with db.session.begin_nested():
+                append_custody_event(
+                    evidence.equipo_id,
+                    'verificacion_integridad',
+                    descripcion=(
+                        f'Archivo {evidence.nombre_archivo}: '
+                        f"{'íntegro' if result.coincide else 'NO coincide'} "
+                        f'MD5 {result.md5} SHA-1 {result.sha1} SHA-256 {result.sha256}'
+                    ),
+                    usuario_id=job.usuario_id
+                )
+            break
+        except IntegrityError:
+            if attempt == CUSTODY_ATTEMPTS - 1:
+                raise
+
+def reclaim_stale_jobs(minutes=None):
+    """Marcar como 'error' los trabajos en curso cuyo proceso dejó de dar señales
+
+    Un trabajo vivo renueva fecha_actualizacion cada HEARTBEAT_SECONDS; si
+    lleva más de `minutes` (INTEGRITY_STALE_MINUTES) sin hacerlo, el worker
+    que lo ejecutaba se reinició o murió y el trabajo no va a terminar. Los
+    resultados parciales se conservan; para completarlo hay que programar
+    otro. Devuelve los trabajos marcados.
+    """
+    minutes = current_app.config['INTEGRITY_STALE_MINUTES'] if minutes is None else minutes
+    cutoff = datetime.utcnow() - timedelta(minutes=minutes)
+    stale = IntegrityJob.query.filter(
+        IntegrityJob.estado == 'en_proceso',
+        db.func.coalesce(IntegrityJob.fecha_actualizacion, IntegrityJob.fecha_inicio) < cutoff
+    ).all()
+    now = datetime.utcnow()
+    for job in stale:
+        job.estado = 'error'
+        job.fecha_fin = now
+    db.session.commit()
+    return stale
+
+def run_job_in_background(job_id):
+    """Lanzar run_job en un hilo con su propio contexto de aplicación"""
+    app = current_app._get_current_object()
+
+    def target():
+        with app.app_context():
+            try:
+                run_job(job_id)
+            except Exception as e:
+                app.logger.error(f'Error en verificación de integridad {job_id}: {e}')
+
+    thread = threading.Thread(target=target, name=f'integrity-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+def run_job_after_commit(job_id):
+    """Lanzar el trabajo en segundo plano cuando se confirme la transacción actual
+
+    Hasta el COMMIT el hilo no ve el trabajo y no podría reclamarlo; si la
+    transacción se deshace, no se lanza.
+    """
+    db.session().info.setdefault('integrity_jobs', []).append(job_id)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_jobs(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('integrity_jobs', None)
+
+@event.listens_for(Session, 'after_commit')
+def _start_pending_jobs(session):
+    # El RELEASE de un SAVEPOINT también dispara after_commit: esperar al COMMIT real
+    if session.get_nested_transaction() is not None:
+        return
+    jobs = session.info.pop('integrity_jobs', None)
+    if jobs and has_app_context():
+        for job_id in jobs:
+            run_job_in_background(job_id)
+
+def run_due_jobs():
+    """Ejecutar todos los trabajos programados cuya fecha ya llegó (antes se recogen los abandonados)"""
+    reclaim_stale_jobs()
+    due = IntegrityJob.query.filter(
+        IntegrityJob.estado == 'programado',
+        IntegrityJob.fecha_programada <= datetime.utcnow()
+    ).order_by(IntegrityJob.fecha_programada).all()
+    return [run_job(job.id) for job in due]
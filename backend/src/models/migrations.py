@@ -0,0 +1,147 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+from src.models.user import db
+from src.models.case import Case, Equipment, AgendaEvent, Transaction
+from src.models.finance import rebuild_daily_totals
+from src.models.counters import rebuild_counters
+from src.models.activity import seed_activity
+from src.models.duplicates import rebuild_client_keys, rebuild_duplicate_pairs
+from src.models.analytics import rebuild_close_times
+from src.models.changes import ensure_change_triggers
+
+def _columns(table_name):
+    return {column['name'] for column in inspect(db.session.connection()).get_columns(table_name)}
+
+def _migrate_transaction_cents():
+    """Pasar transacciones.monto (Float) a monto_centavos (entero exacto)
+
+    SQLite no permite cambiar el tipo de una columna, así que la tabla se
+    reconstruye y los importes se redondean al céntimo.
+    """
+    if 'monto_centavos' in _columns('transacciones'):
+        return
+
+    connection = db.session.connection()
+    connection.execute(text('ALTER TABLE transacciones RENAME TO transacciones_old'))
+    Transaction.__table__.create(connection)
+    connection.execute(text("""
+        INSERT INTO transacciones (id, caso_id, tipo, concepto, monto_centavos, fecha, usuario_id)
+        SELECT id, caso_id, tipo, concepto, CAST(ROUND(monto * 100) AS INTEGER), fecha, usuario_id
+        FROM transacciones_old
+    """))
+    connection.execute(text('DROP TABLE transacciones_old'))
+    rebuild_daily_totals()
+
+def _add_counter_columns():
+    """Añadir los contadores mantenidos de clientes y casos y calcular su valor inicial"""
+    added = False
+    for table, column in (('clientes', 'total_casos'), ('clientes', 'casos_activos'), ('casos', 'total_equipos')):
+        if column not in _columns(table):
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'))
+            added = True
+    if added:
+        rebuild_counters(db.session.connection())
+
+def _add_job_heartbeat():
+    """Añadir el latido de los trabajos de verificación (los ya en curso usan fecha_inicio)"""
+    if 'fecha_actualizacion' not in _columns('trabajos_verificacion'):
+        db.session.execute(text('ALTER TABLE trabajos_verificacion ADD COLUMN fecha_actualizacion DATETIME'))
+
+def _use_autoincrement_ids():
+    """Reconstruir con AUTOINCREMENT las tablas cuyos casos se archivan
+
+    Sin AUTOINCREMENT SQLite reutiliza el mayor id cuando se borra esa fila,
+    y un caso o equipo nuevo heredaría el id de uno archivado (y su cadena de
+    custodia). Con legacy_alter_table el RENAME no reescribe las claves
+    foráneas de las demás tablas, que siguen apuntando al nombre original.
+    Los índices se recrean después en _ensure_indexes.
+    """
+    connection = db.session.connection()
+    for model in (Case, Equipment, AgendaEvent, Transaction):
+        table = model.__table__
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table.name}
+        ).scalar()
+        if 'AUTOINCREMENT' in sql.upper():
+            continue
+
+        columns = ', '.join(column.name for column in table.columns if column.name in _columns(table.name))
+        connection.execute(text('PRAGMA legacy_alter_table = ON'))
+        connection.execute(text(f'ALTER TABLE {table.name} RENAME TO {table.name}_old'))
+        connection.execute(CreateTable(table))
+        connection.execute(text(f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old'))
+        connection.execute(text(f'DROP TABLE {table.name}_old'))
+        connection.execute(text('PRAGMA legacy_alter_table = OFF'))
+
+def _ensure_indexes():
+    """Crear los índices declarados en los modelos que falten en tablas existentes
+
+    Se comprueba por nombre en sqlite_master: la reflexión de SQLAlchemy omite
+    los índices de expresión y checkfirst intentaría crearlos de nuevo.
+    """
+    existing = set(db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.session.connection())
+
+def _fill_agenda_fecha_fin():
+    """Los eventos sin fecha de fin se tratan como eventos puntuales"""
+    db.session.execute(text(
+        "UPDATE agenda_eventos SET fecha_fin = fecha_inicio WHERE fecha_fin IS NULL"
+    ))
+
+def _build_client_keys():
+    """Calcular las claves de bloqueo de duplicados de los clientes existentes"""
+    if db.session.execute(text('SELECT 1 FROM clientes_claves LIMIT 1')).first() is None:
+        rebuild_client_keys(db.session.connection())
+
+def _build_duplicate_pairs():
+    """Puntuar los pares de posibles duplicados de los clientes existentes"""
+    if db.session.execute(text('SELECT 1 FROM clientes_duplicados LIMIT 1')).first() is None:
+        rebuild_duplicate_pairs(db.session.connection())
+
+def _build_close_times():
+    """Calcular el histograma de tiempos de cierre de los casos ya cerrados"""
+    if db.session.execute(text('SELECT 1 FROM analitica_cierres LIMIT 1')).first() is None:
+        rebuild_close_times(db.session.connection())
+
+def _ensure_append_only():
+    """Impedir UPDATE/DELETE sobre la cadena de custodia, sus checkpoints y la actividad"""
+    for table in ('custodia_eventos', 'custodia_checkpoints', 'actividad'):
+        for operation in ('UPDATE', 'DELETE'):
+            db.session.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_no_{operation.lower()}
+                BEFORE {operation} ON {table}
+                BEGIN
+                    SELECT RAISE(ABORT, 'La tabla {table} es de solo inserción');
+                END
+            """))
+
+def _seed_activity():
+    """Llenar el registro de actividad recién creado con las altas existentes"""
+    if db.session.execute(text('SELECT 1 FROM actividad LIMIT 1')).first() is None:
+        seed_activity(db.session.connection())
+
+def _install_change_log():
+    """Crear los disparadores del registro de cambios, o rehacerlos si cambió el esquema
+
+    Va después de todas las migraciones: reconstruir una tabla borra sus disparadores.
+    """
+    ensure_change_triggers(db.session.connection())
+
+def run_migrations():
+    """Aplicar sobre la base de datos existente los cambios de esquema que create_all no cubre"""
+    _migrate_transaction_cents()
+    _add_counter_columns()
+    _add_job_heartbeat()
+    _use_autoincrement_ids()
+    _ensure_indexes()
+    _fill_agenda_fecha_fin()
+    _seed_activity()
+    _build_client_keys()
+    _build_duplicate_pairs()
+    _build_close_times()
+    _ensure_append_only()
+    _install_change_log()
+    db.session.commit()
@@ -0,0 +1,37 @@
+from datetime import datetime
+from src.models.user import db
+
+class Reminder(db.Model):
+    """Recordatorio emitido para un evento de agenda (bandeja de salida)
+
+    La restricción única evita duplicados cuando varios procesos disparan
+    el mismo aviso a la vez: se inserta con INSERT OR IGNORE.
+    """
+    __tablename__ = 'recordatorios'
+    __table_args__ = (
+        db.UniqueConstraint('evento_id', 'fecha_evento', 'antelacion_minutos', name='uq_recordatorios_evento_aviso'),
+        db.Index('ix_recordatorios_usuario', 'usuario_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    evento_id = db.Column(db.Integer, db.ForeignKey('agenda_eventos.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    caso_id = db.Column(db.Integer, db.ForeignKey('casos.id'))
+    titulo = db.Column(db.String(200), nullable=False)
+    fecha_evento = db.Column(db.DateTime, nullable=False)
+    antelacion_minutos = db.Column(db.Integer, nullable=False)
+    fecha_aviso = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    leido = db.Column(db.Boolean, nullable=False, default=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'evento_id': self.evento_id,
+            'usuario_id': self.usuario_id,
+            'caso_id': self.caso_id,
+            'titulo': self.titulo,
+            'fecha_evento': self.fecha_evento.isoformat() if self.fecha_evento else None,
+            'antelacion_minutos': self.antelacion_minutos,
+            'fecha_aviso': self.fecha_aviso.isoformat() if self.fecha_aviso else None,
+            'leido': self.leido
+        }
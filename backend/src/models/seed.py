@@ -0,0 +1,383 @@
+import bisect
+import calendar
+import math
+import random
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+from src.models.user import User, db
+from src.models.case import Case, Client, Equipment, AgendaEvent, Transaction, Contact
+from src.models.duplicates import ClientKey, blocking_keys, rebuild_duplicate_pairs
+from src.models.analytics import close_time_key, apply_close_time_deltas
+from src.models.finance import rebuild_daily_totals
+from src.models.changes import drop_change_triggers, install_change_triggers
+from src.cache import invalidate_tables
+
+NOMBRES = (
+    'María', 'Carmen', 'Ana', 'Laura', 'Isabel', 'Lucía', 'Marta', 'Elena', 'Paula', 'Cristina',
+    'Sara', 'Pilar', 'Rosa', 'Julia', 'Beatriz', 'Raquel', 'Silvia', 'Patricia', 'Irene', 'Alicia',
+    'Antonio', 'José', 'Manuel', 'Francisco', 'David', 'Juan', 'Javier', 'Daniel', 'Carlos', 'Jesús',
+    'Alejandro', 'Miguel', 'Rafael', 'Pedro', 'Pablo', 'Ángel', 'Sergio', 'Fernando', 'Jorge', 'Luis'
+)
+APELLIDOS = (
+    'García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Martín',
+    'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Muñoz', 'Álvarez', 'Romero', 'Alonso', 'Gutiérrez',
+    'Navarro', 'Torres', 'Domínguez', 'Vázquez', 'Ramos', 'Gil', 'Ramírez', 'Serrano', 'Blanco', 'Molina',
+    'Morales', 'Suárez', 'Ortega', 'Delgado', 'Castro', 'Ortiz', 'Rubio', 'Marín', 'Sanz', 'Iglesias'
+)
+CIUDADES = ('Madrid', 'Barcelona', 'Valencia', 'Sevilla', 'Zaragoza', 'Málaga', 'Murcia', 'Bilbao', 'Alicante', 'Valladolid')
+CALLES = ('Calle Mayor', 'Avenida de la Constitución', 'Calle Real', 'Paseo del Prado', 'Calle Sol', 'Avenida de América')
+EMPRESAS = ('Logística', 'Consultores', 'Inversiones', 'Seguros', 'Construcciones', 'Distribuciones')
+
+TEMAS = (
+    'Acceso no autorizado a correo corporativo', 'Fraude en banca online', 'Filtración de datos de clientes',
+    'Suplantación de identidad en redes sociales', 'Borrado de registros contables', 'Extorsión por ransomware',
+    'Acoso por mensajería instantánea', 'Competencia desleal de exempleado', 'Manipulación de facturas electrónicas',
+    'Recuperación de conversaciones borradas', 'Peritaje de grabaciones de audio', 'Uso indebido de dispositivos de empresa'
+)
+
+# (valor, peso) de las distribuciones sesgadas
+PRIORIDADES = (('media', 50), ('alta', 25), ('baja', 15), ('urgente', 10))
+TIPOS_EQUIPO = (
+    ('Teléfono móvil', 55), ('Portátil', 15), ('Ordenador de sobremesa', 10),
+    ('Tablet', 8), ('Disco duro', 7), ('Memoria USB', 5)
+)
+MARCAS = {
+    'Teléfono móvil': ('Samsung', 'Apple', 'Xiaomi', 'Oppo', 'Motorola', 'Huawei'),
+    'Portátil': ('Lenovo', 'HP', 'Dell', 'Apple', 'Asus', 'Acer'),
+    'Ordenador de sobremesa': ('HP', 'Dell', 'Lenovo', 'Acer'),
+    'Tablet': ('Apple', 'Samsung', 'Lenovo', 'Huawei'),
+    'Disco duro': ('Western Digital', 'Seagate', 'Toshiba', 'Samsung'),
+    'Memoria USB': ('SanDisk', 'Kingston', 'Verbatim', 'Samsung')
+}
+CONDICIONES = (('bueno', 60), ('regular', 25), ('dañado', 12), ('destruido', 3))
+EQUIPOS_POR_CASO = ((0, 10), (1, 45), (2, 25), (3, 10), (4, 6), (6, 3), (10, 1))
+TIPOS_EVENTO = (('reunion', 40), ('audiencia', 25), ('entrega', 20), ('peritaje', 15))
+EVENTOS_POR_CASO = ((0, 35), (1, 35), (2, 20), (3, 10))
+TRANSACCIONES_POR_CASO = ((0, 15), (1, 30), (2, 30), (3, 15), (5, 10))
+
+# Días hasta el cierre: lognormal (mediana ~45 días); los urgentes se cierran antes
+DURACION_MEDIANA_DIAS = 45
+DURACION_SIGMA = 1.0
+DURACION_FACTOR = {'urgente': 0.4, 'alta': 0.7, 'media': 1.0, 'baja': 1.5}
+
+# Franjas de 30 minutos de la agenda: 18 por día laborable (9:00 a 18:00); si un
+# abogado no tiene hueco en AGENDA_SEARCH_DAYS días el evento no se crea
+SLOT_SECONDS = 1800
+SLOTS_PER_DAY = 18
+DAY_START_SECONDS = 9 * 3600
+AGENDA_SEARCH_DAYS = 14
+
+# Ajustes de la conexión durante la carga y los que se restauran después (los de
+# src/models/sqlite.py y los valores por defecto de SQLite)
+LOAD_PRAGMAS = ('synchronous = OFF', 'cache_size = -262144', 'temp_store = MEMORY')
+RESTORE_PRAGMAS = ('synchronous = NORMAL', 'cache_size = -2000', 'temp_store = DEFAULT')
+
+def _picker(rng, weighted):
+    """Función que elige un valor de (valor, peso) con sus pesos"""
+    values = [value for value, _ in weighted]
+    cumulative = []
+    total = 0
+    for _, weight in weighted:
+        total += weight
+        cumulative.append(total)
+    return lambda: values[bisect.bisect(cumulative, rng.random() * total)]
+
+def _zipf_cumulative(n, exponent):
+    """Pesos acumulados 1/k^s: pocos clientes (o abogados) concentran muchos casos"""
+    cumulative = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+def _fmt(seconds):
+    """Marca de tiempo UTC en el formato de DateTime de SQLAlchemy para SQLite"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+class _Inserter:
+    """Acumula filas por tabla y las inserta por lotes con un executemany"""
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.rows = defaultdict(list)
+        self.statements = {}
+        self.counts = defaultdict(int)
+
+    def add(self, model, columns, row):
+        key = (model, columns)
+        if key not in self.statements:
+            # Las filas van como tuplas directamente al driver
+            self.statements[key] = (
+                f"INSERT INTO {model.__tablename__} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            )
+        rows = self.rows[key]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(key)
+
+    def flush(self, key=None):
+        for current in ([key] if key else list(self.rows)):
+            rows = self.rows[current]
+            if rows:
+                self.connection.exec_driver_sql(self.statements[current], rows)
+                self.counts[current[0].__tablename__] += len(rows)
+                rows.clear()
+
+def _drop_indexes(connection, models):
+    """Quitar los índices secundarios durante la carga (se recrean al final, de una vez)"""
+    dropped = []
+    for model in models:
+        for index in model.__table__.indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+            dropped.append(index)
+    return dropped
+
+def seed_database(**options):
+    """Generar los datos en una sola transacción con la conexión ajustada para la carga
+
+    Si algo falla no queda nada a medias (ni tablas sin índices).
+    """
+    try:
+        for pragma in LOAD_PRAGMAS:
+            db.session.connection().exec_driver_sql(f'PRAGMA {pragma}')
+        counts = _generate(**options)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        connection = db.session.connection()
+        for pragma in RESTORE_PRAGMAS:
+            connection.exec_driver_sql(f'PRAGMA {pragma}')
+        connection.exec_driver_sql('PRAGMA optimize')
+        db.session.commit()
+    return counts
+
+def _generate(cases=10000, clients=None, lawyers=None, contacts=None, years=5, seed=42,
+              until=None, batch_size=50000, password='cambiar123', progress=None):
+    """Generar datos sintéticos coherentes a escala con inserciones masivas de Core
+
+    Todo sale de un generador aleatorio con semilla: con la misma semilla,
+    fecha final y base de partida el resultado es idéntico. Las
+    distribuciones son sesgadas: pocos clientes y abogados concentran
+    muchos casos (Zipf), hay más casos recientes que antiguos y los casos se
+    cierran tras una duración lognormal, así que los antiguos están casi
+    todos cerrados y los abiertos son recientes. Los ids se asignan aquí
+    para enlazar las tablas sin leerlas de vuelta, y los contadores, las
+    claves de duplicados y el histograma de cierres se calculan durante la
+    generación; los pares de duplicados se puntúan al final. Las filas generadas no pasan por la sesión: no dejan
+    entradas de actividad ni de auditoría, como los datos anteriores a esos
+    registros. Devuelve el número de filas insertadas por tabla.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    clients = clients if clients is not None else max(1, cases // 3)
+    lawyers = lawyers if lawyers is not None else max(3, cases // 2500)
+    contacts = contacts if contacts is not None else cases // 4
+    until = until or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = calendar.timegm(until.timetuple())
+    start = end - int(years * 365.25 * 86400)
+    span = end - start
+
+    pick_prioridad = _picker(rng, PRIORIDADES)
+    pick_tipo = _picker(rng, TIPOS_EQUIPO)
+    pick_condicion = _picker(rng, CONDICIONES)
+    pick_equipos = _picker(rng, EQUIPOS_POR_CASO)
+    pick_tipo_evento = _picker(rng, TIPOS_EVENTO)
+    pick_eventos = _picker(rng, EVENTOS_POR_CASO)
+    pick_transacciones = _picker(rng, TRANSACCIONES_POR_CASO)
+
+    def person():
+        return f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+
+    def phone():
+        return f'+34 6{rng.randrange(10 ** 8):08d}'
+
+    # Partir de los ids actuales: los datos existentes no se tocan
+    user_id = _next_id(User)
+    client_id = _next_id(Client)
+    case_id = _next_id(Case)
+    equipo_id = _next_id(Equipment)
+    evento_id = _next_id(AgendaEvent)
+    transaccion_id = _next_id(Transaction)
+    contacto_id = _next_id(Contact)
+
+    connection = db.session.connection()
+    dropped = _drop_indexes(connection, (Case, Equipment, AgendaEvent, Transaction, Contact, ClientKey))
+    # Las filas generadas no pasan por el registro de cambios: al reinstalar los
+    # disparadores se corta el registro y las réplicas se resincronizan
+    drop_change_triggers(connection)
+    inserter = _Inserter(connection, batch_size)
+
+    # Abogados
+    password_hash = generate_password_hash(password)  # un solo hash (es lento a propósito)
+    lawyer_ids = list(range(user_id, user_id + lawyers))
+    for n, lawyer in enumerate(lawyer_ids):
+        nombre = person()
+        inserter.add(User, ('id', 'nombre_completo', 'email', 'password_hash', 'rol', 'fecha_registro', 'activo'), (
+            lawyer, nombre, f'abogado{lawyer}@seed.forensicweb.com', password_hash, 'abogado',
+            _fmt(start - rng.randrange(365 * 86400)), 1
+        ))
+    lawyer_cumulative = _zipf_cumulative(lawyers, 0.8)
+    report(f'{lawyers} abogados')
+
+    # Esqueleto de los casos: apertura (más densa hacia el final) y cliente (Zipf)
+    aperturas = array('q', sorted(start + int(span * math.sqrt(rng.random())) for _ in range(cases)))
+    client_cumulative = _zipf_cumulative(clients, 1.05)
+    client_total = client_cumulative[-1]
+    client_order = list(range(clients))
+    rng.shuffle(client_order)  # el tamaño de un cliente no depende de su id
+    case_clients = array('l', (
+        client_order[bisect.bisect(client_cumulative, rng.random() * client_total)] for _ in range(cases)
+    ))
+
+    # Estado, cierre y abogado de cada caso; con ello los contadores de sus clientes
+    first_case = [None] * clients
+    total_casos = array('l', bytes(8 * clients))
+    casos_activos = array('l', bytes(8 * clients))
+    case_rows = []
+    close_times = defaultdict(int)
+    lawyer_total = lawyer_cumulative[-1]
+    for n in range(cases):
+        apertura = aperturas[n]
+        cliente = case_clients[n]
+        prioridad = pick_prioridad()
+        dias = rng.lognormvariate(math.log(DURACION_MEDIANA_DIAS * DURACION_FACTOR[prioridad]), DURACION_SIGMA)
+        cierre = apertura + int(dias * 86400)
+        if cierre <= end:
+            estado = 'archivado' if rng.random() < 0.15 else 'cerrado'
+        else:
+            estado, cierre = ('en_proceso' if rng.random() < 0.65 else 'pendiente'), None
+        abogado = None if rng.random() < 0.05 else lawyer_ids[bisect.bisect(lawyer_cumulative, rng.random() * lawyer_total)]
+        case_rows.append((estado, prioridad, cierre, abogado))
+
+        if first_case[cliente] is None:
+            first_case[cliente] = apertura
+        total_casos[cliente] += 1
+        if estado != 'cerrado':
+            casos_activos[cliente] += 1
+        key = close_time_key(
+            estado, abogado, prioridad,
+            datetime.utcfromtimestamp(apertura), datetime.utcfromtimestamp(cierre) if cierre else None
+        )
+        if key is not None:
+            close_times[key] += 1
+
+    # Clientes: registrados antes de su primer caso, con sus contadores y claves de duplicados
+    for n in range(clients):
+        cid = client_id + n
+        nombre = rng.choice(EMPRESAS) + ' ' + rng.choice(APELLIDOS) + ' S.L.' if rng.random() < 0.2 else person()
+        email = f'cliente{cid}@seed.forensicweb.com'
+        telefono = phone()
+        registro = (first_case[n] if first_case[n] is not None else start + rng.randrange(span)) - rng.randrange(30 * 86400)
+        inserter.add(Client, ('id', 'nombre_completo', 'email', 'telefono', 'direccion', 'fecha_registro', 'total_casos', 'casos_activos'), (
+            cid, nombre, email, telefono,
+            f'{rng.choice(CALLES)} {rng.randrange(1, 200)}, {rng.choice(CIUDADES)}',
+            _fmt(registro), total_casos[n], casos_activos[n]
+        ))
+        for clave in sorted(blocking_keys(nombre, email, telefono)):
+            inserter.add(ClientKey, ('cliente_id', 'clave'), (cid, clave))
+    inserter.flush()
+    report(f'{clients} clientes')
+
+    # Casos con sus equipos, eventos de agenda y transacciones
+    busy = {}  # (abogado, día) -> máscara de bits de las franjas ocupadas
+    for n in range(cases):
+        cid = case_id + n
+        apertura = aperturas[n]
+        estado, prioridad, cierre, abogado = case_rows[n]
+        year = time.gmtime(apertura).tm_year
+        equipos = pick_equipos()
+        inserter.add(Case, ('id', 'numero_caso', 'titulo', 'descripcion', 'cliente_id', 'abogado_asignado_id', 'estado',
+                            'prioridad', 'fecha_apertura', 'fecha_cierre', 'total_equipos'), (
+            cid, f'SEED-{year}-{cid:07d}', rng.choice(TEMAS), None, client_id + case_clients[n], abogado, estado,
+            prioridad, _fmt(apertura), _fmt(cierre) if cierre else None, equipos
+        ))
+        activo_hasta = cierre or end
+
+        for _ in range(equipos):
+            tipo = pick_tipo()
+            inserter.add(Equipment, ('id', 'caso_id', 'tipo_equipo', 'marca', 'modelo', 'numero_serie', 'imei',
+                                     'condicion_fisica', 'recibido_de', 'fecha_recepcion'), (
+                equipo_id, cid, tipo, rng.choice(MARCAS[tipo]), f'M{rng.randrange(100, 999)}',
+                f'SN{rng.getrandbits(40):010X}',
+                f'{rng.randrange(10 ** 14, 10 ** 15)}' if tipo == 'Teléfono móvil' else None,
+                pick_condicion(), person(), _fmt(apertura + rng.randrange(7 * 86400))
+            ))
+            equipo_id += 1
+
+        if abogado is not None:
+            for _ in range(pick_eventos()):
+                # Primer hueco libre del abogado desde una fecha al azar de la vida del caso:
+                # sus eventos no se solapan, como exige la agenda
+                day = (apertura + rng.randrange(max(activo_hasta - apertura, 86400))) // 86400
+                length = rng.randrange(1, 4)
+                first = rng.randrange(SLOTS_PER_DAY - length + 1)
+                for day in range(day, day + AGENDA_SEARCH_DAYS):
+                    taken = busy.get((abogado, day), 0)
+                    free = [
+                        offset for offset in range(SLOTS_PER_DAY - length + 1)
+                        if not taken >> offset & ((1 << length) - 1)
+                    ]
+                    if free:
+                        offset = min(free, key=lambda candidate: (candidate < first, candidate))
+                        busy[(abogado, day)] = taken | ((1 << length) - 1) << offset
+                        break
+                else:
+                    continue
+                inicio = day * 86400 + DAY_START_SECONDS + offset * SLOT_SECONDS
+                tipo_evento = pick_tipo_evento()
+                inserter.add(AgendaEvent, ('id', 'titulo', 'fecha_inicio', 'fecha_fin', 'ubicacion', 'tipo_evento',
+                                           'usuario_id', 'caso_id'), (
+                    evento_id, f'{tipo_evento.capitalize()} caso SEED-{year}-{cid:07d}', _fmt(inicio),
+                    _fmt(inicio + length * SLOT_SECONDS), rng.choice(CIUDADES), tipo_evento, abogado, cid
+                ))
+                evento_id += 1
+
+        for _ in range(pick_transacciones()):
+            ingreso = rng.random() < 0.6
+            centavos = int(rng.lognormvariate(math.log(80000 if ingreso else 15000), 0.8))
+            inserter.add(Transaction, ('id', 'caso_id', 'tipo', 'concepto', 'monto_centavos', 'fecha', 'usuario_id'), (
+                transaccion_id, cid, 'ingreso' if ingreso else 'gasto',
+                'Honorarios periciales' if ingreso else rng.choice(('Material de laboratorio', 'Desplazamiento', 'Licencias de software')),
+                centavos, _fmt(apertura + rng.randrange(max(min(activo_hasta, end) - apertura, 1))), abogado
+            ))
+            transaccion_id += 1
+
+        if (n + 1) % 100000 == 0:
+            report(f'{n + 1} casos')
+    case_rows = None
+    busy = None
+
+    # Mensajes de contacto: los recientes siguen sin leer
+    for n in range(contacts):
+        enviado = start + int(span * math.sqrt(rng.random()))
+        inserter.add(Contact, ('id', 'nombre', 'email', 'asunto', 'mensaje', 'fecha_envio', 'leido'), (
+            contacto_id + n, person(), f'contacto{contacto_id + n}@seed.example.com', rng.choice(TEMAS),
+            'Solicito información sobre un peritaje informático.', _fmt(enviado),
+            1 if end - enviado > 30 * 86400 or rng.random() < 0.3 else 0
+        ))
+    inserter.flush()
+    report(f'{cases} casos y {contacts} mensajes')
+
+    apply_close_time_deltas(connection, close_times)
+    for index in dropped:
+        index.create(connection)
+    report('índices recreados')
+    rebuild_duplicate_pairs(connection)
+    report('pares de duplicados puntuados')
+    rebuild_daily_totals()
+    install_change_triggers(connection)
+
+    invalidate_tables(db.session(), 'usuarios', 'clientes', 'clientes_claves', 'clientes_duplicados', 'casos', 'equipos',
+                      'agenda_eventos', 'transacciones', 'finanzas_diarias', 'contactos', 'analitica_cierres')
+    return dict(inserter.counts)
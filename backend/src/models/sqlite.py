@@ -0,0 +1,20 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Espera máxima (ms) ante un bloqueo de escritura de otro proceso antes de fallar
+BUSY_TIMEOUT_MS = 30000
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """Ajustes por conexión para varios procesos escribiendo en el mismo archivo
+
+    WAL deja leer mientras otro proceso escribe y busy_timeout hace esperar
+    en vez de devolver 'database is locked' al instante.
+    """
+    if type(dbapi_connection).__module__ != 'sqlite3':
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app, g, has_request_context, session as flask_session
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from src.models.user import db
+
+try:
+    import fcntl
+except ImportError:  # sin flock (Windows) solo se serializa dentro del proceso
+    fcntl = None
+
+class SingleWriter:
+    """Hilo escritor de un proceso: una conexión propia y commits agrupados
+
+    Las escrituras encoladas en una ventana corta se ejecutan cada una en su
+    SAVEPOINT y se confirman con un único COMMIT. Entre procesos se coordinan
+    con un flock sobre un archivo junto a la base de datos, así que esperan
+    en cola en lugar de competir por el bloqueo de SQLite. Las lecturas no
+    pasan por aquí y siguen siendo concurrentes (WAL).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.jobs = queue.Queue()
+        self.window = app.config['WRITER_GROUP_COMMIT_MS'] / 1000
+        self.max_batch = app.config['WRITER_MAX_BATCH']
+        self.thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, usuario_id=None):
+        future = Future()
+        self.jobs.put((fn, usuario_id, future))
+        return future.result()
+
+    def _connect(self):
+        from src.models.archive import attach_existing_archive
+
+        engine = create_engine(db.engine.url, poolclass=NullPool)
+
+        @event.listens_for(engine, 'connect')
+        def _manual_transactions(dbapi_connection, connection_record):
+            # El driver no abre transacciones por su cuenta: las abre el evento 'begin'
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, 'begin')
+        def _begin_immediate(connection):
+            # ATTACH no se permite dentro de la transacción: el archivo se adjunta antes
+            attach_existing_archive(connection)
+            # Tomar el bloqueo de escritura al empezar el grupo, no en el primer INSERT
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+        return engine.connect()
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch, lock_file):
+        outcomes = []
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            db.session.connection()  # BEGIN IMMEDIATE
+            for fn, usuario_id, future in batch:
+                db.session.info['usuario_id'] = usuario_id
+                try:
+                    with db.session.begin_nested():
+                        outcomes.append((future, fn(), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            db.session.info.pop('usuario_id', None)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            db.session.info.pop('usuario_id', None)
+            done = {id(future) for future, _, _ in outcomes}
+            outcomes = [(future, None, error or e) for future, _, error in outcomes]
+            outcomes += [(future, None, e) for _, _, future in batch if id(future) not in done]
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run(self):
+        with self.app.app_context():
+            # db.session en este hilo es una sesión ligada a la conexión del escritor
+            db.session.registry.set(Session(bind=self._connect()))
+            with open(f'{db.engine.url.database}.writer.lock', 'a+') as lock_file:
+                while True:
+                    self._run_batch(self._next_batch(), lock_file)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer(app):
+    global _writer
+    with _writer_lock:
+        # Tras un fork el hilo del padre no existe: cada proceso crea el suyo
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = SingleWriter(app)
+        return _writer
+
+def run_write(fn):
+    """Ejecutar una escritura y devolver su resultado
+
+    `fn` trabaja con db.session sin hacer commit y devuelve datos simples
+    (p. ej. to_dict()), no instancias del ORM. Con SQLITE_SINGLE_WRITER se
+    ejecuta en el hilo escritor del proceso; si no, aquí mismo, confirmando
+    la sesión de la petición. En un lote atómico siempre se ejecuta aquí para
+    que forme parte de su transacción.
+    """
+    if not current_app.config.get('SQLITE_SINGLE_WRITER') or g.get('batch_atomic'):
+        result = fn()
+        db.session.commit()
+        return result
+
+    writer = _get_writer(current_app._get_current_object())
+    if threading.current_thread() is writer.thread:
+        return fn()
+
+    usuario_id = flask_session.get('user_id') if has_request_context() else None
+    return writer.submit(fn, usuario_id)
@@ -0,0 +1,214 @@
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.case import AgendaEvent
+from src.models.activity import ActivityEvent
+from src.models.reminder import Reminder
+
+class ReminderScheduler:
+    """Temporizador de recordatorios de agenda de un proceso
+
+    Solo tiene en memoria los avisos de la ventana siguiente
+    (REMINDER_WINDOW_HOURS) en un montículo ordenado por hora de disparo, y
+    duerme hasta el próximo. Los cambios de la agenda no se buscan
+    consultando la tabla: quien confirma un cambio toca un archivo de señal
+    junto a la base de datos, y el planificador lee del registro de
+    actividad solo los eventos que cambiaron desde su cursor y los vuelve a
+    programar. Cada proceso tiene el suyo; el aviso se inserta una sola vez
+    gracias a la restricción única de `recordatorios`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.leads = sorted(app.config['REMINDER_LEADS_MINUTES'], reverse=True)
+        self.window = timedelta(hours=app.config['REMINDER_WINDOW_HOURS'])
+        self.signal_check = app.config['REMINDER_SIGNAL_CHECK_SECONDS']
+        self.heap = []  # (disparo, evento_id, antelación, fecha_inicio)
+        self.armed = {}  # evento_id -> (fecha_inicio, usuario_id, caso_id, titulo)
+        self.cursor = 0  # último id de `actividad` aplicado
+        self.window_end = None
+        self.signal_mtime = None
+        self.changed = threading.Event()
+        self.fired = threading.Condition()
+        self.fired_count = 0
+        self.thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self.thread.start()
+
+    def _arm(self, evento, now):
+        """Programar los avisos de un evento que caen dentro de la ventana"""
+        self.armed[evento.id] = (evento.fecha_inicio, evento.usuario_id, evento.caso_id, evento.titulo)
+        overdue = []
+        for lead in self.leads:
+            fire_at = evento.fecha_inicio - timedelta(minutes=lead)
+            if fire_at <= now:
+                overdue.append(lead)
+            elif fire_at < self.window_end:
+                heapq.heappush(self.heap, (fire_at, evento.id, lead, evento.fecha_inicio))
+        # Avisos ya vencidos (evento creado con poca antelación, proceso reiniciado):
+        # se emite tarde solo el más corto, y si aún falta al menos la mitad de su antelación
+        if overdue and evento.fecha_inicio - now >= timedelta(minutes=overdue[-1] / 2):
+            heapq.heappush(self.heap, (now, evento.id, overdue[-1], evento.fecha_inicio))
+
+    def _load_window(self, now):
+        """Cargar los eventos cuyos avisos caen en la ventana siguiente"""
+        self.window_end = now + self.window
+        self.heap = []
+        self.armed = {}
+        # Cursor antes de leer los eventos: lo que cambie entre medias se reaplica
+        self.cursor = db.session.query(func.coalesce(func.max(ActivityEvent.id), 0)).scalar()
+        events = AgendaEvent.query.filter(
+            AgendaEvent.fecha_inicio > now,
+            AgendaEvent.fecha_inicio < self.window_end + timedelta(minutes=self.leads[0])
+        ).all()
+        for evento in events:
+            self._arm(evento, now)
+        db.session.commit()
+
+    def _apply_changes(self, now):
+        """Reprogramar solo los eventos de agenda que cambiaron desde el cursor"""
+        rows = db.session.query(ActivityEvent.id, ActivityEvent.entidad_id).filter(
+            ActivityEvent.id > self.cursor,
+            ActivityEvent.tipo_entidad == 'agenda'
+        ).all()
+        if rows:
+            self.cursor = max(row.id for row in rows)
+            ids = {row.entidad_id for row in rows}
+            # Las entradas viejas del montículo se descartan al salir (ya no coinciden con `armed`)
+            for evento_id in ids:
+                self.armed.pop(evento_id, None)
+            for evento in AgendaEvent.query.filter(AgendaEvent.id.in_(ids), AgendaEvent.fecha_inicio > now).all():
+                self._arm(evento, now)
+        db.session.commit()
+
+    def _fire_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, evento_id, lead, fecha_inicio = heapq.heappop(self.heap)
+            armed = self.armed.get(evento_id)
+            if armed is None or armed[0] != fecha_inicio:
+                continue  # evento borrado o movido
+            _, usuario_id, caso_id, titulo = armed
+            due.append({
+                'evento_id': evento_id,
+                'usuario_id': usuario_id,
+                'caso_id': caso_id,
+                'titulo': titulo,
+                'fecha_evento': fecha_inicio,
+                'antelacion_minutos': lead,
+                'fecha_aviso': now,
+                'leido': False
+            })
+        if not due:
+            return
+
+        with db.engine.begin() as connection:
+            connection.execute(insert(Reminder).prefix_with('OR IGNORE'), due)
+        with self.fired:
+            self.fired_count += 1
+            self.fired.notify_all()
+
+    def _signalled(self):
+        try:
+            mtime = os.stat(signal_path()).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        changed = mtime != self.signal_mtime
+        self.signal_mtime = mtime
+        return changed
+
+    def _timeout(self, now):
+        wake = self.window_end
+        if self.heap:
+            wake = min(wake, self.heap[0][0])
+        return max(min((wake - now).total_seconds(), self.signal_check), 0)
+
+    def _step(self):
+        now = datetime.utcnow()
+        if self.window_end is None or now >= self.window_end:
+            self._signalled()
+            self._load_window(now)
+        elif self._signalled() or self.changed.is_set():
+            self.changed.clear()
+            self._apply_changes(now)
+        self._fire_due(now)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self._step()
+                except Exception as e:
+                    db.session.rollback()
+                    self.window_end = None  # recargar la ventana en el siguiente intento
+                    self.app.logger.error(f'Error en el planificador de recordatorios: {e}')
+                    time.sleep(self.signal_check)
+                    continue
+                self.changed.wait(self._timeout(datetime.utcnow()))
+
+    def wait_for_reminders(self, seen, timeout):
+        """Esperar a que se disparen avisos después de `seen`; devuelve el nuevo contador"""
+        with self.fired:
+            if self.fired_count == seen:
+                self.fired.wait(timeout)
+            return self.fired_count
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler(app):
+    global _scheduler
+    with _scheduler_lock:
+        # Tras un fork el hilo del padre no existe: cada proceso crea el suyo
+        if _scheduler is None or _scheduler.pid != os.getpid():
+            _scheduler = ReminderScheduler(app)
+        return _scheduler
+
+def signal_path():
+    """Archivo que se toca al confirmar cambios de agenda (lo vigilan todos los procesos)"""
+    return f'{db.engine.url.database}.agenda.signal'
+
+def _notify_agenda_changed():
+    path = signal_path()
+    with open(path, 'a'):
+        os.utime(path)
+    if _scheduler is not None and _scheduler.pid == os.getpid():
+        _scheduler.changed.set()
+
+@event.listens_for(Session, 'after_flush')
+def _track_agenda_changes(session, flush_context):
+    if any(isinstance(obj, AgendaEvent) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['agenda_changed'] = True
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_agenda_changes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('agenda_changed', None)
+
+@event.listens_for(Session, 'after_commit')
+def _rearm_reminders(session):
+    # El RELEASE de un SAVEPOINT también dispara after_commit: esperar al COMMIT real
+    if session.get_nested_transaction() is not None:
+        return
+    if session.info.pop('agenda_changed', None) and current_app.config.get('REMINDERS_ENABLED'):
+        _notify_agenda_changed()
+
+def init_reminders(app):
+    """Arrancar el planificador de recordatorios con la primera petición de cada proceso
+
+    No se arranca al importar la aplicación para no crear hilos en el
+    proceso maestro de gunicorn ni en los comandos `flask`.
+    """
+    if not app.config.get('REMINDERS_ENABLED'):
+        return
+
+    @app.before_request
+    def start_reminder_scheduler():
+        if _scheduler is None or _scheduler.pid != os.getpid():
+            get_scheduler(app)
@@ -0,0 +1,395 @@
+import gzip
+import http.cookiejar
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from flask import current_app, jsonify, request
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from src.cache import get_cache
+from src.models.user import db
+from src.models.changes import TRIGGER_PREFIX
+
+# Rutas que una réplica atiende aunque no sean GET: la sesión y los lotes
+# (cada sub-petición vuelve a pasar por el filtro de escrituras)
+READ_ONLY_ALLOWED = {'auth.login', 'auth.logout', 'batch.run_batch'}
+
+# Sin cambios que aplicar, el estado de la réplica se anota como mucho cada tantos segundos
+HEARTBEAT_SECONDS = 30
+
+# Valores de `replicacion` que se devuelven como enteros o decimales
+_INTEGER_STATE = ('cursor', 'maximo', 'retraso_cambios', 'lotes', 'cambios_aplicados', 'resincronizaciones')
+_FLOAT_STATE = ('retraso_segundos',)
+
+class ResyncRequired(Exception):
+    """La réplica no puede seguir desde su cursor: hay que cargar una instantánea"""
+
+def _read(response):
+    body = response.read()
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return body
+
+def _seconds_between(start, end):
+    return max((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds(), 0.0)
+
+class ReplicaApplier:
+    """Mantiene la copia local al día con el registro de cambios del principal
+
+    Pide /api/_changes desde su cursor y aplica cada lote en una transacción
+    de la copia local junto con el nuevo cursor, así que tras un corte sigue
+    donde lo dejó sin aplicar nada dos veces. Los lotes acaban en un límite
+    de transacción del principal; uno que no cabe en un lote se aplica en
+    varias peticiones dentro de la misma transacción local. Si el principal
+    ya no tiene los cambios pedidos (410), cambió el esquema o la réplica aún
+    no tiene cursor, se resincroniza desde una instantánea. Los procesos web
+    de la réplica leen el mismo archivo; tras cada lote se invalidan en la
+    caché compartida las tablas tocadas.
+    """
+
+    def __init__(self, database, primary, email, password, batch_size, poll_seconds, report=None):
+        self.database = database
+        self.primary = primary.rstrip('/') if primary else None
+        self.email = email
+        self.password = password
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.report = report or (lambda message: None)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.logged_in = False
+        self.connection = None
+        self.statements = {}  # (tabla, columnas) -> INSERT OR REPLACE
+        self.primary_keys = {}
+        self.heartbeat = 0.0
+
+    def _connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.database), exist_ok=True)
+            self.connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+        return self.connection
+
+    def _open(self, path, params=None, data=None):
+        if not self.primary:
+            raise RuntimeError('Falta la URL del principal (REPLICA_PRIMARY_URL)')
+        url = f'{self.primary}{path}'
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        headers = {'Accept-Encoding': 'gzip'}
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+            data = json.dumps(data).encode()
+        return self.opener.open(urllib.request.Request(url, data=data, headers=headers), timeout=60)
+
+    def _login(self):
+        if not self.email or not self.password:
+            raise RuntimeError('Faltan las credenciales de administrador para leer el registro del principal')
+        try:
+            self._open('/api/auth/login', data={'email': self.email, 'password': self.password}).close()
+        except urllib.error.HTTPError as e:
+            if e.code == 401:
+                raise RuntimeError('El principal rechazó las credenciales de la réplica')
+            raise
+        self.logged_in = True
+
+    def _get(self, path, params=None):
+        """GET autenticado; si el principal rechaza la sesión se vuelve a iniciar una vez"""
+        for attempt in range(2):
+            if not self.logged_in:
+                self._login()
+            try:
+                return self._open(path, params)
+            except urllib.error.HTTPError as e:
+                if e.code in (401, 403) and attempt == 0:
+                    self.logged_in = False
+                    continue
+                if e.code == 410:
+                    raise ResyncRequired(json.loads(_read(e) or b'{}').get('error', 'Registro de cambios caducado'))
+                raise
+
+    def fetch(self, since):
+        with self._get('/api/_changes', {'since': since, 'limit': self.batch_size}) as response:
+            return json.loads(_read(response))
+
+    def state(self):
+        """Valores de `replicacion` en la copia local ({} si aún no hay copia)"""
+        try:
+            return dict(self._connect().execute('SELECT clave, valor FROM replicacion').fetchall())
+        except sqlite3.OperationalError:
+            return {}
+
+    def _save_state(self, state, values):
+        state.update({key: str(value) for key, value in values.items()})
+        self.connection.executemany("""
+            INSERT INTO replicacion (clave, valor) VALUES (?, ?)
+            ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor
+        """, [(key, str(value)) for key, value in values.items()])
+
+    def _primary_key(self, table):
+        if table not in self.primary_keys:
+            info = self.connection.execute(f'PRAGMA table_info("{table}")').fetchall()
+            self.primary_keys[table] = [row[1] for row in sorted((row for row in info if row[5]), key=lambda row: row[5])]
+        return self.primary_keys[table]
+
+    def _apply(self, change):
+        table = change['tabla']
+        row = change['fila']
+        primary_key = self._primary_key(table)
+        # Una baja, o un cambio de clave primaria: la fila anterior desaparece
+        if row is None or [row[column] for column in primary_key] != change['clave']:
+            self.connection.execute(
+                f'DELETE FROM "{table}" WHERE ' + ' AND '.join(f'"{column}" = ?' for column in primary_key),
+                change['clave']
+            )
+        if row is not None:
+            key = (table, tuple(row))
+            statement = self.statements.get(key)
+            if statement is None:
+                columns = ', '.join(f'"{column}"' for column in row)
+                statement = self.statements[key] = (
+                    f'INSERT OR REPLACE INTO "{table}" ({columns}) VALUES ({", ".join("?" * len(row))})'
+                )
+            self.connection.execute(statement, tuple(row.values()))
+
+    def _invalidate(self, tables):
+        try:
+            get_cache().bump(tables)
+        except Exception as e:
+            self.report(f'No se pudo invalidar la caché ({", ".join(sorted(tables))}): {e}')
+
+    def sync(self):
+        """Aplicar todo lo pendiente en el principal; devuelve el número de cambios aplicados"""
+        state = self.state()
+        if 'cursor' not in state:
+            raise ResyncRequired('La réplica aún no tiene una instantánea')
+        connection = self._connect()
+        cursor = int(state['cursor'])
+        applied = 0
+        batch = 0
+        tables = set()
+        lag = 0.0
+
+        try:
+            while True:
+                feed = self.fetch(cursor)
+                if feed['esquema'] != state.get('esquema'):
+                    raise ResyncRequired('El esquema de la base de datos del principal cambió')
+
+                if feed['ultimo'] == cursor and not connection.in_transaction:
+                    if time.monotonic() - self.heartbeat >= HEARTBEAT_SECONDS:
+                        self._save_state(state, {
+                            'maximo': feed['maximo'], 'retraso_cambios': feed['maximo'] - cursor,
+                            'ultima_consulta': datetime.utcnow().isoformat()
+                        })
+                        self.heartbeat = time.monotonic()
+                    return applied
+
+                if not connection.in_transaction:
+                    connection.execute('BEGIN IMMEDIATE')
+                    # Retraso del lote: cuánto llevaba confirmado en el principal su cambio más antiguo
+                    lag = _seconds_between(feed['cambios'][0]['fecha'], feed['ahora']) if feed['cambios'] else 0.0
+                for change in feed['cambios']:
+                    self._apply(change)
+                    tables.add(change['tabla'])
+                batch += len(feed['cambios'])
+                cursor = feed['ultimo']
+                if not feed['completo']:
+                    continue  # la transacción del principal sigue en la siguiente petición
+
+                now = datetime.utcnow().isoformat()
+                self._save_state(state, {
+                    'cursor': cursor,
+                    'maximo': feed['maximo'],
+                    'retraso_cambios': feed['maximo'] - cursor,
+                    'retraso_segundos': round(lag, 3),
+                    'ultima_aplicacion': now,
+                    'ultima_consulta': now,
+                    'lotes': int(state.get('lotes', 0)) + 1,
+                    'cambios_aplicados': int(state.get('cambios_aplicados', 0)) + batch
+                })
+                connection.execute('COMMIT')
+                self.heartbeat = time.monotonic()
+                if tables:
+                    self._invalidate(tables)
+                applied += batch
+                batch = 0
+                tables = set()
+                if not feed['hay_mas']:
+                    return applied
+        except sqlite3.IntegrityError as e:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise ResyncRequired(f'La copia local no admite un cambio del principal: {e}')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+
+    def _prepare(self, path, previous):
+        """Dejar la instantánea lista para servir lecturas y devolver su cursor
+
+        Quita los disparadores y las entradas del registro (la réplica no
+        publica cambios) y anota el cursor, que es el último seq asignado
+        en el principal al hacer la copia.
+        """
+        copy = sqlite3.connect(path, isolation_level=None)
+        try:
+            try:
+                sequence = copy.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+                schema = copy.execute("SELECT valor FROM replicacion WHERE clave = 'esquema'").fetchone()
+            except sqlite3.OperationalError:
+                schema = None
+            if schema is None:
+                raise RuntimeError('La instantánea no tiene registro de cambios')
+            cursor = sequence[0] if sequence else 0
+
+            copy.execute('BEGIN')
+            triggers = copy.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name GLOB ?", (f'{TRIGGER_PREFIX}*',)
+            ).fetchall()
+            for (name,) in triggers:
+                copy.execute(f'DROP TRIGGER {name}')
+            copy.execute('DELETE FROM cambios')
+            copy.execute('DELETE FROM replicacion')
+            now = datetime.utcnow().isoformat()
+            copy.executemany('INSERT INTO replicacion (clave, valor) VALUES (?, ?)', [(key, str(value)) for key, value in {
+                'cursor': cursor,
+                'esquema': schema[0],
+                'primario': self.primary or '',
+                'maximo': cursor,
+                'retraso_cambios': 0,
+                'retraso_segundos': 0,
+                'ultima_aplicacion': now,
+                'ultima_consulta': now,
+                'lotes': previous.get('lotes', 0),
+                'cambios_aplicados': previous.get('cambios_aplicados', 0),
+                'resincronizaciones': int(previous.get('resincronizaciones', 0)) + 1,
+                'fecha_resincronizacion': now
+            }.items()])
+            copy.execute('COMMIT')
+
+            check = copy.execute('PRAGMA quick_check').fetchone()[0]
+            if check != 'ok':
+                raise RuntimeError(f'La instantánea está dañada: {check}')
+        finally:
+            copy.close()
+        return cursor
+
+    def resync(self, snapshot=None):
+        """Cargar una instantánea del principal (o el archivo `snapshot`) en la copia local
+
+        La instantánea se prepara en un archivo aparte y se vuelca sobre la
+        copia local con la API de backup de SQLite, que la sustituye en una
+        sola transacción: los procesos web que tienen abierta la copia pasan
+        a ver la nueva versión sin cerrar sus conexiones. Devuelve el cursor.
+        """
+        previous = self.state()
+        handle, partial = tempfile.mkstemp(prefix='replica-', suffix='.db.part', dir=os.path.dirname(self.database))
+        os.close(handle)
+        try:
+            if snapshot:
+                source = sqlite3.connect(f'file:{snapshot}?mode=ro', uri=True)
+                target = sqlite3.connect(partial)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+            else:
+                with self._get('/api/_changes/snapshot') as response, open(partial, 'wb') as output:
+                    body = gzip.GzipFile(fileobj=response) if response.headers.get('Content-Encoding') == 'gzip' else response
+                    shutil.copyfileobj(body, output, 1024 * 1024)
+
+            cursor = self._prepare(partial, previous)
+            copy = sqlite3.connect(partial)
+            try:
+                copy.backup(self._connect())
+            finally:
+                copy.close()
+            self.connection.execute('PRAGMA journal_mode=WAL')
+        finally:
+            os.remove(partial)
+
+        self.statements.clear()
+        self.primary_keys.clear()
+        self.heartbeat = time.monotonic()
+        tables = [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        self._invalidate(tables)
+        return cursor
+
+    def run(self, once=False):
+        """Seguir el registro del principal (con once, aplicar lo pendiente y salir)"""
+        while True:
+            try:
+                applied = self.sync()
+                if applied:
+                    self.report(f'{applied} cambios aplicados')
+            except ResyncRequired as e:
+                self.report(f'Resincronizando desde una instantánea: {e}')
+                self.report(f'Instantánea cargada, cursor {self.resync()}')
+                continue
+            except (OSError, sqlite3.OperationalError) as e:
+                # Principal inaccesible o copia local bloqueada: se reintenta
+                if once:
+                    raise
+                self.report(f'Error al replicar: {e}')
+            if once:
+                return
+            time.sleep(self.poll_seconds)
+
+def create_applier(primary=None, email=None, password=None, batch_size=None, poll_seconds=None, report=None):
+    """Aplicador sobre la base de datos de esta aplicación con los valores de REPLICA_*"""
+    config = current_app.config
+    return ReplicaApplier(
+        db.engine.url.database, primary or config['REPLICA_PRIMARY_URL'], email, password,
+        batch_size or config['REPLICA_BATCH_SIZE'], poll_seconds or config['REPLICA_POLL_SECONDS'], report
+    )
+
+def replica_stats():
+    """Cursor, retraso y resincronizaciones de esta réplica según los anotó `flask replica run`"""
+    state = dict(db.session.execute(text('SELECT clave, valor FROM replicacion')).all())
+    stats = {'modo': 'replica'}
+    for key, value in sorted(state.items()):
+        if key in _INTEGER_STATE:
+            value = int(value)
+        elif key in _FLOAT_STATE:
+            value = float(value)
+        stats[key] = value
+    if state.get('ultima_consulta'):
+        stats['segundos_sin_consultar'] = round(
+            (datetime.utcnow() - datetime.fromisoformat(state['ultima_consulta'])).total_seconds(), 1
+        )
+    return stats
+
+def init_replica(app):
+    """Convertir este nodo en réplica de solo lectura si REPLICA_MODE está activo
+
+    Las conexiones a la base de datos se abren con PRAGMA query_only, las
+    peticiones que escriben reciben 403 y el planificador de recordatorios
+    no arranca: los avisos llegan replicados desde el principal.
+    """
+    if not app.config['REPLICA_MODE']:
+        return
+    app.config['REMINDERS_ENABLED'] = False
+
+    @event.listens_for(Engine, 'connect')
+    def _read_only_connection(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.execute('PRAGMA query_only = ON')
+
+    @app.before_request
+    def reject_writes():
+        if request.method in ('GET', 'HEAD', 'OPTIONS') or request.endpoint in READ_ONLY_ALLOWED:
+            return None
+        return jsonify({
+            'error': 'Este nodo es una réplica de solo lectura: las escrituras se hacen en el principal',
+            'principal': app.config['REPLICA_PRIMARY_URL']
+        }), 403
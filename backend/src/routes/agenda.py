@@ -0,0 +1,301 @@
+from flask import Blueprint, request, jsonify, session, current_app
+from src.models.case import AgendaEvent, Case, db
+from src.models.writer import run_write
+from src.routes.auth import require_auth
+from datetime import datetime, timedelta
+import heapq
+
+agenda_bp = Blueprint('agenda', __name__)
+
+# Los eventos sin duración ocupan un hueco mínimo para detectar coincidencias
+MIN_EVENT_DURATION = timedelta(minutes=1)
+
+class _Conflicts(Exception):
+    """El evento se solapa con otros: la escritura se deshace y se responde 409"""
+
+    def __init__(self, events):
+        super().__init__('El evento se solapa con otros eventos de la agenda')
+        self.events = events
+
+def _parse_datetime(value, field):
+    """Convertir una fecha ISO 8601 recibida en la petición"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser una fecha ISO 8601 válida')
+
+def _max_span():
+    return timedelta(days=current_app.config.get('AGENDA_MAX_EVENT_DAYS', 31))
+
+def _effective_end(event):
+    if event.fecha_fin and event.fecha_fin > event.fecha_inicio:
+        return event.fecha_fin
+    return event.fecha_inicio + MIN_EVENT_DURATION
+
+def events_in_range(date_from, date_to, usuario_id=None):
+    """Consulta de eventos que se solapan con [date_from, date_to)
+
+    Como ningún evento dura más que AGENDA_MAX_EVENT_DAYS, ambas fechas quedan
+    acotadas por los dos lados y SQLite puede recorrer un tramo del índice
+    (usuario_id, fecha_inicio) o de fecha_fin en lugar de todo el historial.
+    """
+    span = _max_span()
+    query = AgendaEvent.query.filter(
+        AgendaEvent.fecha_inicio >= date_from - span,
+        AgendaEvent.fecha_inicio < date_to,
+        AgendaEvent.fecha_fin >= date_from,
+        AgendaEvent.fecha_fin < date_to + span,
+        db.or_(AgendaEvent.fecha_fin > date_from, AgendaEvent.fecha_inicio >= date_from)
+    )
+    if usuario_id is not None:
+        query = query.filter(AgendaEvent.usuario_id == usuario_id)
+    return query.order_by(AgendaEvent.fecha_inicio)
+
+def find_overlaps(events):
+    """Detectar pares de eventos solapados con un barrido ordenado por inicio
+
+    Mantiene un montículo con los eventos aún abiertos ordenados por fin, de
+    modo que cada evento solo se compara con los que siguen activos: coste
+    O(n log n + k) para k solapamientos.
+    """
+    overlaps = []
+    active = []
+    for order, event in enumerate(sorted(events, key=lambda e: e.fecha_inicio)):
+        while active and active[0][0] <= event.fecha_inicio:
+            heapq.heappop(active)
+        for _, _, other in active:
+            overlaps.append((other, event))
+        heapq.heappush(active, (_effective_end(event), order, event))
+    return overlaps
+
+def find_conflicts(candidate):
+    """Eventos del mismo usuario que se solapan con el candidato"""
+    if candidate.usuario_id is None:
+        return []
+
+    window = events_in_range(
+        candidate.fecha_inicio, _effective_end(candidate), candidate.usuario_id
+    ).all()
+    window = [event for event in window if event is not candidate]
+
+    conflicts = []
+    for first, second in find_overlaps(window + [candidate]):
+        if first is candidate:
+            conflicts.append(second)
+        elif second is candidate:
+            conflicts.append(first)
+    return conflicts
+
+def _apply_dates(event, data):
+    """Validar y asignar fecha_inicio/fecha_fin"""
+    if 'fecha_inicio' in data:
+        event.fecha_inicio = _parse_datetime(data['fecha_inicio'], 'fecha_inicio')
+    if data.get('fecha_fin'):
+        event.fecha_fin = _parse_datetime(data['fecha_fin'], 'fecha_fin')
+    elif 'fecha_fin' in data or event.fecha_fin is None:
+        event.fecha_fin = event.fecha_inicio
+
+    if event.fecha_fin < event.fecha_inicio:
+        raise ValueError('fecha_fin no puede ser anterior a fecha_inicio')
+    if event.fecha_fin - event.fecha_inicio > _max_span():
+        raise ValueError(f"Un evento no puede durar más de {_max_span().days} días")
+
+@agenda_bp.route('/', methods=['GET'])
+@require_auth
+def get_events():
+    """Obtener eventos de la agenda en un rango de fechas"""
+    try:
+        now = datetime.utcnow()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+
+        date_from = _parse_datetime(request.args['from'], 'from') if request.args.get('from') else month_start
+        date_to = _parse_datetime(request.args['to'], 'to') if request.args.get('to') else next_month
+        usuario_id = request.args.get('usuario_id', type=int)
+        caso_id = request.args.get('caso_id', type=int)
+
+        if date_to <= date_from:
+            return jsonify({'error': 'to debe ser posterior a from'}), 400
+
+        query = events_in_range(date_from, date_to, usuario_id)
+        if caso_id:
+            query = query.filter(AgendaEvent.caso_id == caso_id)
+
+        events = query.all()
+
+        return jsonify({
+            'events': [event.to_dict() for event in events],
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'total': len(events)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@agenda_bp.route('/conflicts', methods=['GET'])
+@require_auth
+def get_conflicts():
+    """Listar solapamientos de un usuario dentro de un rango de fechas"""
+    try:
+        usuario_id = request.args.get('usuario_id', type=int) or session['user_id']
+        if not request.args.get('from') or not request.args.get('to'):
+            return jsonify({'error': 'from y to son requeridos'}), 400
+
+        date_from = _parse_datetime(request.args['from'], 'from')
+        date_to = _parse_datetime(request.args['to'], 'to')
+
+        events = events_in_range(date_from, date_to, usuario_id).all()
+        overlaps = find_overlaps(events)
+
+        return jsonify({
+            'conflicts': [[first.to_dict(), second.to_dict()] for first, second in overlaps],
+            'total': len(overlaps)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@agenda_bp.route('/', methods=['POST'])
+@require_auth
+def create_event():
+    """Crear nuevo evento de agenda"""
+    try:
+        data = request.get_json()
+
+        # Validaciones básicas
+        required_fields = ['titulo', 'fecha_inicio']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} es requerido'}), 400
+
+        if data.get('caso_id') and not Case.query.get(data['caso_id']):
+            return jsonify({'error': 'Caso no encontrado'}), 404
+
+        usuario_id = data.get('usuario_id', session['user_id'])
+
+        def write():
+            new_event = AgendaEvent(
+                titulo=data['titulo'],
+                descripcion=data.get('descripcion'),
+                ubicacion=data.get('ubicacion'),
+                tipo_evento=data.get('tipo_evento'),
+                usuario_id=usuario_id,
+                caso_id=data.get('caso_id')
+            )
+            _apply_dates(new_event, data)
+
+            # Verificar solapamientos salvo que se fuerce la reserva (en el escritor,
+            # así dos reservas simultáneas no pueden pasar las dos la comprobación)
+            conflicts = find_conflicts(new_event)
+            if conflicts and not data.get('forzar'):
+                raise _Conflicts([event.to_dict() for event in conflicts])
+
+            db.session.add(new_event)
+            db.session.flush()
+            return new_event.to_dict()
+
+        try:
+            event_data = run_write(write)
+        except _Conflicts as conflicts:
+            db.session.rollback()
+            return jsonify({
+                'error': 'El evento se solapa con otros eventos de la agenda',
+                'conflicts': conflicts.events
+            }), 409
+
+        return jsonify({
+            'success': True,
+            'message': 'Evento creado exitosamente',
+            'event': event_data
+        }), 201
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@agenda_bp.route('/<int:event_id>', methods=['GET'])
+@require_auth
+def get_event(event_id):
+    """Obtener evento específico"""
+    try:
+        event = AgendaEvent.query.get_or_404(event_id)
+        return jsonify({'event': event.to_dict()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@agenda_bp.route('/<int:event_id>', methods=['PUT'])
+@require_auth
+def update_event(event_id):
+    """Actualizar o reprogramar evento"""
+    try:
+        AgendaEvent.query.get_or_404(event_id)
+        data = request.get_json()
+
+        def write():
+            event = AgendaEvent.query.get(event_id)
+
+            # Actualizar campos permitidos
+            allowed_fields = ['titulo', 'descripcion', 'ubicacion', 'tipo_evento', 'usuario_id', 'caso_id']
+            for field in allowed_fields:
+                if field in data:
+                    setattr(event, field, data[field])
+            _apply_dates(event, data)
+
+            conflicts = find_conflicts(event)
+            if conflicts and not data.get('forzar'):
+                raise _Conflicts([other.to_dict() for other in conflicts])
+
+            db.session.flush()
+            return event.to_dict()
+
+        try:
+            event_data = run_write(write)
+        except _Conflicts as conflicts:
+            db.session.rollback()
+            return jsonify({
+                'error': 'El evento se solapa con otros eventos de la agenda',
+                'conflicts': conflicts.events
+            }), 409
+
+        return jsonify({
+            'success': True,
+            'message': 'Evento actualizado exitosamente',
+            'event': event_data
+        }), 200
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@agenda_bp.route('/<int:event_id>', methods=['DELETE'])
+@require_auth
+def delete_event(event_id):
+    """Eliminar evento"""
+    try:
+        AgendaEvent.query.get_or_404(event_id)
+
+        def write():
+            db.session.delete(AgendaEvent.query.get(event_id))
+
+        run_write(write)
+
+        return jsonify({
+            'success': True,
+            'message': 'Evento eliminado exitosamente'
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,52 @@
+from flask import Blueprint, request, jsonify
+from src.models.audit import AUDITED_MODELS, query_audit
+from src.routes.auth import require_admin
+from datetime import date, datetime, time, timedelta
+
+audit_bp = Blueprint('audit', __name__)
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser una fecha YYYY-MM-DD válida')
+
+@audit_bp.route('/', methods=['GET'])
+@require_admin
+def get_audit():
+    """Historial de cambios campo a campo por entidad, usuario y rango de fechas"""
+    try:
+        tipo_entidad = request.args.get('tipo_entidad')
+        if tipo_entidad and tipo_entidad not in AUDITED_MODELS.values():
+            return jsonify({'error': f"tipo_entidad debe ser uno de: {', '.join(AUDITED_MODELS.values())}"}), 400
+
+        since = until = None
+        if request.args.get('from'):
+            since = datetime.combine(_parse_date(request.args['from'], 'from'), time.min)
+        if request.args.get('to'):
+            until = datetime.combine(_parse_date(request.args['to'], 'to') + timedelta(days=1), time.min)
+
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        entries, has_more = query_audit(
+            tipo_entidad=tipo_entidad,
+            entidad_id=request.args.get('entidad_id', type=int),
+            usuario_id=request.args.get('usuario_id', type=int),
+            campo=request.args.get('campo'),
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset
+        )
+
+        return jsonify({
+            'entries': entries,
+            'has_more': has_more,
+            'next_offset': offset + len(entries) if has_more else None
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
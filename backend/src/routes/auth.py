@@ -1,5 +1,6 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g
 from src.models.user import User, db
+from src.cache import cached_value
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -72,6 +73,25 @@ def check_auth():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def get_session_principal():
+    """Id, rol y estado del usuario de la sesión, desde la caché compartida
+
+    Es todo lo que necesitan los decoradores de autorización; la entrada se
+    invalida en todos los procesos con cualquier cambio en `usuarios`.
+    """
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    
+    principal = g.get('auth_principal')
+    if principal is None or principal['id'] != user_id:
+        def load():
+            user = User.query.get(user_id)
+            return {'id': user.id, 'rol': user.rol, 'activo': bool(user.activo)} if user else None
+        principal = cached_value(['principal', user_id], load, tables=('usuarios',))
+        g.auth_principal = principal
+    return principal
+
 def require_auth(f):
     """Decorador para requerir autenticación"""
     from functools import wraps
@@ -81,8 +101,8 @@ def require_auth(f):
         if 'user_id' not in session:
             return jsonify({'error': 'Autenticación requerida'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or not user.activo:
+        principal = get_session_principal()
+        if not principal or not principal['activo']:
             return jsonify({'error': 'Usuario no válido'}), 401
         
         return f(*args, **kwargs)
@@ -98,8 +118,8 @@ def require_admin(f):
         if 'user_id' not in session:
             return jsonify({'error': 'Autenticación requerida'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or not user.activo or user.rol != 'admin':
+        principal = get_session_principal()
+        if not principal or not principal['activo'] or principal['rol'] != 'admin':
             return jsonify({'error': 'Permisos de administrador requeridos'}), 403
         
         return f(*args, **kwargs)
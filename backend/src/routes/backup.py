@@ -0,0 +1,61 @@
+from flask import Blueprint, request, jsonify, session
+from src.models.backup import BackupRun, start_backup, run_backup_in_background
+from src.models.user import db
+from src.models.writer import run_write
+from src.routes.auth import require_admin
+
+backup_bp = Blueprint('backup', __name__)
+
+@backup_bp.route('/', methods=['GET'])
+@require_admin
+def get_backups():
+    """Listar las copias de seguridad con sus tiempos y tamaños"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        runs = BackupRun.query.order_by(BackupRun.fecha_inicio.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return jsonify({
+            'backups': [run.to_dict() for run in runs.items],
+            'total': runs.total,
+            'pages': runs.pages,
+            'current_page': page
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/', methods=['POST'])
+@require_admin
+def create_backup():
+    """Lanzar una copia de seguridad en caliente de la base de datos"""
+    try:
+        usuario_id = session['user_id']
+        backup_data = run_write(lambda: start_backup(usuario_id=usuario_id).to_dict())
+        run_backup_in_background(backup_data['id'])
+
+        return jsonify({
+            'success': True,
+            'message': 'Copia de seguridad iniciada',
+            'backup': backup_data
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/<int:backup_id>', methods=['GET'])
+@require_admin
+def get_backup(backup_id):
+    """Consultar el estado y las métricas de una copia de seguridad"""
+    try:
+        run = BackupRun.query.get_or_404(backup_id)
+        return jsonify({'backup': run.to_dict()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
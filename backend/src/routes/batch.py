@@ -0,0 +1,122 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from werkzeug.routing import RequestRedirect
+from werkzeug.exceptions import HTTPException
+from src.models.user import db
+from src.routes.auth import require_auth
+
+batch_bp = Blueprint('batch', __name__)
+
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+
+def _resolve_path(path, method):
+    """Normalizar la ruta de una sub-petición siguiendo redirecciones de barra final
+    
+    Devuelve la ruta normalizada y el endpoint que la atiende; lanza NotFound o
+    MethodNotAllowed si no existe.
+    """
+    adapter = current_app.url_map.bind('localhost')
+    route, _, query = path.partition('?')
+    try:
+        endpoint, _ = adapter.match(route, method=method)
+    except RequestRedirect as redirect:
+        route = redirect.new_url.split('localhost', 1)[-1].partition('?')[0]
+        endpoint, _ = adapter.match(route, method=method)
+    return (f'{route}?{query}' if query else route), endpoint
+
+def _dispatch(sub_request):
+    """Ejecutar una sub-petición en el mismo proceso y devolver (status, body)"""
+    method = (sub_request.get('method') or 'GET').upper()
+    path = sub_request.get('path') or ''
+
+    if method not in ALLOWED_METHODS:
+        return 405, {'error': f'Método no permitido: {method}'}
+    if not path.startswith('/api/'):
+        path = '/api' + (path if path.startswith('/') else '/' + path)
+    if path.startswith(('/api/batch', '/api/auth')):
+        return 400, {'error': f'Ruta no permitida en un lote: {path}'}
+
+    try:
+        path, endpoint = _resolve_path(path, method)
+    except HTTPException as e:
+        return e.code, {'error': e.description}
+
+    # La ruta comodín de archivos estáticos no forma parte de la API
+    if endpoint == 'serve':
+        return 404, {'error': f'Ruta no encontrada: {path}'}
+
+    headers = {'Cookie': request.headers.get('Cookie', '')}
+    kwargs = {'method': method, 'headers': headers}
+    if sub_request.get('body') is not None:
+        kwargs['json'] = sub_request['body']
+
+    with current_app.test_request_context(path, **kwargs):
+        response = current_app.full_dispatch_request()
+
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return response.status_code, body
+
+@batch_bp.route('/', methods=['POST'])
+@require_auth
+def run_batch():
+    """Ejecutar varias sub-peticiones de la API en una sola llamada"""
+    try:
+        data = request.get_json() or {}
+        sub_requests = data.get('requests')
+        atomic = bool(data.get('atomic', False))
+
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({'error': 'requests debe ser una lista no vacía'}), 400
+
+        max_requests = current_app.config.get('BATCH_MAX_REQUESTS', 25)
+        if len(sub_requests) > max_requests:
+            return jsonify({'error': f'Máximo {max_requests} sub-peticiones por lote'}), 400
+
+        for index, sub_request in enumerate(sub_requests):
+            if (
+                not isinstance(sub_request, dict)
+                or not isinstance(sub_request.get('method') or '', str)
+                or not isinstance(sub_request.get('path') or '', str)
+            ):
+                return jsonify({'error': f'La sub-petición {index} debe ser un objeto con method y path de texto'}), 400
+
+        session = db.session()
+        if atomic:
+            # Las vistas llaman a commit(); dentro de un lote atómico solo se
+            # hace flush y la transacción se confirma al final
+            session.commit = session.flush
+            g.batch_atomic = True
+
+        results = []
+        failed = False
+        try:
+            for sub_request in sub_requests:
+                if failed:
+                    results.append({'status': 424, 'body': {'error': 'No ejecutada: el lote fue revertido'}})
+                    continue
+
+                status, body = _dispatch(sub_request)
+                results.append({'status': status, 'body': body})
+                if atomic and status >= 400:
+                    failed = True
+        finally:
+            if atomic:
+                del session.commit
+                g.pop('batch_atomic', None)
+
+        if atomic:
+            if failed:
+                db.session.rollback()
+            else:
+                db.session.commit()
+
+        return jsonify({
+            'results': results,
+            'atomic': atomic,
+            'committed': not failed if atomic else None
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
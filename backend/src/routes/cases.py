@@ -1,5 +1,11 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response
 from src.models.case import Case, Client, Equipment, db
+from src.models.custody import append_custody_event
+from src.models.archive import archived_entity
+from src.models.writer import run_write
+from src.models.bulk import case_selection, bulk_update_cases
+from src.models.user import User
+from src.dossier import dossier_version, render_dossier
 from src.routes.auth import require_auth
 from datetime import datetime
 
@@ -13,8 +19,10 @@ def get_cases():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         estado = request.args.get('estado')
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
         
-        query = Case.query
+        # Los casos archivados solo se leen si se piden expresamente
+        query = db.session.query(archived_entity(Case)) if include_archived else Case.query
         
         # Filtrar por estado si se proporciona
         if estado:
@@ -61,23 +69,26 @@ def create_case():
             return jsonify({'error': 'Cliente no encontrado'}), 404
         
         # Crear nuevo caso
-        new_case = Case(
-            numero_caso=data['numero_caso'],
-            titulo=data['titulo'],
-            descripcion=data.get('descripcion', ''),
-            cliente_id=data['cliente_id'],
-            abogado_asignado_id=data.get('abogado_asignado_id'),
-            estado=data.get('estado', 'pendiente'),
-            prioridad=data.get('prioridad', 'media')
-        )
-        
-        db.session.add(new_case)
-        db.session.commit()
+        def write():
+            new_case = Case(
+                numero_caso=data['numero_caso'],
+                titulo=data['titulo'],
+                descripcion=data.get('descripcion', ''),
+                cliente_id=data['cliente_id'],
+                abogado_asignado_id=data.get('abogado_asignado_id'),
+                estado=data.get('estado', 'pendiente'),
+                prioridad=data.get('prioridad', 'media')
+            )
+            db.session.add(new_case)
+            db.session.flush()
+            return new_case.to_dict()
+        
+        case_data = run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Caso creado exitosamente',
-            'case': new_case.to_dict()
+            'case': case_data
         }), 201
         
     except Exception as e:
@@ -89,11 +100,27 @@ def create_case():
 def get_case(case_id):
     """Obtener caso específico"""
     try:
-        case = Case.query.get_or_404(case_id)
+        equipos_limit = max(1, min(request.args.get('equipos_limit', 20, type=int), 100))
+        equipos_offset = request.args.get('equipos_offset', 0, type=int)
+        if equipos_offset < 0:
+            return jsonify({'error': 'equipos_offset no puede ser negativo'}), 400
+        
+        if request.args.get('include_archived', 'false').lower() == 'true':
+            cases, equipment = archived_entity(Case), archived_entity(Equipment)
+        else:
+            cases, equipment = Case, Equipment
+        
+        case = db.session.query(cases).filter_by(id=case_id).first_or_404()
+        
+        # Incluir una página de los equipos relacionados; el total sale del contador
+        equipos = db.session.query(equipment).filter_by(caso_id=case_id).order_by(
+            equipment.fecha_recepcion.desc(), equipment.id.desc()
+        ).limit(equipos_limit).offset(equipos_offset).all()
         
-        # Incluir equipos relacionados
         case_data = case.to_dict()
-        case_data['equipos'] = [equipo.to_dict() for equipo in case.equipos]
+        case_data['equipos'] = [equipo.to_dict() for equipo in equipos]
+        case_data['equipos_limit'] = equipos_limit
+        case_data['equipos_offset'] = equipos_offset
         
         return jsonify({'case': case_data}), 200
         
@@ -105,40 +132,105 @@ def get_case(case_id):
 def update_case(case_id):
     """Actualizar caso"""
     try:
-        case = Case.query.get_or_404(case_id)
+        Case.query.get_or_404(case_id)
         data = request.get_json()
         
-        # Actualizar campos permitidos
-        allowed_fields = ['titulo', 'descripcion', 'abogado_asignado_id', 'estado', 'prioridad']
-        for field in allowed_fields:
-            if field in data:
-                setattr(case, field, data[field])
-        
-        # Si se cierra el caso, establecer fecha de cierre
-        if data.get('estado') == 'cerrado' and not case.fecha_cierre:
-            case.fecha_cierre = datetime.utcnow()
-        
-        db.session.commit()
+        def write():
+            case = Case.query.get(case_id)
+            
+            # Actualizar campos permitidos
+            allowed_fields = ['titulo', 'descripcion', 'abogado_asignado_id', 'estado', 'prioridad']
+            for field in allowed_fields:
+                if field in data:
+                    setattr(case, field, data[field])
+            
+            # Si se cierra el caso, establecer fecha de cierre
+            if data.get('estado') == 'cerrado' and not case.fecha_cierre:
+                case.fecha_cierre = datetime.utcnow()
+            
+            db.session.flush()
+            return case.to_dict()
+        
+        case_data = run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Caso actualizado exitosamente',
-            'case': case.to_dict()
+            'case': case_data
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@cases_bp.route('/bulk', methods=['PUT'])
+@require_auth
+def bulk_update_case_state():
+    """Cambiar estado y/o prioridad de varios casos (por ids o por filtro) con un solo UPDATE"""
+    try:
+        data = request.get_json() or {}
+        values = {field: data[field] for field in ('estado', 'prioridad') if field in data}
+        if not values:
+            return jsonify({'error': 'estado o prioridad es requerido'}), 400
+        for field, value in values.items():
+            if not isinstance(value, str) or not value:
+                return jsonify({'error': f'{field} debe ser un texto no vacío'}), 400
+        conditions = case_selection(data)
+        
+        def write():
+            matched, updated = bulk_update_cases(conditions, values)
+            return {'matched': matched, 'updated': updated}
+        
+        counts = run_write(write)
+        
+        return jsonify({'success': True, **counts}), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@cases_bp.route('/bulk/reassign', methods=['PUT'])
+@require_auth
+def bulk_reassign_cases():
+    """Reasignar varios casos (por ids o por filtro) a otro abogado con un solo UPDATE"""
+    try:
+        data = request.get_json() or {}
+        if 'abogado_asignado_id' not in data:
+            return jsonify({'error': 'abogado_asignado_id es requerido'}), 400
+        abogado_id = data['abogado_asignado_id']
+        if abogado_id is not None and not User.query.get(abogado_id):
+            return jsonify({'error': 'Abogado no encontrado'}), 404
+        conditions = case_selection(data)
+        
+        def write():
+            matched, updated = bulk_update_cases(conditions, {'abogado_asignado_id': abogado_id})
+            return {'matched': matched, 'updated': updated}
+        
+        counts = run_write(write)
+        
+        return jsonify({'success': True, **counts}), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @cases_bp.route('/<int:case_id>', methods=['DELETE'])
 @require_auth
 def delete_case(case_id):
     """Eliminar caso"""
     try:
-        case = Case.query.get_or_404(case_id)
+        Case.query.get_or_404(case_id)
+        
+        def write():
+            db.session.delete(Case.query.get(case_id))
         
-        db.session.delete(case)
-        db.session.commit()
+        run_write(write)
         
         return jsonify({
             'success': True,
@@ -149,13 +241,33 @@ def delete_case(case_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@cases_bp.route('/<int:case_id>/dossier', methods=['GET'])
+@require_auth
+def get_case_dossier(case_id):
+    """Dossier imprimible del caso en HTML"""
+    try:
+        case = Case.query.get_or_404(case_id)
+        keys, etag = dossier_version(case)
+        
+        # Sin cambios desde la copia del cliente: no hace falta renderizar
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(render_dossier(case, keys), mimetype='text/html')
+        response.set_etag(etag, weak=True)
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @cases_bp.route('/<int:case_id>/equipment', methods=['POST'])
 @require_auth
 def add_equipment(case_id):
     """Agregar equipo a un caso"""
     try:
-        case = Case.query.get_or_404(case_id)
+        Case.query.get_or_404(case_id)
         data = request.get_json()
+        usuario_id = session['user_id']
         
         # Validaciones básicas
         required_fields = ['tipo_equipo']
@@ -163,28 +275,41 @@ def add_equipment(case_id):
             if not data.get(field):
                 return jsonify({'error': f'{field} es requerido'}), 400
         
-        # Crear nuevo equipo
-        new_equipment = Equipment(
-            caso_id=case_id,
-            tipo_equipo=data['tipo_equipo'],
-            marca=data.get('marca'),
-            modelo=data.get('modelo'),
-            numero_serie=data.get('numero_serie'),
-            imei=data.get('imei'),
-            condicion_fisica=data.get('condicion_fisica'),
-            descripcion_danos=data.get('descripcion_danos'),
-            accesorios=data.get('accesorios'),
-            recibido_de=data.get('recibido_de'),
-            notas_custodia=data.get('notas_custodia')
-        )
-        
-        db.session.add(new_equipment)
-        db.session.commit()
+        def write():
+            # Crear nuevo equipo
+            new_equipment = Equipment(
+                caso_id=case_id,
+                tipo_equipo=data['tipo_equipo'],
+                marca=data.get('marca'),
+                modelo=data.get('modelo'),
+                numero_serie=data.get('numero_serie'),
+                imei=data.get('imei'),
+                condicion_fisica=data.get('condicion_fisica'),
+                descripcion_danos=data.get('descripcion_danos'),
+                accesorios=data.get('accesorios'),
+                recibido_de=data.get('recibido_de'),
+                notas_custodia=data.get('notas_custodia')
+            )
+            db.session.add(new_equipment)
+            db.session.flush()
+            
+            # Primera entrada de la cadena de custodia: la recepción del equipo
+            append_custody_event(
+                new_equipment.id,
+                'recepcion',
+                descripcion=new_equipment.notas_custodia,
+                recibido_de=new_equipment.recibido_de,
+                usuario_id=usuario_id,
+                fecha=new_equipment.fecha_recepcion
+            )
+            return new_equipment.to_dict()
+        
+        equipment_data = run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Equipo agregado exitosamente',
-            'equipment': new_equipment.to_dict()
+            'equipment': equipment_data
         }), 201
         
     except Exception as e:
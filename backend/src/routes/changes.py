@@ -0,0 +1,69 @@
+import os
+from flask import Blueprint, Response, request, jsonify, current_app
+from src.models.changes import ChangesExpired, read_changes, create_snapshot
+from src.routes.auth import require_admin
+
+changes_bp = Blueprint('changes', __name__)
+
+class _TemporaryFile:
+    """Cuerpo de respuesta que lee un archivo en bloques y lo borra al cerrarse
+
+    El servidor WSGI llama a close() al acabar la respuesta, también si el
+    cliente corta la descarga (call_on_close no se llama con direct_passthrough).
+    """
+
+    def __init__(self, path, chunk_size=1024 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, 'rb')
+
+    def __iter__(self):
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self.file.close()
+        os.remove(self.path)
+
+@changes_bp.route('/', methods=['GET'], strict_slashes=False)
+@require_admin
+def get_changes():
+    """Cambios de filas posteriores a `since` en orden de confirmación (para las réplicas)"""
+    try:
+        if current_app.config['REPLICA_MODE']:
+            return jsonify({'error': 'Una réplica no publica cambios'}), 404
+
+        try:
+            since = int(request.args.get('since', 0))
+            limit = int(request.args.get('limit', current_app.config['CHANGES_FEED_LIMIT']))
+        except ValueError:
+            return jsonify({'error': 'since y limit deben ser enteros'}), 400
+        if since < 0 or limit < 1:
+            return jsonify({'error': 'since debe ser mayor o igual que 0 y limit mayor que 0'}), 400
+
+        return jsonify(read_changes(since, min(limit, current_app.config['CHANGES_FEED_MAX']))), 200
+
+    except ChangesExpired as e:
+        return jsonify({'error': str(e), 'resincronizar': True}), 410
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@changes_bp.route('/snapshot', methods=['GET'])
+@require_admin
+def get_snapshot():
+    """Instantánea coherente de la base de datos para (re)sincronizar una réplica"""
+    try:
+        if current_app.config['REPLICA_MODE']:
+            return jsonify({'error': 'Una réplica no publica cambios'}), 404
+
+        path = create_snapshot()
+        response = Response(_TemporaryFile(path), mimetype='application/vnd.sqlite3', direct_passthrough=True)
+        response.headers['Content-Length'] = str(os.path.getsize(path))
+        response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(path)}"'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from src.models.case import Client, db
+from src.models.case import Client, Case, db
+from src.models.writer import run_write
+from src.models.duplicates import find_candidates, duplicate_pairs, merge_clients
 from src.routes.auth import require_auth
 
 clients_bp = Blueprint('clients', __name__)
@@ -57,21 +59,32 @@ def create_client():
         if existing_client:
             return jsonify({'error': 'El email ya está registrado'}), 400
         
+        # Buscar posibles duplicados solo en los bloques del candidato
+        candidates = find_candidates(data['nombre_completo'], data['email'], data.get('telefono'))
+        if candidates and not data.get('forzar'):
+            return jsonify({
+                'error': 'Existen clientes que podrían ser la misma persona',
+                'duplicates': [dict(client.to_dict(), puntuacion=score) for client, score in candidates]
+            }), 409
+        
         # Crear nuevo cliente
-        new_client = Client(
-            nombre_completo=data['nombre_completo'],
-            email=data['email'],
-            telefono=data.get('telefono'),
-            direccion=data.get('direccion')
-        )
+        def write():
+            new_client = Client(
+                nombre_completo=data['nombre_completo'],
+                email=data['email'],
+                telefono=data.get('telefono'),
+                direccion=data.get('direccion')
+            )
+            db.session.add(new_client)
+            db.session.flush()
+            return new_client.to_dict()
         
-        db.session.add(new_client)
-        db.session.commit()
+        client_data = run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Cliente creado exitosamente',
-            'client': new_client.to_dict()
+            'client': client_data
         }), 201
         
     except Exception as e:
@@ -84,10 +97,20 @@ def get_client(client_id):
     """Obtener cliente específico"""
     try:
         client = Client.query.get_or_404(client_id)
+        casos_limit = max(1, min(request.args.get('casos_limit', 20, type=int), 100))
+        casos_offset = request.args.get('casos_offset', 0, type=int)
+        if casos_offset < 0:
+            return jsonify({'error': 'casos_offset no puede ser negativo'}), 400
+        
+        # Incluir una página de los casos relacionados; el total sale del contador
+        casos = Case.query.filter_by(cliente_id=client_id).order_by(
+            Case.fecha_apertura.desc(), Case.id.desc()
+        ).limit(casos_limit).offset(casos_offset).all()
         
-        # Incluir casos relacionados
         client_data = client.to_dict()
-        client_data['casos'] = [caso.to_dict() for caso in client.casos]
+        client_data['casos'] = [caso.to_dict() for caso in casos]
+        client_data['casos_limit'] = casos_limit
+        client_data['casos_offset'] = casos_offset
         
         return jsonify({'client': client_data}), 200
         
@@ -108,18 +131,24 @@ def update_client(client_id):
             if existing_client:
                 return jsonify({'error': 'El email ya está registrado'}), 400
         
-        # Actualizar campos permitidos
-        allowed_fields = ['nombre_completo', 'email', 'telefono', 'direccion']
-        for field in allowed_fields:
-            if field in data:
-                setattr(client, field, data[field])
+        def write():
+            client = Client.query.get(client_id)
+            
+            # Actualizar campos permitidos
+            allowed_fields = ['nombre_completo', 'email', 'telefono', 'direccion']
+            for field in allowed_fields:
+                if field in data:
+                    setattr(client, field, data[field])
+            
+            db.session.flush()
+            return client.to_dict()
         
-        db.session.commit()
+        client_data = run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Cliente actualizado exitosamente',
-            'client': client.to_dict()
+            'client': client_data
         }), 200
         
     except Exception as e:
@@ -131,23 +160,84 @@ def update_client(client_id):
 def delete_client(client_id):
     """Eliminar cliente"""
     try:
-        client = Client.query.get_or_404(client_id)
+        Client.query.get_or_404(client_id)
         
-        # Verificar que no tenga casos activos
-        active_cases = len([caso for caso in client.casos if caso.estado != 'cerrado'])
-        if active_cases > 0:
-            return jsonify({
-                'error': f'No se puede eliminar el cliente. Tiene {active_cases} casos activos.'
-            }), 400
+        def write():
+            client = Client.query.get(client_id)
+            
+            # Verificar que no tenga casos activos (en el escritor: el contador ya está al día)
+            active_cases = client.casos_activos
+            if active_cases > 0:
+                raise ValueError(f'No se puede eliminar el cliente. Tiene {active_cases} casos activos.')
+            
+            db.session.delete(client)
         
-        db.session.delete(client)
-        db.session.commit()
+        run_write(write)
         
         return jsonify({
             'success': True,
             'message': 'Cliente eliminado exitosamente'
         }), 200
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/duplicates', methods=['GET'])
+@require_auth
+def get_duplicates():
+    """Informe de posibles clientes duplicados"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = max(1, min(request.args.get('per_page', 100, type=int), 500))
+        pairs, total = duplicate_pairs(page, per_page)
+        
+        return jsonify({
+            'duplicates': [
+                {'cliente': a.to_dict(), 'duplicado': b.to_dict(), 'puntuacion': score}
+                for a, b, score in pairs
+            ],
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'current_page': page
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/<int:client_id>/merge', methods=['POST'])
+@require_auth
+def merge_client(client_id):
+    """Fusionar otro cliente en este: sus casos pasan a este cliente"""
+    try:
+        data = request.get_json() or {}
+        duplicate_id = data.get('duplicado_id')
+        if not duplicate_id:
+            return jsonify({'error': 'duplicado_id es requerido'}), 400
+        if duplicate_id == client_id:
+            return jsonify({'error': 'No se puede fusionar un cliente consigo mismo'}), 400
+        
+        Client.query.get_or_404(client_id)
+        if not Client.query.get(duplicate_id):
+            return jsonify({'error': 'Cliente duplicado no encontrado'}), 404
+        
+        def write():
+            client = Client.query.get(client_id)
+            merge_clients(client, Client.query.get(duplicate_id))
+            db.session.flush()
+            return client.to_dict()
+        
+        client_data = run_write(write)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Clientes fusionados exitosamente',
+            'client': client_data
+        }), 200
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
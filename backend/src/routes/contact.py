@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
 from src.models.case import Contact, db
+from src.models.writer import run_write
+from src.models.bulk import contact_selection, bulk_mark_contacts_read
+from src.routes.auth import require_auth
+from src.cache import cached
 
 contact_bp = Blueprint('contact', __name__)
 
@@ -22,15 +26,15 @@ def submit_contact():
             return jsonify({'error': 'Formato de email inválido'}), 400
         
         # Crear nuevo mensaje de contacto
-        new_contact = Contact(
-            nombre=data['nombre'],
-            email=data['email'],
-            asunto=data.get('asunto', ''),
-            mensaje=data['mensaje']
-        )
+        def write():
+            db.session.add(Contact(
+                nombre=data['nombre'],
+                email=data['email'],
+                asunto=data.get('asunto', ''),
+                mensaje=data['mensaje']
+            ))
         
-        db.session.add(new_contact)
-        db.session.commit()
+        run_write(write)
         
         return jsonify({
             'success': True,
@@ -77,10 +81,12 @@ def get_contacts():
 def mark_as_read(contact_id):
     """Marcar mensaje como leído"""
     try:
-        contact = Contact.query.get_or_404(contact_id)
-        contact.leido = True
+        Contact.query.get_or_404(contact_id)
+        
+        def write():
+            Contact.query.get(contact_id).leido = True
         
-        db.session.commit()
+        run_write(write)
         
         return jsonify({
             'success': True,
@@ -91,7 +97,30 @@ def mark_as_read(contact_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@contact_bp.route('/read', methods=['PUT'])
+@require_auth
+def mark_all_as_read():
+    """Marcar como leídos con un solo UPDATE todos los mensajes, los de `ids` o los enviados `hasta` una fecha"""
+    try:
+        data = request.get_json(silent=True) or {}
+        conditions = contact_selection(data)
+        
+        updated = run_write(lambda: bulk_mark_contacts_read(conditions))
+        
+        return jsonify({
+            'success': True,
+            'updated': updated
+        }), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @contact_bp.route('/stats', methods=['GET'])
+@cached(tables=('contactos',))
 def get_contact_stats():
     """Obtener estadísticas de mensajes de contacto"""
     try:
@@ -0,0 +1,149 @@
+from flask import Blueprint, request, jsonify, session
+from sqlalchemy.exc import IntegrityError
+from src.models.case import Equipment, db
+from src.models.custody import (
+    CustodyEvent, CustodyCheckpoint, append_custody_event, create_checkpoint, verify_custody
+)
+from src.models.writer import run_write
+from src.routes.auth import require_auth, require_admin
+from datetime import datetime
+
+custody_bp = Blueprint('custody', __name__)
+
+@custody_bp.route('/equipment/<int:equipment_id>/events', methods=['GET'])
+@require_auth
+def get_custody_events(equipment_id):
+    """Obtener la cadena de custodia de un equipo"""
+    try:
+        Equipment.query.get_or_404(equipment_id)
+
+        events = CustodyEvent.query.filter_by(equipo_id=equipment_id).order_by(
+            CustodyEvent.secuencia
+        ).all()
+
+        return jsonify({
+            'events': [event.to_dict() for event in events],
+            'total': len(events)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@custody_bp.route('/equipment/<int:equipment_id>/events', methods=['POST'])
+@require_auth
+def add_custody_event(equipment_id):
+    """Registrar un nuevo movimiento en la cadena de custodia"""
+    try:
+        Equipment.query.get_or_404(equipment_id)
+        data = request.get_json()
+
+        if not data.get('tipo_evento'):
+            return jsonify({'error': 'tipo_evento es requerido'}), 400
+
+        fecha = datetime.fromisoformat(data['fecha']) if data.get('fecha') else None
+        usuario_id = session['user_id']
+
+        def write():
+            return append_custody_event(
+                equipment_id,
+                data['tipo_evento'],
+                descripcion=data.get('descripcion'),
+                responsable=data.get('responsable'),
+                recibido_de=data.get('recibido_de'),
+                usuario_id=usuario_id,
+                fecha=fecha
+            ).to_dict()
+
+        event_data = run_write(write)
+
+        return jsonify({
+            'success': True,
+            'message': 'Movimiento de custodia registrado',
+            'event': event_data
+        }), 201
+
+    except IntegrityError:
+        # Otra entrada del mismo equipo tomó la misma secuencia a la vez
+        db.session.rollback()
+        return jsonify({'error': 'La cadena de custodia del equipo cambió mientras se registraba el movimiento; reintente'}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@custody_bp.route('/equipment/<int:equipment_id>/verify', methods=['GET'])
+@require_auth
+def verify_equipment_custody(equipment_id):
+    """Verificar la cadena de custodia de un equipo"""
+    try:
+        Equipment.query.get_or_404(equipment_id)
+        full = request.args.get('full', 'false').lower() == 'true'
+
+        return jsonify(verify_custody(equipment_id, full=full)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@custody_bp.route('/verify', methods=['GET'])
+@require_admin
+def verify_store_custody():
+    """Verificar la cadena de custodia de todo el almacén de evidencias"""
+    try:
+        full = request.args.get('full', 'false').lower() == 'true'
+
+        return jsonify(verify_custody(full=full)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@custody_bp.route('/checkpoints', methods=['GET'])
+@require_auth
+def get_checkpoints():
+    """Listar checkpoints de custodia"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        checkpoints = CustodyCheckpoint.query.order_by(
+            CustodyCheckpoint.hasta_evento_id.desc()
+        ).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return jsonify({
+            'checkpoints': [checkpoint.to_dict() for checkpoint in checkpoints.items],
+            'total': checkpoints.total,
+            'pages': checkpoints.pages,
+            'current_page': page
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@custody_bp.route('/checkpoints', methods=['POST'])
+@require_admin
+def seal_checkpoint():
+    """Sellar ahora las entradas pendientes en un checkpoint"""
+    try:
+        def write():
+            checkpoint = create_checkpoint()
+            return checkpoint.to_dict() if checkpoint else None
+
+        checkpoint_data = run_write(write)
+
+        if checkpoint_data is None:
+            return jsonify({'success': True, 'message': 'No hay entradas pendientes de sellar'}), 200
+
+        return jsonify({
+            'success': True,
+            'message': 'Checkpoint creado',
+            'checkpoint': checkpoint_data
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,11 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from src.models.user import User, db
-from src.models.case import Case, Client, Equipment, Transaction, Contact
+from src.models.case import Case, Client, Equipment, Contact
+from src.models.finance import DailyTotal, range_summary
+from src.models.activity import ActivityEvent
+from src.models.analytics import open_age_buckets, open_load_by_lawyer, close_time_percentiles
 from src.routes.auth import require_auth
+from src.cache import cached
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
@@ -9,6 +13,7 @@ dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/stats', methods=['GET'])
 @require_auth
+@cached(tables=('casos', 'clientes', 'equipos', 'transacciones'))
 def get_dashboard_stats():
     """Obtener estadísticas principales del dashboard"""
     try:
@@ -31,12 +36,10 @@ def get_dashboard_stats():
         recent_cases = Case.query.filter(Case.fecha_apertura >= seven_days_ago).count()
         recent_clients = Client.query.filter(Client.fecha_registro >= seven_days_ago).count()
         
-        # Ingresos del mes actual
-        current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_income = db.session.query(func.sum(Transaction.monto)).filter(
-            Transaction.tipo == 'ingreso',
-            Transaction.fecha >= current_month_start
-        ).scalar() or 0
+        # Ingresos del mes actual (a partir de los acumulados diarios)
+        today = datetime.utcnow().date()
+        monthly_summary = range_summary(today.replace(day=1), today)
+        monthly_income = monthly_summary['ingresos_centavos'] / 100
         
         return jsonify({
             'basic_stats': {
@@ -67,53 +70,28 @@ def get_dashboard_stats():
 @dashboard_bp.route('/recent-activity', methods=['GET'])
 @require_auth
 def get_recent_activity():
-    """Obtener actividad reciente del sistema"""
+    """Obtener actividad reciente del sistema; con ?since=<cursor> solo la posterior"""
     try:
-        # Casos recientes (últimos 10)
-        recent_cases = Case.query.order_by(Case.fecha_apertura.desc()).limit(10).all()
-        
-        # Clientes recientes (últimos 5)
-        recent_clients = Client.query.order_by(Client.fecha_registro.desc()).limit(5).all()
-        
-        # Mensajes de contacto no leídos
-        unread_contacts = Contact.query.filter_by(leido=False).order_by(Contact.fecha_envio.desc()).limit(5).all()
-        
-        activity_items = []
-        
-        # Agregar casos recientes
-        for case in recent_cases:
-            activity_items.append({
-                'type': 'case',
-                'description': f'Nuevo caso: {case.titulo}',
-                'time': case.fecha_apertura.isoformat(),
-                'id': case.id,
-                'priority': case.prioridad
-            })
-        
-        # Agregar clientes recientes
-        for client in recent_clients:
-            activity_items.append({
-                'type': 'client',
-                'description': f'Nuevo cliente registrado: {client.nombre_completo}',
-                'time': client.fecha_registro.isoformat(),
-                'id': client.id
-            })
-        
-        # Agregar mensajes de contacto
-        for contact in unread_contacts:
-            activity_items.append({
-                'type': 'contact',
-                'description': f'Nuevo mensaje de: {contact.nombre}',
-                'time': contact.fecha_envio.isoformat(),
-                'id': contact.id,
-                'subject': contact.asunto
-            })
-        
-        # Ordenar por fecha (más reciente primero)
-        activity_items.sort(key=lambda x: x['time'], reverse=True)
+        since = request.args.get('since', type=int)
+        limit = min(request.args.get('limit', 15, type=int), 100)
+        
+        query = ActivityEvent.query
+        if since is None:
+            # Primera carga: las últimas entradas
+            events = query.order_by(ActivityEvent.id.desc()).limit(limit).all()
+        else:
+            # Incremental: las entradas siguientes al cursor, en orden de llegada
+            events = query.filter(ActivityEvent.id > since).order_by(ActivityEvent.id).limit(limit).all()
+            events.reverse()
+        
+        cursor = events[0].id if events else since
+        if cursor is None:
+            cursor = db.session.query(func.max(ActivityEvent.id)).scalar() or 0
         
         return jsonify({
-            'activity': activity_items[:15]  # Últimos 15 elementos
+            'activity': [event.to_dict() for event in events],  # más reciente primero
+            'cursor': cursor,
+            'has_more': since is not None and len(events) == limit
         }), 200
         
     except Exception as e:
@@ -124,15 +102,16 @@ def get_recent_activity():
 def get_pending_cases():
     """Obtener casos pendientes de revisión"""
     try:
-        pending_cases = Case.query.filter(
+        days_open = func.cast(func.julianday('now') - func.julianday(Case.fecha_apertura), db.Integer)
+        pending_cases = db.session.query(Case, days_open.label('days_open')).filter(
             Case.estado.in_(['pendiente', 'en_proceso'])
         ).order_by(Case.fecha_apertura.desc()).limit(10).all()
         
         cases_data = []
-        for case in pending_cases:
+        for case, days in pending_cases:
             case_data = case.to_dict()
             # Agregar información adicional
-            case_data['days_open'] = (datetime.utcnow() - case.fecha_apertura).days
+            case_data['days_open'] = days
             cases_data.append(case_data)
         
         return jsonify({
@@ -142,8 +121,38 @@ def get_pending_cases():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard_bp.route('/analytics', methods=['GET'])
+@require_auth
+@cached(tables=('casos', 'usuarios'))
+def get_case_analytics():
+    """Antigüedad de los casos abiertos, carga por abogado y tiempos de cierre
+
+    ?desde=YYYY-MM&hasta=YYYY-MM limitan los tiempos de cierre a los casos
+    cerrados en esos meses.
+    """
+    try:
+        months = {}
+        for param in ('desde', 'hasta'):
+            value = request.args.get(param)
+            if value:
+                try:
+                    months[param] = datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+                except ValueError:
+                    return jsonify({'error': f'{param} debe tener el formato YYYY-MM'}), 400
+        
+        return jsonify({
+            'open_age_buckets': open_age_buckets(),
+            'open_load_by_lawyer': open_load_by_lawyer(),
+            'close_time_by_lawyer': close_time_percentiles('abogado', **months),
+            'close_time_by_priority': close_time_percentiles('prioridad', **months)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @dashboard_bp.route('/charts/cases-by-month', methods=['GET'])
 @require_auth
+@cached(tables=('casos',))
 def get_cases_by_month():
     """Obtener datos para gráfico de casos por mes"""
     try:
@@ -181,6 +190,7 @@ def get_cases_by_month():
 
 @dashboard_bp.route('/charts/cases-by-status', methods=['GET'])
 @require_auth
+@cached(tables=('casos',))
 def get_cases_by_status():
     """Obtener datos para gráfico de casos por estado"""
     try:
@@ -225,21 +235,21 @@ def get_cases_by_status():
 
 @dashboard_bp.route('/charts/revenue-by-month', methods=['GET'])
 @require_auth
+@cached(tables=('transacciones',))
 def get_revenue_by_month():
     """Obtener datos para gráfico de ingresos por mes"""
     try:
         # Últimos 12 meses
         twelve_months_ago = datetime.utcnow() - timedelta(days=365)
         
-        # Consulta para obtener ingresos por mes
+        # Consulta sobre los totales diarios (como máximo 365 filas)
         revenue_by_month = db.session.query(
-            func.strftime('%Y-%m', Transaction.fecha).label('month'),
-            func.sum(Transaction.monto).label('total')
+            func.strftime('%Y-%m', DailyTotal.dia).label('month'),
+            func.sum(DailyTotal.ingresos_dia).label('total')
         ).filter(
-            Transaction.tipo == 'ingreso',
-            Transaction.fecha >= twelve_months_ago
+            DailyTotal.dia >= twelve_months_ago.date()
         ).group_by(
-            func.strftime('%Y-%m', Transaction.fecha)
+            func.strftime('%Y-%m', DailyTotal.dia)
         ).order_by('month').all()
         
         # Formatear datos para el gráfico
@@ -250,7 +260,7 @@ def get_revenue_by_month():
             month_obj = datetime.strptime(revenue_data.month, '%Y-%m')
             month_name = month_obj.strftime('%b %Y')
             months.append(month_name)
-            amounts.append(float(revenue_data.total or 0))
+            amounts.append((revenue_data.total or 0) / 100)
         
         return jsonify({
             'labels': months,
@@ -0,0 +1,180 @@
+from flask import Blueprint, request, jsonify
+from src.models.case import Case, Equipment, EQUIPMENT_MONTH, db
+from src.routes.auth import require_auth
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import select, func, literal, union_all, and_, or_
+
+equipment_bp = Blueprint('equipment', __name__)
+
+# Dimensiones de filtro y faceta: parámetro -> columna
+FACETS = {
+    'tipo_equipo': Equipment.tipo_equipo,
+    'marca': Equipment.marca,
+    'condicion_fisica': Equipment.condicion_fisica,
+    'estado': Case.estado,
+    'mes_recepcion': EQUIPMENT_MONTH
+}
+
+# Valores por faceta devueltos (los más frecuentes)
+FACET_LIMIT = 20
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser una fecha YYYY-MM-DD válida')
+
+def _prefix_range(column, prefix):
+    """Prefijo como rango [prefix, siguiente) para que lo resuelva el índice"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+def _filters(args):
+    """Condiciones por dimensión a partir de los parámetros de la petición"""
+    conditions = {}
+    for name in ('tipo_equipo', 'marca', 'condicion_fisica', 'estado'):
+        values = [value for value in args.getlist(name) if value]
+        if values:
+            conditions[name] = FACETS[name].in_(values)
+
+    received = []
+    if args.get('from'):
+        received.append(Equipment.fecha_recepcion >= datetime.combine(_parse_date(args['from'], 'from'), time.min))
+    if args.get('to'):
+        date_to = _parse_date(args['to'], 'to')
+        received.append(Equipment.fecha_recepcion < datetime.combine(date_to + timedelta(days=1), time.min))
+    if received:
+        conditions['mes_recepcion'] = and_(*received)
+
+    # Identificadores: exactos o por prefijo (no son facetas, se aplican siempre)
+    identifiers = []
+    for field in ('imei', 'numero_serie'):
+        if args.get(field):
+            identifiers.append(getattr(Equipment, field) == args[field].strip())
+    prefix = (args.get('buscar') or '').strip()
+    if prefix:  # solo espacios: sin filtro, no un rango vacío
+        identifiers.append(or_(_prefix_range(Equipment.imei, prefix), _prefix_range(Equipment.numero_serie, prefix)))
+    if identifiers:
+        conditions[None] = and_(*identifiers)
+
+    return conditions
+
+def _facet_count(name, column, others):
+    """Recuento de una faceta; `casos` solo se une si la faceta o un filtro usa su estado"""
+    if name == 'estado' and not others:
+        # Sin filtros basta el contador de equipos de cada caso
+        return select(
+            literal(name).label('faceta'),
+            Case.estado.label('valor'),
+            func.sum(Case.total_equipos).label('total')
+        ).group_by(Case.estado).having(func.sum(Case.total_equipos) > 0)
+
+    query = select(
+        literal(name).label('faceta'),
+        column.label('valor'),
+        func.count().label('total')
+    ).select_from(Equipment)
+    if name == 'estado' or 'estado' in others:
+        query = query.join(Case, Case.id == Equipment.caso_id)
+    return query.where(*others.values()).group_by(column)
+
+def facet_counts(conditions):
+    """Recuentos de todas las facetas en una sola consulta agrupada
+
+    Cada faceta se cuenta con los filtros de las demás dimensiones, pero no
+    con el suyo, para que se vean las alternativas disponibles.
+    """
+    grouped = [
+        _facet_count(name, column, {key: condition for key, condition in conditions.items() if key != name})
+        for name, column in FACETS.items()
+    ]
+    counts = union_all(*grouped).subquery()
+
+    ranked = select(
+        counts.c.faceta,
+        counts.c.valor,
+        counts.c.total,
+        func.row_number().over(
+            partition_by=counts.c.faceta, order_by=(counts.c.total.desc(), counts.c.valor)
+        ).label('posicion')
+    ).subquery()
+
+    facets = {name: [] for name in FACETS}
+    rows = db.session.execute(
+        select(ranked.c.faceta, ranked.c.valor, ranked.c.total).where(ranked.c.posicion <= FACET_LIMIT)
+    )
+    for faceta, valor, total in rows:
+        facets[faceta].append({'valor': valor, 'total': total})
+    return facets
+
+@equipment_bp.route('/', methods=['GET'])
+@require_auth
+def get_equipment():
+    """Inventario de equipos filtrado y paginado, con recuentos por faceta"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        conditions = _filters(request.args)
+
+        query = Equipment.query.filter(*conditions.values())
+        if 'estado' in conditions:
+            query = query.join(Case, Case.id == Equipment.caso_id)
+
+        equipment = query.order_by(
+            Equipment.fecha_recepcion.desc(), Equipment.id.desc()
+        ).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        # Número y estado del caso solo de los equipos de la página
+        caso_ids = {equipo.caso_id for equipo in equipment.items}
+        cases = {
+            row.id: row for row in db.session.query(Case.id, Case.numero_caso, Case.estado).filter(Case.id.in_(caso_ids))
+        } if caso_ids else {}
+
+        items = []
+        for equipo in equipment.items:
+            item = equipo.to_dict()
+            item['caso_numero'] = cases[equipo.caso_id].numero_caso
+            item['caso_estado'] = cases[equipo.caso_id].estado
+            items.append(item)
+
+        return jsonify({
+            'equipment': items,
+            'total': equipment.total,
+            'pages': equipment.pages,
+            'current_page': page,
+            'facets': facet_counts(conditions)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@equipment_bp.route('/lookup', methods=['GET'])
+@require_auth
+def lookup_equipment():
+    """Buscar un equipo por IMEI o número de serie (coincidencia exacta primero)"""
+    try:
+        q = (request.args.get('q') or '').strip()
+        if not q:
+            return jsonify({'error': 'q es requerido'}), 400
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+        exact = Equipment.query.filter(or_(Equipment.imei == q, Equipment.numero_serie == q)).limit(limit).all()
+        seen = {equipo.id for equipo in exact}
+        prefix = Equipment.query.filter(
+            or_(_prefix_range(Equipment.imei, q), _prefix_range(Equipment.numero_serie, q))
+        ).order_by(Equipment.imei, Equipment.numero_serie).limit(limit + len(seen)).all()
+
+        results = exact + [equipo for equipo in prefix if equipo.id not in seen]
+        return jsonify({
+            'equipment': [equipo.to_dict() for equipo in results[:limit]],
+            'exact': len(exact)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,201 @@
+from flask import Blueprint, request, jsonify, session, Response, current_app
+from src.models.case import Equipment, db
+from src.models.custody import append_custody_event
+from src.models.evidence import (
+    EvidenceUpload, EvidenceFile, UploadOffsetMismatch, UploadBusy, start_upload, write_chunk,
+    finish_upload, discard_upload, release_blob, blob_path, iter_mmap_range
+)
+from src.routes.auth import require_auth, require_admin
+import os
+import re
+
+evidence_bp = Blueprint('evidence', __name__)
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+@evidence_bp.route('/equipment/<int:equipment_id>', methods=['GET'])
+@require_auth
+def get_equipment_evidence(equipment_id):
+    """Listar archivos de evidencia y subidas en curso de un equipo"""
+    try:
+        Equipment.query.get_or_404(equipment_id)
+
+        files = EvidenceFile.query.filter_by(equipo_id=equipment_id).order_by(
+            EvidenceFile.fecha_subida.desc()
+        ).all()
+        uploads = EvidenceUpload.query.filter_by(equipo_id=equipment_id).all()
+
+        return jsonify({
+            'files': [evidence.to_dict() for evidence in files],
+            'uploads': [upload.to_dict() for upload in uploads]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/uploads', methods=['POST'])
+@require_auth
+def create_upload():
+    """Iniciar una subida reanudable"""
+    try:
+        data = request.get_json()
+
+        required_fields = ['equipo_id', 'nombre_archivo', 'tamano_total']
+        for field in required_fields:
+            if data.get(field) in (None, ''):
+                return jsonify({'error': f'{field} es requerido'}), 400
+
+        if not Equipment.query.get(data['equipo_id']):
+            return jsonify({'error': 'Equipo no encontrado'}), 404
+
+        tamano_total = int(data['tamano_total'])
+        if tamano_total <= 0:
+            return jsonify({'error': 'tamano_total debe ser positivo'}), 400
+
+        upload = start_upload(
+            data['equipo_id'], os.path.basename(data['nombre_archivo']), tamano_total, session['user_id']
+        )
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'upload': upload.to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/uploads/<upload_id>', methods=['GET'])
+@require_auth
+def get_upload(upload_id):
+    """Consultar el offset confirmado para reanudar una subida"""
+    try:
+        upload = EvidenceUpload.query.get_or_404(upload_id)
+        return jsonify({'upload': upload.to_dict()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@require_auth
+def put_upload_chunk(upload_id):
+    """Recibir un fragmento (cuerpo binario, cabecera Content-Range opcional)"""
+    try:
+        upload = EvidenceUpload.query.get_or_404(upload_id)
+
+        start = upload.recibido
+        content_range = request.headers.get('Content-Range')
+        if content_range:
+            match = CONTENT_RANGE_PATTERN.match(content_range.strip())
+            if not match:
+                return jsonify({'error': 'Content-Range inválido'}), 400
+            start = int(match.group(1))
+
+        try:
+            write_chunk(upload, start, request.stream)
+        except UploadOffsetMismatch as e:
+            db.session.rollback()
+            return jsonify({
+                'error': str(e),
+                'recibido': e.expected
+            }), 409
+
+        if upload.recibido < upload.tamano_total:
+            db.session.commit()
+            return jsonify({'upload': upload.to_dict()}), 202
+
+        evidence = finish_upload(upload)
+        append_custody_event(
+            evidence.equipo_id,
+            'evidencia_digital',
+            descripcion=f'Archivo {evidence.nombre_archivo} ({evidence.tamano} bytes) SHA-256 {evidence.sha256}',
+            usuario_id=session['user_id']
+        )
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Evidencia almacenada',
+            'file': evidence.to_dict()
+        }), 201
+
+    except UploadBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@require_auth
+def cancel_upload(upload_id):
+    """Cancelar una subida en curso"""
+    try:
+        upload = EvidenceUpload.query.get_or_404(upload_id)
+
+        discard_upload(upload)
+        db.session.commit()
+
+        return jsonify({'success': True, 'message': 'Subida cancelada'}), 200
+
+    except UploadBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/<int:file_id>/download', methods=['GET'])
+@require_auth
+def download_evidence(file_id):
+    """Descargar un archivo de evidencia (admite peticiones Range)"""
+    try:
+        evidence = EvidenceFile.query.get_or_404(file_id)
+        path = blob_path(evidence.sha256)
+        size = evidence.tamano
+        if not os.path.exists(path):
+            return jsonify({'error': 'Contenido de la evidencia no disponible'}), 404
+
+        start, stop, status = 0, size, 200
+        if request.range is not None:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+            start, stop = byte_range
+            status = 206
+
+        response = Response(
+            iter_mmap_range(path, start, stop, current_app.config.get('EVIDENCE_CHUNK_SIZE', 1024 * 1024)),
+            status=status,
+            mimetype='application/octet-stream',
+            direct_passthrough=True
+        )
+        response.headers['Content-Length'] = str(stop - start)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['ETag'] = f'"{evidence.sha256}"'
+        response.headers['Content-Disposition'] = f'attachment; filename="{evidence.nombre_archivo}"'
+        if status == 206:
+            response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@evidence_bp.route('/<int:file_id>', methods=['DELETE'])
+@require_admin
+def delete_evidence(file_id):
+    """Eliminar un archivo de evidencia"""
+    try:
+        evidence = EvidenceFile.query.get_or_404(file_id)
+        sha256 = evidence.sha256
+
+        db.session.delete(evidence)
+        release_blob(sha256)  # el archivo se borra tras el COMMIT si nadie más lo referencia
+        db.session.commit()
+
+        return jsonify({'success': True, 'message': 'Evidencia eliminada'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
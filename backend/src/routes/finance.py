@@ -0,0 +1,221 @@
+from flask import Blueprint, request, jsonify, session
+from src.models.case import Case, Transaction, to_cents, db
+from src.models.finance import range_summary
+from src.models.archive import archived_entity
+from src.models.writer import run_write
+from src.routes.auth import require_auth
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import func, case as sql_case
+
+finance_bp = Blueprint('finance', __name__)
+
+TRANSACTION_TYPES = ('ingreso', 'gasto')
+
+_ingresos = func.coalesce(func.sum(
+    sql_case((Transaction.tipo == 'ingreso', Transaction.monto_centavos), else_=0)
+), 0)
+_gastos = func.coalesce(func.sum(
+    sql_case((Transaction.tipo == 'gasto', Transaction.monto_centavos), else_=0)
+), 0)
+
+def _balance(ingresos, gastos):
+    return {
+        'ingresos_centavos': ingresos,
+        'gastos_centavos': gastos,
+        'balance_centavos': ingresos - gastos
+    }
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} debe ser una fecha YYYY-MM-DD válida')
+
+@finance_bp.route('/transactions', methods=['GET'])
+@require_auth
+def get_transactions():
+    """Obtener lista paginada de transacciones"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        tipo = request.args.get('tipo')
+        caso_id = request.args.get('caso_id', type=int)
+        usuario_id = request.args.get('usuario_id', type=int)
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+
+        # Las transacciones archivadas solo se leen si se piden expresamente
+        source = archived_entity(Transaction) if include_archived else Transaction
+        query = db.session.query(source)
+
+        if tipo:
+            query = query.filter(source.tipo == tipo)
+        if caso_id:
+            query = query.filter(source.caso_id == caso_id)
+        if usuario_id:
+            query = query.filter(source.usuario_id == usuario_id)
+        if request.args.get('from'):
+            date_from = _parse_date(request.args['from'], 'from')
+            query = query.filter(source.fecha >= datetime.combine(date_from, time.min))
+        if request.args.get('to'):
+            date_to = _parse_date(request.args['to'], 'to')
+            query = query.filter(source.fecha < datetime.combine(date_to + timedelta(days=1), time.min))
+
+        transactions = query.order_by(
+            source.fecha.desc(), source.id.desc()
+        ).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return jsonify({
+            'transactions': [transaction.to_dict() for transaction in transactions.items],
+            'total': transactions.total,
+            'pages': transactions.pages,
+            'current_page': page
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@finance_bp.route('/transactions', methods=['POST'])
+@require_auth
+def create_transaction():
+    """Registrar nueva transacción"""
+    try:
+        data = request.get_json()
+
+        # Validaciones básicas
+        required_fields = ['tipo', 'concepto', 'monto']
+        for field in required_fields:
+            if data.get(field) in (None, ''):
+                return jsonify({'error': f'{field} es requerido'}), 400
+
+        if data['tipo'] not in TRANSACTION_TYPES:
+            return jsonify({'error': 'tipo debe ser ingreso o gasto'}), 400
+
+        if data.get('caso_id') and not Case.query.get(data['caso_id']):
+            return jsonify({'error': 'Caso no encontrado'}), 404
+
+        monto_centavos = to_cents(data['monto'])
+        if monto_centavos <= 0:
+            return jsonify({'error': 'monto debe ser positivo'}), 400
+
+        fecha = datetime.fromisoformat(data['fecha']) if data.get('fecha') else None
+        usuario_id = session['user_id']
+
+        def write():
+            new_transaction = Transaction(
+                caso_id=data.get('caso_id'),
+                tipo=data['tipo'],
+                concepto=data['concepto'],
+                monto_centavos=monto_centavos,
+                usuario_id=usuario_id
+            )
+            if fecha:
+                new_transaction.fecha = fecha
+
+            db.session.add(new_transaction)
+            db.session.flush()
+            return new_transaction.to_dict()
+
+        transaction_data = run_write(write)
+
+        return jsonify({
+            'success': True,
+            'message': 'Transacción registrada exitosamente',
+            'transaction': transaction_data
+        }), 201
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@finance_bp.route('/transactions/<int:transaction_id>', methods=['DELETE'])
+@require_auth
+def delete_transaction(transaction_id):
+    """Eliminar transacción"""
+    try:
+        Transaction.query.get_or_404(transaction_id)
+
+        def write():
+            db.session.delete(Transaction.query.get(transaction_id))
+
+        run_write(write)
+
+        return jsonify({
+            'success': True,
+            'message': 'Transacción eliminada exitosamente'
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@finance_bp.route('/summary', methods=['GET'])
+@require_auth
+def get_summary():
+    """Resumen de ingresos y gastos de un rango de fechas"""
+    try:
+        today = datetime.utcnow().date()
+        date_from = _parse_date(request.args['from'], 'from') if request.args.get('from') else today.replace(day=1)
+        date_to = _parse_date(request.args['to'], 'to') if request.args.get('to') else today
+
+        if date_to < date_from:
+            return jsonify({'error': 'to no puede ser anterior a from'}), 400
+
+        summary = range_summary(date_from, date_to)
+        summary.update({'from': date_from.isoformat(), 'to': date_to.isoformat()})
+
+        return jsonify(summary), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@finance_bp.route('/balances/cases/<int:case_id>', methods=['GET'])
+@require_auth
+def get_case_balance(case_id):
+    """Balance de un caso"""
+    try:
+        Case.query.get_or_404(case_id)
+
+        ingresos, gastos = db.session.query(_ingresos, _gastos).filter(
+            Transaction.caso_id == case_id
+        ).one()
+
+        balance = _balance(ingresos, gastos)
+        balance['caso_id'] = case_id
+
+        return jsonify(balance), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@finance_bp.route('/balances/lawyers', methods=['GET'])
+@require_auth
+def get_lawyer_balances():
+    """Balance por abogado asignado a los casos"""
+    try:
+        rows = db.session.query(
+            Case.abogado_asignado_id, _ingresos, _gastos
+        ).join(
+            Transaction, Transaction.caso_id == Case.id
+        ).group_by(Case.abogado_asignado_id).all()
+
+        balances = []
+        for abogado_id, ingresos, gastos in rows:
+            balance = _balance(ingresos, gastos)
+            balance['abogado_id'] = abogado_id
+            balances.append(balance)
+
+        return jsonify({'balances': balances}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,134 @@
+from flask import Blueprint, request, jsonify, session, g
+from src.models.case import Case, Equipment, db
+from src.models.integrity import (
+    IntegrityJob, IntegrityResult, schedule_job, run_job_in_background, run_job_after_commit
+)
+from src.models.writer import run_write
+from src.routes.auth import require_auth
+from datetime import datetime
+
+integrity_bp = Blueprint('integrity', __name__)
+
+def _schedule(caso_id=None, equipo_id=None):
+    data = request.get_json(silent=True) or {}
+    fecha_programada = None
+    if data.get('programar_para'):
+        fecha_programada = datetime.fromisoformat(data['programar_para'])
+
+    usuario_id = session['user_id']
+
+    def write():
+        return schedule_job(
+            caso_id=caso_id,
+            equipo_id=equipo_id,
+            fecha_programada=fecha_programada,
+            usuario_id=usuario_id
+        ).to_dict()
+
+    job_data = run_write(write)
+
+    # Los trabajos para ahora se lanzan ya; los futuros los recoge `flask integrity run-due`.
+    # En un lote atómico el trabajo aún no está confirmado: se lanza tras el COMMIT del lote
+    if fecha_programada is None or fecha_programada <= datetime.utcnow():
+        if g.get('batch_atomic'):
+            run_job_after_commit(job_data['id'])
+        else:
+            run_job_in_background(job_data['id'])
+
+    return jsonify({
+        'success': True,
+        'message': 'Verificación programada',
+        'job': job_data
+    }), 202
+
+@integrity_bp.route('/cases/<int:case_id>/verify', methods=['POST'])
+@require_auth
+def verify_case(case_id):
+    """Programar la verificación de todas las evidencias de un caso"""
+    try:
+        Case.query.get_or_404(case_id)
+        return _schedule(caso_id=case_id)
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@integrity_bp.route('/equipment/<int:equipment_id>/verify', methods=['POST'])
+@require_auth
+def verify_equipment(equipment_id):
+    """Programar la verificación de las evidencias de un equipo"""
+    try:
+        Equipment.query.get_or_404(equipment_id)
+        return _schedule(equipo_id=equipment_id)
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@integrity_bp.route('/jobs', methods=['GET'])
+@require_auth
+def get_jobs():
+    """Listar trabajos de verificación"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        caso_id = request.args.get('caso_id', type=int)
+        estado = request.args.get('estado')
+
+        query = IntegrityJob.query
+        if caso_id:
+            query = query.filter_by(caso_id=caso_id)
+        if estado:
+            query = query.filter_by(estado=estado)
+
+        jobs = query.order_by(IntegrityJob.fecha_programada.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return jsonify({
+            'jobs': [job.to_dict() for job in jobs.items],
+            'total': jobs.total,
+            'pages': jobs.pages,
+            'current_page': page
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@integrity_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """Progreso y resultados de un trabajo de verificación"""
+    try:
+        job = IntegrityJob.query.get_or_404(job_id)
+        results = IntegrityResult.query.filter_by(trabajo_id=job_id).order_by(IntegrityResult.id).all()
+
+        job_data = job.to_dict()
+        job_data['resultados'] = [result.to_dict() for result in results]
+
+        return jsonify({'job': job_data}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@integrity_bp.route('/evidence/<int:file_id>/history', methods=['GET'])
+@require_auth
+def get_evidence_history(file_id):
+    """Historial de verificaciones de un archivo de evidencia"""
+    try:
+        results = IntegrityResult.query.filter_by(evidencia_id=file_id).order_by(
+            IntegrityResult.fecha.desc()
+        ).all()
+
+        return jsonify({'history': [result.to_dict() for result in results]}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
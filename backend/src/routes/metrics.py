@@ -0,0 +1,143 @@
+from flask import Blueprint, request, jsonify, session, current_app
+from src.compression import compression_stats
+from src.models.audit import audit_stats
+from src.dossier import dossier_cache_stats
+from src.cache import get_cache
+from src.models.changes import change_log_stats
+from src.replica import replica_stats
+from src.deadlines import deadline_stats, deadline_overrides, invalidate_overrides
+from src.models.deadline import QueryDeadline
+from src.models.writer import run_write
+from src.models.user import db
+from src.routes.auth import require_admin
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/compression', methods=['GET'])
+@require_admin
+def get_compression_stats():
+    """Bytes ahorrados por la compresión de respuestas, por ruta"""
+    try:
+        stats = compression_stats()
+
+        return jsonify({
+            'routes': stats,
+            'bytes_ahorrados': sum(route['bytes_ahorrados'] for route in stats.values())
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/audit', methods=['GET'])
+@require_admin
+def get_audit_stats():
+    """Entradas de auditoría pendientes y escritas por este proceso"""
+    try:
+        return jsonify(audit_stats()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/dossier', methods=['GET'])
+@require_admin
+def get_dossier_cache_stats():
+    """Aciertos y fallos de la caché de secciones del dossier en este proceso"""
+    try:
+        return jsonify(dossier_cache_stats()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/cache', methods=['GET'])
+@require_admin
+def get_cache_stats():
+    """Entradas de la caché compartida y aciertos/fallos de este proceso"""
+    try:
+        return jsonify(get_cache().stats()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/replication', methods=['GET'])
+@require_admin
+def get_replication_stats():
+    """Registro de cambios del principal, o cursor y retraso si este nodo es una réplica"""
+    try:
+        if current_app.config['REPLICA_MODE']:
+            return jsonify(replica_stats()), 200
+        return jsonify(change_log_stats()), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/deadlines', methods=['GET'])
+@require_admin
+def get_deadlines():
+    """Límites de tiempo de consulta vigentes y peticiones cortadas por ruta"""
+    try:
+        invalidate_overrides()
+
+        return jsonify({
+            'default_ms': current_app.config['QUERY_DEADLINE_MS'],
+            'config': current_app.config['QUERY_DEADLINES'],
+            'overrides': deadline_overrides(),
+            'timeouts': deadline_stats()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/deadlines/<endpoint>', methods=['PUT'])
+@require_admin
+def set_deadline(endpoint):
+    """Fijar el límite de un endpoint (milisegundos, 0 = sin límite)"""
+    try:
+        if endpoint not in current_app.view_functions:
+            return jsonify({'error': 'Endpoint no encontrado'}), 404
+
+        data = request.get_json() or {}
+        milisegundos = data.get('milisegundos')
+        if not isinstance(milisegundos, int) or isinstance(milisegundos, bool) or milisegundos < 0:
+            return jsonify({'error': 'milisegundos debe ser un entero mayor o igual que 0'}), 400
+
+        usuario_id = session['user_id']
+
+        def write():
+            deadline = QueryDeadline.query.get(endpoint) or QueryDeadline(endpoint=endpoint)
+            deadline.milisegundos = milisegundos
+            deadline.usuario_id = usuario_id
+            db.session.add(deadline)
+            db.session.flush()
+            return deadline.to_dict()
+
+        deadline_data = run_write(write)
+        invalidate_overrides()
+
+        return jsonify({
+            'success': True,
+            'message': 'Límite actualizado',
+            'deadline': deadline_data
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/deadlines/<endpoint>', methods=['DELETE'])
+@require_admin
+def delete_deadline(endpoint):
+    """Volver al límite configurado para un endpoint"""
+    try:
+        QueryDeadline.query.get_or_404(endpoint)
+
+        def write():
+            db.session.delete(QueryDeadline.query.get(endpoint))
+
+        run_write(write)
+        invalidate_overrides()
+
+        return jsonify({'success': True, 'message': 'Límite restablecido'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
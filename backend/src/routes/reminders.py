@@ -0,0 +1,118 @@
+from flask import Blueprint, request, jsonify, session, Response, current_app
+from src.models.reminder import Reminder
+from src.models.user import db
+from src.models.writer import run_write
+from src.reminders import get_scheduler
+from src.routes.auth import require_auth
+import json
+import time
+
+reminders_bp = Blueprint('reminders', __name__)
+
+@reminders_bp.route('/', methods=['GET'])
+@require_auth
+def get_reminders():
+    """Listar los recordatorios del usuario"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        unread = request.args.get('unread', 'false').lower() == 'true'
+
+        query = Reminder.query.filter_by(usuario_id=session['user_id'])
+        if unread:
+            query = query.filter_by(leido=False)
+
+        reminders = query.order_by(Reminder.id.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return jsonify({
+            'reminders': [reminder.to_dict() for reminder in reminders.items],
+            'total': reminders.total,
+            'pages': reminders.pages,
+            'current_page': page
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reminders_bp.route('/<int:reminder_id>/read', methods=['PUT'])
+@require_auth
+def mark_reminder_read(reminder_id):
+    """Marcar un recordatorio como leído"""
+    try:
+        Reminder.query.filter_by(id=reminder_id, usuario_id=session['user_id']).first_or_404()
+
+        def write():
+            reminder = Reminder.query.get(reminder_id)
+            reminder.leido = True
+            db.session.flush()
+            return reminder.to_dict()
+
+        return jsonify({'success': True, 'reminder': run_write(write)}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@reminders_bp.route('/stream', methods=['GET'])
+@require_auth
+def stream_reminders():
+    """Recordatorios del usuario en tiempo real (Server-Sent Events)
+
+    Solo consulta la bandeja cuando el planificador dispara avisos; el
+    resto del tiempo envía comentarios de keep-alive. La conexión se cierra
+    tras REMINDER_STREAM_SECONDS y el navegador se reconecta con
+    Last-Event-ID, así que no retiene un hilo del servidor indefinidamente.
+    """
+    try:
+        app = current_app._get_current_object()
+        usuario_id = session['user_id']
+        scheduler = get_scheduler(app)
+        seen = scheduler.fired_count
+
+        cursor = request.headers.get('Last-Event-ID', type=int)
+        if cursor is None:
+            # Primera conexión: empezar por los recordatorios sin leer
+            first_unread = db.session.query(db.func.min(Reminder.id)).filter_by(
+                usuario_id=usuario_id, leido=False
+            ).scalar()
+            cursor = first_unread - 1 if first_unread else db.session.query(
+                db.func.coalesce(db.func.max(Reminder.id), 0)
+            ).scalar()
+        db.session.commit()
+
+        def events(cursor, seen):
+            closes_at = time.monotonic() + app.config['REMINDER_STREAM_SECONDS']
+            keep_alive = app.config['REMINDER_KEEP_ALIVE_SECONDS']
+            yield 'retry: 5000\n\n'
+            pending = True
+            while True:
+                if pending:
+                    # Contexto propio: la petición ya terminó y no debe mantenerse una lectura abierta
+                    with app.app_context():
+                        reminders = [reminder.to_dict() for reminder in Reminder.query.filter(
+                            Reminder.usuario_id == usuario_id, Reminder.id > cursor
+                        ).order_by(Reminder.id).all()]
+                    for reminder in reminders:
+                        cursor = reminder['id']
+                        yield f"id: {cursor}\nevent: reminder\ndata: {json.dumps(reminder)}\n\n"
+
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                fired = scheduler.wait_for_reminders(seen, min(keep_alive, remaining))
+                pending = fired != seen
+                seen = fired
+                if not pending:
+                    yield ': keep-alive\n\n'
+
+        response = Response(events(cursor, seen), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,11 +1,15 @@
 // Módulo API para ForensicWeb Dashboard
 
+// Máximo de sub-peticiones por lote (BATCH_MAX_REQUESTS en el servidor)
+const BATCH_MAX_REQUESTS = 25;
+
 class API {
     constructor() {
         this.baseURL = '/api';
         this.defaultHeaders = {
             'Content-Type': 'application/json'
         };
+        this.batchQueue = [];
     }
 
     // Método genérico para hacer requests
@@ -32,6 +36,71 @@ class API {
         }
     }
 
+    // Ejecutar varias sub-peticiones en un solo round trip a /api/batch
+    async batch(requests, atomic = false) {
+        return this.request('/batch', {
+            method: 'POST',
+            body: JSON.stringify({ requests, atomic })
+        });
+    }
+
+    // Encolar una petición; las llamadas hechas en el mismo tick se agrupan en un lote
+    batched(endpoint, options = {}) {
+        return new Promise((resolve, reject) => {
+            this.batchQueue.push({
+                method: options.method || 'GET',
+                path: endpoint,
+                body: options.body ? JSON.parse(options.body) : null,
+                resolve,
+                reject
+            });
+
+            if (this.batchQueue.length === 1) {
+                queueMicrotask(() => this.flushBatch());
+            }
+        });
+    }
+
+    async flushBatch() {
+        const queue = this.batchQueue;
+        this.batchQueue = [];
+
+        // El servidor rechaza lotes de más de BATCH_MAX_REQUESTS: partir la cola
+        const chunks = [];
+        for (let start = 0; start < queue.length; start += BATCH_MAX_REQUESTS) {
+            chunks.push(queue.slice(start, start + BATCH_MAX_REQUESTS));
+        }
+        await Promise.all(chunks.map(chunk => this.sendBatch(chunk)));
+    }
+
+    async sendBatch(queue) {
+        // Una sola petición no necesita pasar por el lote
+        if (queue.length === 1) {
+            const [item] = queue;
+            const options = { method: item.method };
+            if (item.body !== null) {
+                options.body = JSON.stringify(item.body);
+            }
+            this.request(item.path, options).then(item.resolve, item.reject);
+            return;
+        }
+
+        try {
+            const response = await this.batch(queue.map(({ method, path, body }) => ({ method, path, body })));
+            response.results.forEach((result, index) => {
+                const item = queue[index];
+                if (result.status >= 400) {
+                    const message = (result.body && result.body.error) || `HTTP error! status: ${result.status}`;
+                    item.reject(new Error(message));
+                } else {
+                    item.resolve(result.body);
+                }
+            });
+        } catch (error) {
+            queue.forEach(item => item.reject(error));
+        }
+    }
+
     // Métodos de autenticación
     async login(email, password) {
         return this.request('/auth/login', {
@@ -59,25 +128,34 @@ class API {
         return this.request('/dashboard/stats');
     }
 
-    async getRecentActivity() {
-        return this.request('/dashboard/recent-activity');
+    async getRecentActivity(since = null) {
+        const query = since !== null ? `?since=${since}` : '';
+        return this.request(`/dashboard/recent-activity${query}`);
     }
 
     async getPendingCases() {
         return this.request('/dashboard/pending-cases');
     }
 
+    async getCaseAnalytics(desde = null, hasta = null) {
+        const params = new URLSearchParams();
+        if (desde) params.append('desde', desde);
+        if (hasta) params.append('hasta', hasta);
+        const query = params.toString();
+        return this.request(`/dashboard/analytics${query ? `?${query}` : ''}`);
+    }
+
     // Métodos para gráficos
     async getCasesByMonth() {
-        return this.request('/dashboard/charts/cases-by-month');
+        return this.batched('/dashboard/charts/cases-by-month');
     }
 
     async getCasesByStatus() {
-        return this.request('/dashboard/charts/cases-by-status');
+        return this.batched('/dashboard/charts/cases-by-status');
     }
 
     async getRevenueByMonth() {
-        return this.request('/dashboard/charts/revenue-by-month');
+        return this.batched('/dashboard/charts/revenue-by-month');
     }
 
     // Métodos de casos
@@ -89,8 +167,13 @@ class API {
         return this.request(endpoint);
     }
 
-    async getCase(id) {
-        return this.request(`/cases/${id}`);
+    async getCase(id, equiposLimit = 20, equiposOffset = 0) {
+        const params = new URLSearchParams({ equipos_limit: equiposLimit, equipos_offset: equiposOffset });
+        return this.request(`/cases/${id}?${params.toString()}`);
+    }
+
+    getCaseDossierUrl(id) {
+        return `${this.baseURL}/cases/${id}/dossier`;
     }
 
     async createCase(caseData) {
@@ -107,6 +190,21 @@ class API {
         });
     }
 
+    // selection: {ids: [...]} o {filtro: {...}}
+    async bulkUpdateCases(selection, changes) {
+        return this.request('/cases/bulk', {
+            method: 'PUT',
+            body: JSON.stringify({...selection, ...changes})
+        });
+    }
+
+    async bulkReassignCases(selection, abogadoId) {
+        return this.request('/cases/bulk/reassign', {
+            method: 'PUT',
+            body: JSON.stringify({...selection, abogado_asignado_id: abogadoId})
+        });
+    }
+
     async deleteCase(id) {
         return this.request(`/cases/${id}`, {
             method: 'DELETE'
@@ -133,8 +231,9 @@ class API {
         return this.request(endpoint);
     }
 
-    async getClient(id) {
-        return this.request(`/clients/${id}`);
+    async getClient(id, casosLimit = 20, casosOffset = 0) {
+        const params = new URLSearchParams({ casos_limit: casosLimit, casos_offset: casosOffset });
+        return this.request(`/clients/${id}?${params.toString()}`);
     }
 
     async createClient(clientData) {
@@ -161,6 +260,109 @@ class API {
         return this.request('/clients/stats');
     }
 
+    async getClientDuplicates(page = 1, perPage = 100) {
+        return this.request(`/clients/duplicates?page=${page}&per_page=${perPage}`);
+    }
+
+    async mergeClients(id, duplicateId) {
+        return this.request(`/clients/${id}/merge`, {
+            method: 'POST',
+            body: JSON.stringify({ duplicado_id: duplicateId })
+        });
+    }
+
+    // Métodos de equipos
+    async getEquipmentList(page = 1, perPage = 20, filters = {}) {
+        const params = new URLSearchParams({ page, per_page: perPage, ...filters });
+        return this.request(`/equipment?${params.toString()}`);
+    }
+
+    async lookupEquipment(q) {
+        return this.request(`/equipment/lookup?q=${encodeURIComponent(q)}`);
+    }
+
+    // Métodos de agenda
+    async getAgendaEvents(from = null, to = null, usuarioId = null) {
+        const params = new URLSearchParams();
+        if (from) params.append('from', from);
+        if (to) params.append('to', to);
+        if (usuarioId) params.append('usuario_id', usuarioId);
+        const query = params.toString();
+        return this.request(`/agenda${query ? `?${query}` : ''}`);
+    }
+
+    async getAgendaConflicts(from, to, usuarioId = null) {
+        let endpoint = `/agenda/conflicts?from=${encodeURIComponent(from)}&to=${encodeURIComponent(to)}`;
+        if (usuarioId) {
+            endpoint += `&usuario_id=${usuarioId}`;
+        }
+        return this.request(endpoint);
+    }
+
+    async createAgendaEvent(eventData) {
+        return this.request('/agenda', {
+            method: 'POST',
+            body: JSON.stringify(eventData)
+        });
+    }
+
+    async updateAgendaEvent(id, eventData) {
+        return this.request(`/agenda/${id}`, {
+            method: 'PUT',
+            body: JSON.stringify(eventData)
+        });
+    }
+
+    async deleteAgendaEvent(id) {
+        return this.request(`/agenda/${id}`, {
+            method: 'DELETE'
+        });
+    }
+
+    // Métodos de recordatorios
+    async getReminders(unread = false) {
+        return this.request(`/reminders?unread=${unread}`);
+    }
+
+    async markReminderRead(id) {
+        return this.request(`/reminders/${id}/read`, {
+            method: 'PUT'
+        });
+    }
+
+    getReminderStreamUrl() {
+        return `${this.baseURL}/reminders/stream`;
+    }
+
+    // Métodos de finanzas
+    async getTransactions(page = 1, perPage = 20, filters = {}) {
+        const params = new URLSearchParams({ page, per_page: perPage, ...filters });
+        return this.request(`/finance/transactions?${params.toString()}`);
+    }
+
+    async createTransaction(transactionData) {
+        return this.request('/finance/transactions', {
+            method: 'POST',
+            body: JSON.stringify(transactionData)
+        });
+    }
+
+    async getFinanceSummary(from = null, to = null) {
+        const params = new URLSearchParams();
+        if (from) params.append('from', from);
+        if (to) params.append('to', to);
+        const query = params.toString();
+        return this.request(`/finance/summary${query ? `?${query}` : ''}`);
+    }
+
+    async getCaseBalance(caseId) {
+        return this.request(`/finance/balances/cases/${caseId}`);
+    }
+
+    async getLawyerBalances() {
+        return this.request('/finance/balances/lawyers');
+    }
+
     // Métodos de contacto
     async getContacts(page = 1, perPage = 10, unreadOnly = false) {
         let endpoint = `/contact?page=${page}&per_page=${perPage}`;
@@ -176,6 +378,13 @@ class API {
         });
     }
 
+    async markAllContactsRead(selection = {}) {
+        return this.request('/contact/read', {
+            method: 'PUT',
+            body: JSON.stringify(selection)
+        });
+    }
+
     async getContactStats() {
         return this.request('/contact/stats');
     }
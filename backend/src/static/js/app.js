@@ -21,6 +21,7 @@ class App {
             if (window.auth && window.auth.isAuthenticated !== undefined) {
                 if (window.auth.isAuthenticated) {
                     this.loadPage('dashboard');
+                    this.startReminderStream();
                 } else {
                     // El módulo de auth ya manejará mostrar el login
                 }
@@ -31,6 +32,23 @@ class App {
         checkAuth();
     }
 
+    startReminderStream() {
+        // Recordatorios de agenda en tiempo real; EventSource se reconecta solo
+        if (this.reminderStream || !window.EventSource) return;
+        this.reminderStream = new EventSource(api.getReminderStreamUrl(), { withCredentials: true });
+        this.reminderStream.addEventListener('reminder', (event) => {
+            const reminder = JSON.parse(event.data);
+            showNotification(`Recordatorio: ${reminder.titulo} (${formatDate(reminder.fecha_evento)})`, 'info');
+        });
+    }
+
+    stopReminderStream() {
+        if (this.reminderStream) {
+            this.reminderStream.close();
+            this.reminderStream = null;
+        }
+    }
+
     setupNavigation() {
         // Configurar navegación del header
         const headerLinks = document.querySelectorAll('.header-nav .nav-link');
@@ -276,6 +294,7 @@ class App {
                     <td>${formatDate(case_.fecha_apertura)}</td>
                     <td>
                         <button class="btn btn-sm" onclick="viewCase(${case_.id})">Ver</button>
+                        <button class="btn btn-sm" onclick="openCaseDossier(${case_.id})">Dossier</button>
                         <button class="btn btn-sm btn-danger" onclick="deleteCase(${case_.id})">Eliminar</button>
                     </td>
                 </tr>
@@ -360,15 +379,72 @@ class App {
     }
 
     async renderEquipmentPage(data) {
-        return `
-            <div class="equipment-page">
-                <h3>Gestión de Equipos</h3>
-                <p>Esta página mostrará la gestión de equipos forenses.</p>
-                <div class="page-actions">
-                    <button class="btn btn-primary">Registrar Equipo</button>
+        try {
+            const response = await api.getEquipmentList(1, 20, data || {});
+            const equipment = response.equipment || [];
+            const facets = response.facets || {};
+
+            const equipmentHTML = equipment.map(equipo => `
+                <tr>
+                    <td>${formatDate(equipo.fecha_recepcion)}</td>
+                    <td>${equipo.caso_numero}</td>
+                    <td>${equipo.tipo_equipo}</td>
+                    <td>${equipo.marca || 'N/A'} ${equipo.modelo || ''}</td>
+                    <td>${equipo.numero_serie || equipo.imei || 'N/A'}</td>
+                    <td>${equipo.condicion_fisica || 'N/A'}</td>
+                    <td>${equipo.caso_estado}</td>
+                </tr>
+            `).join('');
+
+            const facetTitles = {
+                tipo_equipo: 'Tipo',
+                marca: 'Marca',
+                condicion_fisica: 'Condición',
+                estado: 'Estado del caso',
+                mes_recepcion: 'Mes de recepción'
+            };
+            const facetsHTML = Object.entries(facetTitles).map(([key, title]) => `
+                <div class="facet">
+                    <h4>${title}</h4>
+                    <ul>
+                        ${(facets[key] || []).map(item => `<li>${item.valor || 'Sin dato'} (${item.total})</li>`).join('')}
+                    </ul>
                 </div>
-            </div>
-        `;
+            `).join('');
+
+            return `
+                <div class="equipment-page">
+                    <div class="page-actions">
+                        <button class="btn btn-primary">Registrar Equipo</button>
+                    </div>
+
+                    <div class="facets">
+                        ${facetsHTML}
+                    </div>
+
+                    <div class="table-container">
+                        <table class="table">
+                            <thead>
+                                <tr>
+                                    <th>Recepción</th>
+                                    <th>Caso</th>
+                                    <th>Tipo</th>
+                                    <th>Marca / Modelo</th>
+                                    <th>Serie / IMEI</th>
+                                    <th>Condición</th>
+                                    <th>Estado</th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                ${equipmentHTML || '<tr><td colspan="7">No hay equipos</td></tr>'}
+                            </tbody>
+                        </table>
+                    </div>
+                </div>
+            `;
+        } catch (error) {
+            return `<div class="error">Error al cargar equipos: ${error.message}</div>`;
+        }
     }
 
     async renderContactsPage(data) {
@@ -417,15 +493,47 @@ class App {
     }
 
     async renderCalendarPage(data) {
-        return `
-            <div class="calendar-page">
-                <h3>Agenda Legal</h3>
-                <p>Esta página mostrará el calendario de eventos legales.</p>
-                <div class="page-actions">
-                    <button class="btn btn-primary">Nuevo Evento</button>
+        try {
+            const response = await api.getAgendaEvents();
+            const events = response.events || [];
+
+            const eventsHTML = events.map(event => `
+                <tr>
+                    <td>${formatDate(event.fecha_inicio)}</td>
+                    <td>${formatDate(event.fecha_fin)}</td>
+                    <td>${event.titulo}</td>
+                    <td>${event.tipo_evento || 'N/A'}</td>
+                    <td>${event.ubicacion || 'N/A'}</td>
+                </tr>
+            `).join('');
+
+            return `
+                <div class="calendar-page">
+                    <div class="page-actions">
+                        <button class="btn btn-primary">Nuevo Evento</button>
+                    </div>
+
+                    <div class="table-container">
+                        <table class="table">
+                            <thead>
+                                <tr>
+                                    <th>Inicio</th>
+                                    <th>Fin</th>
+                                    <th>Título</th>
+                                    <th>Tipo</th>
+                                    <th>Ubicación</th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                ${eventsHTML || '<tr><td colspan="5">No hay eventos este mes</td></tr>'}
+                            </tbody>
+                        </table>
+                    </div>
                 </div>
-            </div>
-        `;
+            `;
+        } catch (error) {
+            return `<div class="error">Error al cargar la agenda: ${error.message}</div>`;
+        }
     }
 }
 
@@ -457,6 +565,10 @@ window.deleteCase = function(caseId) {
     }
 };
 
+window.openCaseDossier = function(caseId) {
+    window.open(api.getCaseDossierUrl(caseId), '_blank');
+};
+
 window.viewContact = function(contactId) {
     showNotification(`Ver mensaje ${contactId} - En desarrollo`, 'info');
 };
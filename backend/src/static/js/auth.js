@@ -65,6 +65,7 @@ class Auth {
                 // Cargar el dashboard
                 if (window.app && window.app.loadPage) {
                     window.app.loadPage('dashboard');
+                    window.app.startReminderStream();
                 }
             }
         } catch (error) {
@@ -80,6 +81,7 @@ class Auth {
     async logout() {
         try {
             await api.logout();
+            if (window.app) window.app.stopReminderStream();
             this.clearUser();
             this.showLogin();
             showNotification('Sesión cerrada correctamente', 'info');
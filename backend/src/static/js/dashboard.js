@@ -5,6 +5,8 @@ class Dashboard {
         this.charts = {};
         this.stats = {};
         this.refreshInterval = null;
+        this.activity = [];
+        this.activityCursor = null;
     }
 
     async init() {
@@ -79,8 +81,17 @@ class Dashboard {
 
     async loadRecentActivity() {
         try {
-            const response = await api.getRecentActivity();
-            this.renderRecentActivity(response.activity);
+            // Tras la primera carga solo se piden las entradas posteriores al cursor
+            const response = await api.getRecentActivity(this.activityCursor);
+            if (response.has_more) {
+                // Demasiadas novedades: volver a pedir solo las últimas
+                this.activityCursor = null;
+                this.activity = [];
+                return this.loadRecentActivity();
+            }
+            this.activity = response.activity.concat(this.activity).slice(0, 15);
+            this.activityCursor = response.cursor;
+            this.renderRecentActivity(this.activity);
         } catch (error) {
             console.error('Error loading recent activity:', error);
         }